@@ -3,42 +3,31 @@ import numpy as np
 import random
 import time
 import threading
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras.models import model_from_json
-from tensorflow.keras.models import Sequential
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "moodsync"))
+from models.weight_store import load_model
+from models.preprocessing import preprocess_faces
 
 # Load model
 # Initialize model as None first
 model = None
 
 try:
-    # Register custom objects to ensure compatibility
-    custom_objects = {
-        'Sequential': Sequential,
-        'Conv2D': tf.keras.layers.Conv2D,
-        'MaxPooling2D': tf.keras.layers.MaxPooling2D,
-        'Dropout': tf.keras.layers.Dropout,
-        'Flatten': tf.keras.layers.Flatten,
-        'Dense': tf.keras.layers.Dense
-    }
-    
     model_dir = os.path.dirname(os.path.abspath(__file__))
     json_path = os.path.join(model_dir, "moodsync", "facialemotionmodel.json")
     h5_path = os.path.join(model_dir, "moodsync", "facialemotionmodel.h5")
+    weights_path = os.path.join(model_dir, "moodsync", "facialemotionmodel.weights.bin")
     
     # Check if model files exist
-    if not os.path.exists(json_path) or not os.path.exists(h5_path):
+    if not os.path.exists(json_path) or not (os.path.exists(h5_path) or os.path.exists(weights_path)):
         print(f"Error: Model files not found at {model_dir}")
         print(f"JSON file exists: {os.path.exists(json_path)}")
         print(f"H5 file exists: {os.path.exists(h5_path)}")
+        print(f"Weights file exists: {os.path.exists(weights_path)}")
     else:
-        json_file = open(json_path, "r")
-        model_json = json_file.read()
-        json_file.close()
-        model = model_from_json(model_json, custom_objects=custom_objects)
-        model.load_weights(h5_path)
+        # Flat weight file is used when exported, otherwise the H5 file
+        model = load_model(json_path, h5_path, weights_path)
         print("Model loaded successfully!")
 except Exception as e:
     print(f"Error loading model: {e}")
@@ -239,17 +228,6 @@ class EmotionHelper:
        self.last_emotion = emotion
        return self.current_suggestion, self.suggestion_type
 
-def extract_features(image):
-   """Enhanced feature extraction with normalization"""
-   if image is None or image.size == 0:
-       return None
-   
-   image = cv2.equalizeHist(image)
-   image = cv2.resize(image, (48, 48))
-   feature = np.array(image, dtype=np.float32)
-   feature = feature.reshape(1, 48, 48, 1)
-   return feature / 255.0
-
 def detect_faces_improved(gray_frame, face_cascade_param=None, profile_cascade_param=None):
    """Improved face detection using multiple cascades and parameters"""
    # Use provided cascades if available, otherwise use global ones
@@ -357,17 +335,16 @@ while True:
    faces = detect_faces_improved(gray)
    
    try:
-       for (x, y, w, h) in faces:
-           padding = 10
-           face_region = gray[max(0, y-padding):min(gray.shape[0], y+h+padding),
-                             max(0, x-padding):min(gray.shape[1], x+w+padding)]
-           
-           if face_region.size > 0:
-                features = extract_features(face_region)
-                
-                if features is not None and model is not None:
+       # Preprocess every face into one batch and predict them together
+       predictions = None
+       if len(faces) > 0 and model is not None:
+           predictions = model.predict(preprocess_faces(gray, faces), verbose=0)
+       
+       for i, (x, y, w, h) in enumerate(faces):
+           if w > 0 and h > 0:
+                if predictions is not None:
                     try:
-                        prediction = model.predict(features, verbose=0)
+                        prediction = predictions[i]
                         confidence = np.max(prediction)
                         emotion_label = labels[np.argmax(prediction)]
                         
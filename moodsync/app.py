@@ -1,15 +1,26 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context, send_file
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import io
 import base64
+import binascii
+import json
+import csv
 import uuid
 import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
+from zoneinfo import available_timezones
 from models.emotion_detector import EmotionDetector
 from models.ai_suggestions import SuggestionEngine
 from models.database import DatabaseManager
+from models.write_queue import WriteBehindQueue
+from models import emotion_vectors, export, importer, reports
+from models.reports import ReportService
+from models.maintenance import MaintenanceJob
+from models.backup import BackupService
+from models.face_cache import FaceCache
 from config import Config
 from emotion_api import load_emotion_model, initialize_face_detection, extract_features
 
@@ -29,13 +40,10 @@ except Exception:
 	genai = None
 	_gemini_ready = False
 
-# Database connection function
+# Database connection function: pooled connection shared with DatabaseManager,
+# use as `with get_db_connection() as conn:` (commits on success, rolls back on error)
 def get_db_connection():
-	import os
-	db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'moodsync.db')
-	conn = sqlite3.connect(db_path)
-	conn.row_factory = sqlite3.Row
-	return conn
+	return db_manager.connection()
 
 # Create Flask app
 app = Flask(__name__)
@@ -46,7 +54,17 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Initialize components
 db_manager = DatabaseManager()
+write_queue = WriteBehindQueue(db_manager, Config.WRITE_BEHIND_MAX_BATCH, Config.WRITE_BEHIND_MAX_DELAY_MS,
+							   Config.WRITE_BEHIND_MAX_QUEUE) if Config.WRITE_BEHIND_ENABLED else None
+report_service = ReportService(db_manager, Config.REPORT_DIR, Config.REPORT_WORKERS)
+maintenance_job = MaintenanceJob(db_manager, app.config['UPLOAD_FOLDER'])
+if Config.MAINTENANCE_INTERVAL_HOURS > 0:
+	maintenance_job.start(Config.MAINTENANCE_INTERVAL_HOURS)
+backup_service = BackupService(db_manager, upload_folder=app.config['UPLOAD_FOLDER'])
+if Config.BACKUP_INTERVAL_HOURS > 0:
+	backup_service.start(Config.BACKUP_INTERVAL_HOURS)
 emotion_detector = EmotionDetector()
+face_cache = FaceCache() if Config.FACE_CACHE_ENABLED else None
 suggestion_engine = SuggestionEngine()
 
 # Set secret key
@@ -57,6 +75,25 @@ def allowed_file(filename):
 	return '.' in filename and \
 		   filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# Log a mood with its suggestions; group-committed by the writer thread when write-behind is on
+def log_mood_entry(suggestions, **mood):
+	if write_queue is not None:
+		return write_queue.submit(suggestions, **mood).result()
+	return db_manager.log_mood_with_suggestions(suggestions, **mood)
+
+# Mood log pagination cursors: opaque URL-safe tokens for (ts_epoch, id)
+def encode_cursor(cursor):
+	if cursor is None:
+		return None
+	return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode()
+
+def decode_cursor(token):
+	try:
+		ts_epoch, mood_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+		return int(ts_epoch), int(mood_id)
+	except (ValueError, TypeError, binascii.Error):
+		return None
+
 # Login required decorator
 def login_required(f):
 	@wraps(f)
@@ -88,39 +125,84 @@ def home():
 @app.route('/save_journal', methods=['POST'])
 @login_required
 def save_journal():
-	entry_text = request.json.get('entry_text')
+	data = request.json or {}
+	entry_text = (data.get('entry_text') or '').strip()
 	user_id = session.get('user_id')
 	
 	if not entry_text:
 		return jsonify({'error': 'Journal entry cannot be empty'}), 400
 	
-	# In a real implementation, you would save this to the database
-	# db_manager.save_journal_entry(user_id, entry_text)
+	entry_id = db_manager.save_journal_entry(user_id, entry_text, mood_id=data.get('mood_id'))
 	
-	return jsonify({'success': True, 'message': 'Journal entry saved successfully'})
+	return jsonify({'success': True, 'id': entry_id, 'message': 'Journal entry saved successfully'})
 
 @app.route('/get_journal_entries')
 @login_required
 def get_journal_entries():
 	user_id = session.get('user_id')
 	
-	# In a real implementation, you would fetch entries from the database
-	# entries = db_manager.get_journal_entries(user_id)
+	# Newest first; pass back next_cursor for the following page
+	token = request.args.get('cursor')
+	before = decode_cursor(token) if token else None
+	if token and before is None:
+		return jsonify({'error': 'Invalid cursor'}), 400
 	
-	# For demo purposes, return empty list
-	return jsonify({'entries': []})
+	entries, cursor = db_manager.get_journal_entries(user_id, before=before)
+	return jsonify({'entries': entries, 'next_cursor': encode_cursor(cursor)})
+
+@app.route('/search_journal')
+@login_required
+def search_journal():
+	user_id = session.get('user_id')
+	query = request.args.get('q', '')
+	page = max(request.args.get('page', 1, type=int), 1)
+	page_size = Config.MOOD_LOG_PAGE_SIZE
+	
+	# Journal entries and mood notes, best match first; snippets are HTML with <mark> around matches
+	results, more = db_manager.search_journal(user_id, query, offset=(page - 1) * page_size, limit=page_size)
+	return jsonify({'results': results, 'page': page, 'next_page': page + 1 if more else None})
 
 @app.route('/generate_report', methods=['POST'])
 @login_required
 def generate_report():
 	user_id = session.get('user_id')
-	timeframe = request.json.get('timeframe', 'week')
+	timeframe = (request.json or {}).get('timeframe', 'week')
 	
-	# In a real implementation, you would generate the report data here
-	# report_data = db_manager.generate_mood_report(user_id, timeframe)
+	if timeframe not in reports.TIMEFRAMES:
+		return jsonify({'success': False, 'error': 'Unknown timeframe'}), 400
+	if not reports.available():
+		return jsonify({'success': False, 'error': 'PDF reports are not available'}), 503
 	
-	# For demo purposes, return success
-	return jsonify({'success': True, 'message': 'Report generated successfully'})
+	# Rendered by the report pool; poll report_status until the PDF is ready
+	job_id = report_service.submit(user_id, timeframe)
+	return jsonify({
+		'success': True,
+		'job_id': job_id,
+		'status_url': url_for('report_status', job_id=job_id),
+		**report_service.status(user_id, job_id)
+	}), 202
+
+@app.route('/report_status/<job_id>')
+@login_required
+def report_status(job_id):
+	user_id = session.get('user_id')
+	status = report_service.status(user_id, job_id)
+	if status is None:
+		return jsonify({'success': False, 'error': 'Unknown report'}), 404
+	if status['status'] == 'done':
+		status['download_url'] = url_for('download_report', job_id=job_id)
+	return jsonify({'success': True, 'job_id': job_id, **status})
+
+@app.route('/reports/<job_id>.pdf')
+@login_required
+def download_report(job_id):
+	user_id = session.get('user_id')
+	path = report_service.path(user_id, job_id)
+	if path is None or not os.path.exists(path):
+		return jsonify({'success': False, 'error': 'Unknown report'}), 404
+	timeframe = reports.timeframe(job_id)
+	return send_file(path, mimetype='application/pdf', as_attachment=True,
+					 download_name=f'moodsync-{timeframe}ly-report.pdf')
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -220,22 +302,29 @@ def dashboard():
 	# Get recent mood history (last week, few items)
 	mood_history = db_manager.get_mood_history(user_id=user_id, days=7, limit=5)
 	
-	# Charts/statistics base window
-	mood_stats = db_manager.get_mood_stats(user_id=user_id, days=30)
-	
-	# Card summary - use a wider window so cards are populated even if last 30d are sparse
-	card_window = db_manager.get_mood_stats(user_id=user_id, days=365)
+	# Charts use the 30-day window; cards use a wider window so they are
+	# populated even if the last 30d are sparse. Both come from one scan.
+	stats_windows = db_manager.get_mood_stats_windows(user_id=user_id, windows=(30, 365))
+	mood_stats = stats_windows[30]
+	card_window = stats_windows[365]
 	card_stats = {
 		'total_entries': card_window.get('total_entries', 0) if isinstance(card_window, dict) else 0,
 		'average_intensity': (card_window.get('average_intensity') or 0.0) if isinstance(card_window, dict) else 0.0,
 		'dominant_emotion': card_window.get('dominant_emotion') if isinstance(card_window, dict) else None,
 		'streak': card_window.get('streak', 0) if isinstance(card_window, dict) else 0,
+		'longest_streak': card_window.get('longest_streak', 0) if isinstance(card_window, dict) else 0,
 	}
 	
+	# Next-mood forecast from the precomputed counts; suggestions ahead of a likely negative mood
+	mood_forecast = db_manager.get_mood_forecast(user_id)
+	proactive_suggestions = suggestion_engine.get_proactive_suggestions(mood_forecast, Config.FORECAST_PROACTIVE_THRESHOLD)
+	
 	return render_template('dashboard.html', 
 						   mood_history=mood_history, 
 						   mood_stats=mood_stats,
-						   card_stats=card_stats)
+						   card_stats=card_stats,
+						   mood_forecast=mood_forecast,
+						   proactive_suggestions=proactive_suggestions)
 
 @app.route('/settings', methods=['GET', 'POST'])
 @login_required
@@ -253,6 +342,7 @@ def settings():
 			last_name = request.form.get('last_name', '').strip()
 			email = request.form.get('email', '').strip()
 			bio = request.form.get('bio', '').strip()
+			timezone_name = request.form.get('timezone', '').strip()
 
 			# Validate inputs
 			if not email:
@@ -260,25 +350,15 @@ def settings():
 				return redirect(url_for('settings'))
 
 			# Update user profile
-			conn = get_db_connection()
-			
 			try:
-				# Check if bio column exists
-				try:
-					conn.execute('SELECT bio FROM users WHERE id = ?', (user_id,))
-				except sqlite3.OperationalError:
-					# Add bio column if it doesn't exist
-					conn.execute('ALTER TABLE users ADD COLUMN bio TEXT')
-				
-				# Update user profile
-				conn.execute('UPDATE users SET first_name = ?, last_name = ?, email = ?, bio = ? WHERE id = ?', 
-							(first_name, last_name, email, bio, user_id))
-				conn.commit()
+				with get_db_connection() as conn:
+					conn.execute('UPDATE users SET first_name = ?, last_name = ?, email = ?, bio = ? WHERE id = ?', 
+								(first_name, last_name, email, bio, user_id))
+				if timezone_name and not db_manager.set_user_timezone(user_id, timezone_name):
+					flash(f'Unknown time zone: {timezone_name}', 'danger')
 				flash('Profile updated successfully', 'success')
 			except sqlite3.Error as e:
 				flash(f'Failed to update profile: {str(e)}', 'danger')
-			
-			conn.close()
 		
 		elif form_type == 'preferences':
 			# Handle preferences form
@@ -287,55 +367,20 @@ def settings():
 			show_suggestions = 'show_suggestions' in request.form
 			
 			# Update preferences in database
-			conn = get_db_connection()
-			
 			try:
-				# Check if preferences exist for user
-				prefs = conn.execute('SELECT * FROM preferences WHERE user_id = ?', (user_id,)).fetchone()
-				
-				if prefs:
-					conn.execute('UPDATE preferences SET theme = ?, dashboard_layout = ?, show_suggestions = ? WHERE user_id = ?',
-								(theme, dashboard_layout, show_suggestions, user_id))
-				else:
-					conn.execute('INSERT INTO preferences (user_id, theme, dashboard_layout, show_suggestions) VALUES (?, ?, ?, ?)',
-								(user_id, theme, dashboard_layout, show_suggestions))
-				
-				conn.commit()
+				with get_db_connection() as conn:
+					# Check if preferences exist for user
+					prefs = conn.execute('SELECT * FROM preferences WHERE user_id = ?', (user_id,)).fetchone()
+					
+					if prefs:
+						conn.execute('UPDATE preferences SET theme = ?, dashboard_layout = ?, show_suggestions = ? WHERE user_id = ?',
+									(theme, dashboard_layout, show_suggestions, user_id))
+					else:
+						conn.execute('INSERT INTO preferences (user_id, theme, dashboard_layout, show_suggestions, language) VALUES (?, ?, ?, ?, ?)',
+									(user_id, theme, dashboard_layout, show_suggestions, request.form.get('language', 'en')))
 				flash('Preferences updated successfully', 'success')
 			except sqlite3.Error as e:
-				# Create preferences table if it doesn't exist
-				conn.executescript('''
-					CREATE TABLE IF NOT EXISTS preferences (
-						id INTEGER PRIMARY KEY AUTOINCREMENT,
-						user_id INTEGER,
-						theme VARCHAR(20) DEFAULT 'light',
-						dashboard_layout VARCHAR(20) DEFAULT 'grid',
-						show_suggestions BOOLEAN DEFAULT 1,
-						language VARCHAR(10) DEFAULT 'en',
-						FOREIGN KEY (user_id) REFERENCES users (id)
-					);
-				''')                
-				conn.executescript('''
-					CREATE TABLE IF NOT EXISTS preferences (
-						id INTEGER PRIMARY KEY AUTOINCREMENT,
-						user_id INTEGER,
-						theme VARCHAR(20) DEFAULT 'light',
-						dashboard_layout VARCHAR(20) DEFAULT 'grid',
-						show_suggestions BOOLEAN DEFAULT 1,
-						language VARCHAR(10) DEFAULT 'en',
-						FOREIGN KEY (user_id) REFERENCES users (id)
-					);
-				''')                
-				# Try again after creating the table
-				try:
-					conn.execute('INSERT INTO preferences (user_id, theme, dashboard_layout, show_suggestions, language) VALUES (?, ?, ?, ?, ?)',
-								(user_id, theme, dashboard_layout, show_suggestions, request.form.get('language', 'en')))
-					conn.commit()
-					flash('Preferences updated successfully', 'success')
-				except sqlite3.Error as e:
-					flash(f'Failed to update preferences: {str(e)}', 'danger')
-			finally:
-				conn.close()
+				flash(f'Failed to update preferences: {str(e)}', 'danger')
 				
 		elif form_type == 'connected_accounts':
 			# Handle connected accounts form
@@ -346,9 +391,8 @@ def settings():
 			flash('Subscription settings updated successfully', 'success')
 			
 		elif form_type == 'download_data':
-			# Handle data download
-			# In a real implementation, you would generate a JSON file with user data
-			flash('Your data is being prepared for download', 'success')
+			# Streamed by /export
+			return redirect(url_for('export_data', format=request.form.get('format', 'ndjson')))
 		
 		elif form_type == 'account':
 			# Handle account updates
@@ -366,58 +410,28 @@ def settings():
 				return redirect(url_for('settings'))
 			
 			# Verify current password
-			conn = get_db_connection()
-			user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-			
-			from werkzeug.security import check_password_hash, generate_password_hash
-			
-			if not check_password_hash(user['password_hash'], current_password):
-				flash('Current password is incorrect', 'danger')
-				conn.close()
-				return redirect(url_for('settings'))
+			with get_db_connection() as conn:
+				user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+				
+				from werkzeug.security import check_password_hash, generate_password_hash
 				
-			# Update password
-			hashed_password = generate_password_hash(new_password)
-			conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed_password, user_id))
-			conn.commit()
-			conn.close()
+				if not check_password_hash(user['password_hash'], current_password):
+					flash('Current password is incorrect', 'danger')
+					return redirect(url_for('settings'))
+					
+				# Update password
+				hashed_password = generate_password_hash(new_password)
+				conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed_password, user_id))
 			
 			flash('Password updated successfully', 'success')
 	
 	# Get user data for the settings page
-	conn = get_db_connection()
-	user_data = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-	
-	# Get user preferences (if preferences table exists)
-	try:
-		user_prefs = conn.execute('SELECT * FROM preferences WHERE user_id = ?', (user_id,)).fetchone()
-	except sqlite3.OperationalError:
-		# If preferences table doesn't exist yet
-		user_prefs = None
-		
-		# Create preferences table
-		conn.executescript('''
-			CREATE TABLE IF NOT EXISTS preferences (
-				id INTEGER PRIMARY KEY AUTOINCREMENT,
-				user_id INTEGER,
-				theme VARCHAR(20) DEFAULT 'light',
-				dashboard_layout VARCHAR(20) DEFAULT 'grid',
-				show_suggestions BOOLEAN DEFAULT 1,
-				language VARCHAR(10) DEFAULT 'en',
-				FOREIGN KEY (user_id) REFERENCES users (id)
-			);
-		''')
-		
-		# Insert default preferences for user
-		conn.execute('INSERT INTO preferences (user_id, theme, dashboard_layout, show_suggestions, language) VALUES (?, ?, ?, ?, ?)',
-					(user_id, 'light', 'standard', 1, 'en'))
-		conn.commit()
-		
-		# Get the newly created preferences
+	with get_db_connection() as conn:
+		user_data = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
 		user_prefs = conn.execute('SELECT * FROM preferences WHERE user_id = ?', (user_id,)).fetchone()
 	
-	conn.close()
-	return render_template('settings.html', user=user_data, preferences=user_prefs)
+	return render_template('settings.html', user=user_data, preferences=user_prefs,
+						   timezones=sorted(available_timezones()), default_timezone=Config.DEFAULT_TIMEZONE)
 		
 @app.route('/detect_emotion', methods=['POST'])
 @login_required
@@ -430,8 +444,8 @@ def detect_emotion():
 	
 	image_data = request.json['image_data']
 	
-	# Detect emotion from image
-	emotion, confidence = emotion_detector.detect_emotion_from_image(image_data)
+	# Detect emotion from image; the full probability vector is stored with the mood
+	emotion, confidence, probabilities, face_box, face_crop = emotion_detector.analyze_face(image_data)
 	
 	if emotion is None:
 		return jsonify({'error': 'No face detected'}), 400
@@ -457,8 +471,12 @@ def detect_emotion():
 	manual_mood = request.json.get('manual_mood')
 	intensity = request.json.get('intensity')
 	
-	# Log mood in database
-	mood_id = db_manager.log_mood(
+	# Get suggestions based on detected emotion
+	suggestions = suggestion_engine.get_suggestions(emotion)
+	
+	# Log the mood and its suggestions in one transaction
+	mood_id, saved = log_mood_entry(
+		suggestions,
 		user_id=user_id,
 		emotion=emotion,
 		confidence=confidence,
@@ -466,14 +484,17 @@ def detect_emotion():
 		intensity=intensity,
 		notes=notes,
 		context=context,
-		image_path=image_path
+		image_path=image_path,
+		probabilities=probabilities
 	)
+	suggestions = [dict(suggestion, id=row['id']) for suggestion, row in zip(suggestions, saved)]
 	
-	# Get suggestions based on detected emotion
-	suggestions = suggestion_engine.get_suggestions(emotion)
-	
-	# Save suggestions to database
-	db_manager.save_suggestions(mood_id, suggestions)
+	# Keep the face crop of a stored image for re-scoring; the mood is saved either way
+	if face_cache is not None and image_path:
+		try:
+			face_cache.append(user_id, mood_id, face_box, face_crop)
+		except OSError as e:
+			app.logger.warning(f"Could not cache face crop of mood {mood_id}: {e}")
 	
 	# Get a personalized quote
 	quote = suggestion_engine.get_personalized_quote(emotion)
@@ -493,9 +514,10 @@ def analytics():
 	user_id = session.get('user_id')
 	
 	# Get mood statistics for different time periods
-	week_stats = db_manager.get_mood_stats(user_id=user_id, days=7)
-	month_stats = db_manager.get_mood_stats(user_id=user_id, days=30)
-	year_stats = db_manager.get_mood_stats(user_id=user_id, days=365)
+	stats_windows = db_manager.get_mood_stats_windows(user_id=user_id, windows=(7, 30, 365))
+	week_stats = stats_windows[7]
+	month_stats = stats_windows[30]
+	year_stats = stats_windows[365]
 	# Context averages for current month by default
 	context_stats = db_manager.get_context_avg_intensity(user_id=user_id, days=30)
 	
@@ -509,6 +531,67 @@ def analytics():
 						   context_stats=context_stats,
 						   suggestion_stats=suggestion_stats)
 
+@app.route('/api/emotion_profile')
+@login_required
+def emotion_profile():
+	# Average model probability per emotion over the user's detected moods in the window
+	user_id = session.get('user_id')
+	days = request.args.get('days', 30, type=int)
+	if days <= 0:
+		return jsonify({'error': 'days must be positive'}), 400
+	return jsonify({'days': days, **db_manager.get_emotion_profile(user_id=user_id, days=days)})
+
+def positive_arg(name, default, limit=3660):
+	# Positive integer query parameter (at most ``limit``), or None if invalid
+	value = request.args.get(name, default, type=int)
+	return value if value is not None and 0 < value <= limit else None
+
+@app.route('/api/analytics/rolling')
+@login_required
+def analytics_rolling():
+	# Mean intensity per day and its trailing mean over ``window`` days (static/js/charts.js)
+	days, window = positive_arg('days', 90), positive_arg('window', 7, 365)
+	if days is None or window is None:
+		return jsonify({'error': 'days and window must be positive'}), 400
+	return jsonify(db_manager.timeseries.rolling_intensity(session.get('user_id'), days, window))
+
+@app.route('/api/analytics/heatmap')
+@login_required
+def analytics_heatmap():
+	# Moods and mean intensity per weekday and hour of the day
+	days = positive_arg('days', 90)
+	if days is None:
+		return jsonify({'error': 'days must be positive'}), 400
+	return jsonify(db_manager.timeseries.heatmap(session.get('user_id'), days))
+
+@app.route('/api/analytics/transitions')
+@login_required
+def analytics_transitions():
+	# Emotion-to-next-emotion counts and probabilities
+	days = positive_arg('days', 90)
+	if days is None:
+		return jsonify({'error': 'days must be positive'}), 400
+	return jsonify(db_manager.timeseries.transitions(session.get('user_id'), days))
+
+@app.route('/api/analytics/weekly')
+@login_required
+def analytics_weekly():
+	# Week-by-week entries, intensity and emotion shares with their changes
+	weeks = positive_arg('weeks', 12, 520)
+	if weeks is None:
+		return jsonify({'error': 'weeks must be positive'}), 400
+	return jsonify(db_manager.timeseries.weekly(session.get('user_id'), weeks))
+
+@app.route('/api/forecast')
+@login_required
+def next_mood_forecast():
+	# Likely next mood (None before any mood) and suggestions ahead of a negative one
+	forecast = db_manager.get_mood_forecast(session.get('user_id'))
+	return jsonify({
+		'forecast': forecast,
+		'suggestions': suggestion_engine.get_proactive_suggestions(forecast, Config.FORECAST_PROACTIVE_THRESHOLD),
+	})
+
 @app.route('/mood_logger')
 def mood_logger():
 	# Check if user is logged in
@@ -552,9 +635,16 @@ def save_mood():
 	image_data = data.get('image')
 	context = data.get('context')
 	
+	# The model's output from /api/detect-emotion, when the entry came from a detection
+	probabilities = data.get('probabilities')
+	
 	# Validate required fields
 	if not emotion:
 		return jsonify({'error': 'Emotion is required'}), 400
+	try:
+		emotion_vectors.encode(probabilities)
+	except (TypeError, ValueError) as e:
+		return jsonify({'error': f'Invalid probabilities: {e}'}), 400
 	
 	try:
 		# Save image if provided
@@ -573,19 +663,18 @@ def save_mood():
 			# Use relative path for database
 			image_path = os.path.join('uploads', filename)
 		
-		# Connect to database
-		conn = get_db_connection()
-		cursor = conn.cursor()
-		
-		# Insert mood entry
-		cursor.execute('''
-			INSERT INTO moods (user_id, detected_emotion, confidence_score, intensity, notes, context, image_path, timestamp)
-			VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-		''', (user_id, emotion, confidence_score, intensity, notes, context, image_path, datetime.now()))
-		
-		# Commit changes and close connection
-		conn.commit()
-		conn.close()
+		# Insert mood entry (rollups are updated in the same transaction)
+		log_mood_entry(
+			[],
+			user_id=user_id,
+			emotion=emotion,
+			confidence=confidence_score,
+			intensity=intensity,
+			notes=notes,
+			context=context,
+			image_path=image_path,
+			probabilities=probabilities
+		)
 		
 		return jsonify({'success': True, 'message': 'Mood entry saved successfully'})
 	
@@ -598,13 +687,14 @@ def mood_log():
 	# Get user ID from session
 	user_id = session.get('user_id')
 	
-	# Get all mood entries for the user
+	# First page of mood entries; more are loaded from /mood_log_rows
 	# Default to 30 days, but allow query parameter to change the timeframe
 	days = request.args.get('days', 30, type=int)
 	emotion = request.args.get('emotion') or None
-	mood_entries = db_manager.get_mood_history(user_id=user_id, days=days, emotion=emotion)
+	mood_entries, cursor = db_manager.get_mood_page(user_id=user_id, days=days, emotion=emotion)
 	
-	return render_template('mood_log.html', mood_entries=mood_entries, days=days, emotion=emotion)
+	return render_template('mood_log.html', mood_entries=mood_entries, next_cursor=encode_cursor(cursor),
+						   days=days, emotion=emotion)
 
 @app.route('/mood_log_partial')
 @login_required
@@ -612,8 +702,68 @@ def mood_log_partial():
 	user_id = session.get('user_id')
 	days = request.args.get('days', 30, type=int)
 	emotion = request.args.get('emotion') or None
-	mood_entries = db_manager.get_mood_history(user_id=user_id, days=days, emotion=emotion)
-	return render_template('partials/mood_table.html', mood_entries=mood_entries)
+	mood_entries, cursor = db_manager.get_mood_page(user_id=user_id, days=days, emotion=emotion)
+	return render_template('partials/mood_table.html', mood_entries=mood_entries, next_cursor=encode_cursor(cursor))
+
+@app.route('/mood_log_rows')
+@login_required
+def mood_log_rows():
+	# "Load more": table rows after the cursor; the next cursor is in X-Next-Cursor
+	user_id = session.get('user_id')
+	days = request.args.get('days', 30, type=int)
+	emotion = request.args.get('emotion') or None
+	before = decode_cursor(request.args.get('cursor', ''))
+	if before is None:
+		return jsonify({'error': 'Invalid cursor'}), 400
+	
+	mood_entries, cursor = db_manager.get_mood_page(user_id=user_id, days=days, emotion=emotion, before=before)
+	response = app.make_response(render_template('partials/mood_rows.html', mood_entries=mood_entries))
+	response.headers['X-Next-Cursor'] = encode_cursor(cursor) or ''
+	return response
+
+@app.route('/export')
+@login_required
+def export_data():
+	# Stream the user's profile, moods, suggestions and ratings; zip adds the images
+	user_id = session.get('user_id')
+	fmt = request.args.get('format', 'ndjson')
+	records = db_manager.iter_user_export(user_id)
+	
+	if fmt == 'csv':
+		body, mimetype = export.csv_lines(records), 'text/csv'
+	elif fmt == 'zip':
+		body = export.zip_chunks(records, db_manager.iter_user_images(user_id), app.config['UPLOAD_FOLDER'])
+		mimetype = 'application/zip'
+	elif fmt == 'ndjson':
+		body, mimetype = export.ndjson_lines(records), 'application/x-ndjson'
+	else:
+		return jsonify({'error': f'Unknown export format: {fmt}'}), 400
+	
+	filename = f"moodsync-export-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+	return Response(stream_with_context(body), mimetype=mimetype,
+					headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/import', methods=['POST'])
+@login_required
+def import_data():
+	# Bulk-load mood history from a CSV or NDJSON file (a MoodSync export or another tracker's)
+	user_id = session.get('user_id')
+	upload = request.files.get('file')
+	if upload is None or not upload.filename:
+		return jsonify({'success': False, 'error': 'No file provided'}), 400
+	fmt = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+	fmt = {'jsonl': 'ndjson', 'json': 'ndjson'}.get(fmt, fmt)
+	if fmt not in importer.FORMATS:
+		return jsonify({'success': False, 'error': f'Unknown import format: {fmt}'}), 400
+	
+	# Read from the upload a line at a time; utf-8-sig drops a spreadsheet's byte order mark
+	stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+	try:
+		report = importer.import_stream(db_manager, user_id, stream, fmt)
+	except (UnicodeDecodeError, csv.Error) as e:
+		# Earlier batches are committed; importing the fixed file again skips them
+		return jsonify({'success': False, 'error': f'Could not read the file: {e}'}), 400
+	return jsonify({'success': True, **report})
 
 @app.route('/suggestions')
 @login_required
@@ -632,12 +782,11 @@ def suggestions():
 	emotion = recent_mood['detected_emotion']
 	
 	# Try to load existing suggestions for this mood from DB (to get IDs)
-	db_suggestions = db_manager.get_suggestions_by_mood(recent_mood['id']) if 'id' in recent_mood else []
+	db_suggestions = db_manager.get_suggestions_by_mood(recent_mood['id'], user_id) if 'id' in recent_mood else []
 	if not db_suggestions:
 		# Generate and persist if none exist yet
 		generated = suggestion_engine.get_suggestions(emotion)
-		db_manager.save_suggestions(recent_mood['id'], generated)
-		db_suggestions = db_manager.get_suggestions_by_mood(recent_mood['id'])
+		db_suggestions = db_manager.save_suggestions(recent_mood['id'], generated, user_id)
 
 	# Normalize for template: use keys 'id', 'type', 'content'
 	suggestions_norm = [{
@@ -694,7 +843,7 @@ def detect_emotion_api():
 	try:
 		# Process the image data with the emotion detection model
 		image_data = data['image']
-		emotion, confidence = emotion_detector.detect_emotion_from_image(image_data)
+		emotion, confidence, probabilities = emotion_detector.analyze_image(image_data)
 		
 		if emotion is None:
 			return jsonify({
@@ -705,12 +854,28 @@ def detect_emotion_api():
 		return jsonify({
 			"success": True,
 			"emotion": emotion,
-			"confidence": confidence
+			"confidence": confidence,
+			"probabilities": dict(zip(Config.EMOTION_LABELS, probabilities))
 		})
 	except Exception as e:
 		app.logger.error(f"Error in emotion detection: {str(e)}")
 		return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metrics')
+@login_required
+def metrics():
+	# Process-local counters: analytics cache, time-series series and, when enabled, cascade inference, the write queue and the last maintenance run and backup
+	data = {'analytics_cache': db_manager.cache.snapshot(), 'timeseries': db_manager.timeseries.snapshot()}
+	if emotion_detector.classifier is not None:
+		data['cascade'] = emotion_detector.classifier.stats.snapshot()
+	if write_queue is not None:
+		data['write_queue'] = write_queue.snapshot()
+	if maintenance_job.last_report is not None:
+		data['maintenance'] = maintenance_job.last_report
+	if backup_service.last_report is not None:
+		data['backup'] = backup_service.last_report
+	return jsonify(data)
+
 @app.route('/api/ai-chat', methods=['POST'])
 @login_required
 def ai_chat():
@@ -0,0 +1,103 @@
+"""Requests/sec of the dashboard and mood-logging database paths.
+
+Compares the old behaviour (a fresh sqlite3 connection per call with
+default pragmas) against the pooled WAL connections DatabaseManager
+uses now. Runs against a throwaway database seeded with synthetic moods:
+
+    python benchmarks/bench_db_paths.py --moods 20000 --threads 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+
+
+class PerCallDatabaseManager(DatabaseManager):
+    """Previous behaviour: open, use and close a connection for every call."""
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def seed(db, moods, users):
+    with db.connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+            [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)])
+        rows = []
+        for _ in range(moods):
+            days_ago = random.random() * 400
+            rows.append((random.randint(1, users), random.choice(Config.EMOTION_LABELS), random.random(),
+                         random.randint(1, 10), random.choice(['Work', 'Home', None]), f'-{days_ago} days'))
+        conn.executemany('''
+            INSERT INTO moods (user_id, detected_emotion, confidence_score, intensity, context, timestamp, ts_epoch, local_day)
+            VALUES (?1, ?2, ?3, ?4, ?5, datetime('now', ?6), CAST(strftime('%s', 'now', ?6) AS INTEGER), date('now', ?6))
+        ''', rows)
+
+
+def dashboard_path(db, user_id):
+    db.get_mood_history(user_id=user_id, days=7, limit=5)
+    db.get_mood_stats(user_id=user_id, days=30)
+    db.get_mood_stats(user_id=user_id, days=365)
+
+
+def logging_path(db, user_id):
+    db.log_mood_with_suggestions([{'type': 'activities', 'content': 'Go for a walk'}] * 3,
+                                 user_id=user_id, emotion='Happy', confidence=0.9, intensity=5)
+
+
+def run(db, path, users, threads, seconds):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            path(db, random.randint(1, users))
+            counts[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moods', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'path':<12}{'req/s':>10}")
+    for name, cls in [('per-call', PerCallDatabaseManager), ('pooled', DatabaseManager)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = cls(os.path.join(tmp, 'bench.db'))
+            seed(db, args.moods, args.users)
+            for label, path in [('dashboard', dashboard_path), ('logging', logging_path)]:
+                rate = run(db, path, args.users, args.threads, args.seconds)
+                print(f"{name:<10}{label:<12}{rate:>10.1f}")
+            db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
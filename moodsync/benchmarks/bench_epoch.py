@@ -0,0 +1,108 @@
+"""Range scans on text timestamps vs the integer ts_epoch column.
+
+Seeds --users users with --moods entries each over the last two years,
+then prints the query plan and median time of each mood range query
+written the old way (text timestamp compared with datetime('now', ...),
+grouped by date(timestamp), over the old (user_id, timestamp) index)
+and the new way (bound ts_epoch bounds, grouped by the stored local_day,
+over (user_id, ts_epoch)).
+
+    python benchmarks/bench_epoch.py --users 50 --moods 4000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+
+# (name, legacy query and params, epoch query and params); {start} is now - days
+QUERIES = [
+    ('7-day history', '''
+        SELECT * FROM moods WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
+        ORDER BY timestamp DESC
+    ''', (7,), '''
+        SELECT * FROM moods WHERE user_id = ? AND ts_epoch >= ? ORDER BY ts_epoch DESC
+    ''', 7),
+    ('30-day count/avg', '''
+        SELECT COUNT(*), AVG(intensity) FROM moods
+        WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
+    ''', (30,), '''
+        SELECT COUNT(*), AVG(intensity) FROM moods WHERE user_id = ? AND ts_epoch >= ?
+    ''', 30),
+    ('365-day daily avg', '''
+        SELECT date(timestamp), AVG(intensity) FROM moods
+        WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
+        GROUP BY date(timestamp)
+    ''', (365,), '''
+        SELECT local_day, AVG(intensity) FROM moods WHERE user_id = ? AND ts_epoch >= ?
+        GROUP BY local_day
+    ''', 365),
+    ('day filter', '''
+        SELECT COUNT(*) FROM moods WHERE user_id = ? AND date(timestamp) = date('now', '-' || ? || ' days')
+    ''', (3,), '''
+        SELECT COUNT(*) FROM moods WHERE user_id = ? AND ts_epoch >= ? AND ts_epoch < ? + 86400
+    ''', 3),
+]
+
+
+def seed(db, users, moods):
+    with db.connection() as conn:
+        conn.executemany('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                         [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)])
+        for user_id in range(1, users + 1):
+            conn.executemany('''
+                INSERT INTO moods (user_id, detected_emotion, intensity, notes, timestamp, ts_epoch, local_day)
+                VALUES (?1, ?2, ?3, ?4, datetime('now', ?5), CAST(strftime('%s', 'now', ?5) AS INTEGER), date('now', ?5))
+            ''', [(user_id, random.choice(Config.EMOTION_LABELS), random.randint(1, 10), 'note ' * random.randint(0, 20),
+                   f'-{random.randrange(730 * 1440)} minutes') for _ in range(moods)])
+
+
+def timed(conn, query, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return len(rows), statistics.median(samples)
+
+
+def plan(conn, query, params):
+    return ' | '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--moods', type=int, default=4000, help='Moods per user')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        seed(db, args.users, args.moods)
+        user_id = args.users // 2
+        with db.connection() as conn:
+            # The index the legacy queries used before migration 7
+            conn.execute('CREATE INDEX idx_moods_user_timestamp ON moods (user_id, timestamp)')
+            conn.execute('ANALYZE')
+            print(f"{args.users * args.moods} moods, {args.moods} for the measured user")
+            for name, legacy, legacy_params, epoch, days in QUERIES:
+                start = int(time.time()) - days * 86400
+                epoch_params = (user_id, start, start) if epoch.count('?') == 3 else (user_id, start)
+                legacy_rows, legacy_ms = timed(conn, legacy, (user_id, *legacy_params), args.repeat)
+                epoch_rows, epoch_ms = timed(conn, epoch, epoch_params, args.repeat)
+                print(f"\n{name}: text {legacy_ms:.2f} ms ({legacy_rows} rows), epoch {epoch_ms:.2f} ms ({epoch_rows} rows)")
+                print(f"  text:  {plan(conn, legacy, (user_id, *legacy_params))}")
+                print(f"  epoch: {plan(conn, epoch, epoch_params)}")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Next-mood forecast: training cost per insert, full recount and lookup.
+
+Seeds one user with --moods entries over --span days, then times
+log_mood with the forecast update and with it switched off (the
+difference is the incremental training cost), a full recount of the
+user's counts from the moods (``forecast.rebuild``, what backdated moods,
+imports and rebuild-rollups pay, and roughly what computing the forecast
+per request would cost) and a forecast lookup, raw and through
+DatabaseManager.get_mood_forecast. The incrementally updated counts are
+compared with the recount.
+
+    python benchmarks/bench_forecast.py --moods 300000 --timezone Europe/Berlin
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models import forecast
+from models.database import DatabaseManager
+
+
+def seed(db, moods, span, zone_name):
+    rng = random.Random(0)
+    now = int(time.time())
+    with db.connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@example.com', 'x')")
+        conn.execute('UPDATE users SET timezone = ? WHERE id = 1', (zone_name,))
+        stamps = sorted(now - rng.randrange(span * 86400) for _ in range(moods))
+        conn.executemany('''
+            INSERT INTO moods (user_id, detected_emotion, intensity, timestamp, ts_epoch, local_day)
+            VALUES (1, ?, ?, datetime(?, 'unixepoch'), ?, date(?, 'unixepoch'))
+        ''', [(rng.choice(Config.EMOTION_LABELS), rng.choice([None, *range(1, 11)]), ts, ts, ts) for ts in stamps])
+    db.rebuild_rollups(1)
+
+
+def timed(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times)
+
+
+def log_times(db, count, emotions):
+    times = []
+    for n in range(count):
+        start = time.perf_counter()
+        db.log_mood(user_id=1, emotion=emotions[n % len(emotions)], intensity=5)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def stored(db):
+    with db.connection(1) as conn:
+        row = conn.execute('SELECT last_mood_id, counts FROM mood_forecast WHERE user_id = 1').fetchone()
+    return row['last_mood_id'], bytes(row['counts'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moods', type=int, default=300000)
+    parser.add_argument('--span', type=int, default=3 * 365, help='Days the moods are spread over')
+    parser.add_argument('--timezone', default='UTC')
+    parser.add_argument('--inserts', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        seed(db, args.moods, args.span, args.timezone)
+        zone = db.user_zone(1)
+
+        with db.connection(1) as conn:
+            _, ms = timed(lambda: forecast.rebuild(conn, 1, zone), 3)
+        print(f"full recount     {ms:8.1f} ms  ({args.moods} moods)")
+
+        emotions = Config.EMOTION_LABELS
+        record = forecast.record
+        forecast.record = lambda *args: None
+        try:
+            without = log_times(db, args.inserts, emotions)
+        finally:
+            forecast.record = record
+        with db.connection(1) as conn:
+            forecast.rebuild(conn, 1, zone)
+        with_forecast = log_times(db, args.inserts, emotions)
+        print(f"log_mood         {without:8.3f} ms without forecast, {with_forecast:8.3f} ms with "
+              f"(+{with_forecast - without:.3f} ms, median of {args.inserts})")
+
+        incremental = stored(db)
+        with db.connection(1) as conn:
+            forecast.rebuild(conn, 1, zone)
+        print(f"incremental counts equal recount: {incremental == stored(db)} ({len(incremental[1])} bytes)")
+
+        with db.connection(1) as conn:
+            _, ms = timed(lambda: [forecast.predict(conn, 1, zone) for _ in range(1000)])
+        print(f"predict          {ms:8.3f} us")
+        _, ms = timed(lambda: [db.get_mood_forecast(1) for _ in range(1000)])
+        print(f"get_mood_forecast {ms:7.3f} us  (with the user's time zone lookup)")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
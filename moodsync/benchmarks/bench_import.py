@@ -0,0 +1,84 @@
+"""Bulk import throughput: importer.import_stream vs log_mood per row.
+
+Writes a CSV of --rows moods (one every few hours over the years before
+now, a fifth with notes) and imports it into an empty database through
+importer.import_stream, printing rows/s for reading and validating
+alone and for the whole import, then logs --baseline of the same rows
+with log_mood one at a time for comparison. A second import of the file
+shows the cost of skipping rows that are already there.
+
+    python benchmarks/bench_import.py --rows 300000 --timezone Europe/Berlin
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from models import importer, timezones
+from models.database import DatabaseManager
+
+EMOTIONS = ['happy', 'sad', 'calm', 'Angry', 'anxious', 'Neutral', 'surprised']
+CONTEXTS = ['work', 'home', 'family', 'exercise', '']
+
+
+def write_csv(path, count):
+    rng = random.Random(0)
+    now = int(time.time())
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'emotion', 'intensity', 'notes', 'context'])
+        for n in range(count):
+            writer.writerow([time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now - n * 500)), rng.choice(EMOTIONS),
+                             rng.randint(1, 10), 'felt tired after work' if rng.random() < 0.2 else '',
+                             rng.choice(CONTEXTS)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--baseline', type=int, default=5000, help='Rows logged with log_mood for comparison')
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--timezone', default='UTC')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'moods.csv')
+        write_csv(path, args.rows)
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        with db.connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash, timezone) "
+                         "VALUES (1, 'u', 'u@example.com', 'x', ?)", (args.timezone,))
+            conn.execute('UPDATE users SET timezone = ? WHERE id = 1', (args.timezone,))
+
+        with open(path, newline='') as stream:
+            start = time.perf_counter()
+            count = sum(1 for _ in importer.rows(stream, 'csv', db.user_zone(1), importer.ImportErrors()))
+            print(f"read + validate  {count / (time.perf_counter() - start):9.0f} rows/s")
+        for label in ('import', 're-import'):
+            with open(path, newline='') as stream:
+                report = importer.import_stream(db, 1, stream, 'csv', args.batch_size)
+            print(f"{label:<16} {report['rows_per_s']:9.0f} rows/s  ({report['imported']} imported, "
+                  f"{report['duplicates'] + report['repeated']} skipped, {report['duration_s']}s)")
+
+        rows = []
+        with open(path, newline='') as stream:
+            for row in importer.rows(stream, 'csv', db.user_zone(1), importer.ImportErrors()):
+                rows.append(row)
+                if len(rows) == args.baseline:
+                    break
+        start = time.perf_counter()
+        for emotion, confidence, manual, intensity, notes, context, stamp, _, _ in rows:
+            db.log_mood(user_id=2, emotion=emotion, confidence=confidence, manual_mood=manual, intensity=intensity,
+                        notes=notes, context=context, timestamp=stamp)
+        print(f"log_mood         {len(rows) / (time.perf_counter() - start):9.0f} rows/s")
+        print(f"rollup mismatches: {len(db.check_rollups())}")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
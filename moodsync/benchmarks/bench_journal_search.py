@@ -0,0 +1,105 @@
+"""Journal search latency: FTS5 vs a LIKE scan of the user's rows.
+
+Seeds --users users with --entries journal entries each (random words
+from a small vocabulary, so common words match a large share of a
+user's entries), then prints the median time of a page of results for
+common, rare, prefix and multi-word queries through
+DatabaseManager.search_journal, next to a LIKE '%word%' scan over the
+same user's entries (newest first, unranked, stopping at a page).
+
+    python benchmarks/bench_journal_search.py --users 20 --entries 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from models import journal
+from models.database import DatabaseManager
+
+COMMON = ['today', 'work', 'felt', 'tired', 'happy', 'sleep', 'friends', 'walk', 'family', 'stress']
+RARE = ['presentation', 'birthday', 'hospital', 'promotion', 'wedding', 'exam', 'concert', 'argument']
+FILLER = ['the', 'a', 'and', 'was', 'with', 'after', 'before', 'about', 'very', 'quite', 'really', 'some']
+
+QUERIES = [
+    ('common word', 'work', 'work'),
+    ('rare word', 'wedding', 'wedding'),
+    ('2-letter prefix', 'fa*', 'fa'),
+    ('3-letter prefix', 'pro*', 'pro'),
+    ('two words', 'tired sleep', 'tired'),
+]
+
+
+def entry(rng):
+    words = rng.choices(FILLER, k=12) + rng.choices(COMMON, k=4)
+    if rng.random() < 0.02:
+        words.append(rng.choice(RARE))
+    rng.shuffle(words)
+    return ' '.join(words)
+
+
+def seed(db, users, entries):
+    rng = random.Random(0)
+    now = int(time.time())
+    with db.connection() as conn:
+        conn.executemany('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                         [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)])
+        for user_id in range(1, users + 1):
+            rows = []
+            for _ in range(entries):
+                ts = now - rng.randrange(730 * 86400)
+                rows.append((user_id, entry(rng), time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts)), ts,
+                             time.strftime('%Y-%m-%d', time.gmtime(ts))))
+            conn.executemany('''
+                INSERT INTO journal_entries (user_id, content, timestamp, ts_epoch, local_day) VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        conn.execute("INSERT INTO journal_search (journal_search) VALUES ('optimize')")
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=20000, help='Journal entries per user')
+    parser.add_argument('--page', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        start = time.perf_counter()
+        seed(db, args.users, args.entries)
+        print(f"{args.users * args.entries} entries seeded and indexed in {time.perf_counter() - start:.1f}s, "
+              f"{args.entries} for the measured user")
+        user_id = args.users // 2
+        with db.connection() as conn:
+            for name, query, word in QUERIES:
+                (results, _), fts_ms = timed(lambda: db.search_journal(user_id, query, limit=args.page), args.repeat)
+                like = lambda: conn.execute('''
+                    SELECT id, content FROM journal_entries WHERE user_id = ? AND content LIKE ?
+                    ORDER BY ts_epoch DESC LIMIT ?
+                ''', (user_id, f'%{word}%', args.page)).fetchall()
+                _, like_ms = timed(like, args.repeat)
+                matches = conn.execute('''
+                    SELECT COUNT(*) FROM journal_search WHERE journal_search MATCH ? AND rowid BETWEEN ? AND ?
+                ''', (journal.match_query(query), user_id << 32, ((user_id + 1) << 32) - 1)).fetchone()[0]
+                print(f"{name:<16} fts5 {fts_ms:7.2f} ms  like {like_ms:7.2f} ms  "
+                      f"({matches} matches, {len(results)} on the page)")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
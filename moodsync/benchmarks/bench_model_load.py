@@ -0,0 +1,55 @@
+"""Cold-start model load time: H5 weights vs the flat memory-mapped format.
+
+Each load runs in a fresh interpreter so the numbers include what a
+process start actually pays. Export the flat weights first:
+
+    python manage.py export-weights
+    python benchmarks/bench_model_load.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+
+SNIPPET = '''
+import time
+import tensorflow  # imported before timing so only the model load is measured
+from models.weight_store import load_model
+start = time.perf_counter()
+load_model({json!r}, {h5!r}, {weights!r})
+print(time.perf_counter() - start)
+'''
+
+
+def time_load(h5_path, weights_path):
+    code = SNIPPET.format(json=Config.MODEL_JSON_PATH, h5=h5_path, weights=weights_path)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [
+        ('h5', Config.MODEL_H5_PATH, None),
+        ('flat', None, Config.MODEL_WEIGHTS_PATH),
+    ]
+    print(f"{'format':<8}{'median (ms)':>14}{'min (ms)':>12}{'max (ms)':>12}")
+    for name, h5_path, weights_path in variants:
+        path = h5_path or weights_path
+        if not os.path.exists(path):
+            print(f"{name:<8}  missing {path}")
+            continue
+        samples = [time_load(h5_path, weights_path) * 1000 for _ in range(args.runs)]
+        print(f"{name:<8}{statistics.median(samples):>14.1f}{min(samples):>12.1f}{max(samples):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
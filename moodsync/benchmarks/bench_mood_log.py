@@ -0,0 +1,70 @@
+"""Mood log latency vs history size: whole window vs keyset pages.
+
+For each history size, seeds one user with that many moods over the last
+year and times what /mood_log?days=365 used to load (every row in the
+window with SELECT *) against the first page and a page deep in the
+history from get_mood_page. The analytics cache is disabled.
+
+    python benchmarks/bench_mood_log.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+
+
+def seed(db, user_id, moods):
+    with db.connection() as conn:
+        conn.execute('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                     (user_id, 'bench', 'bench@example.com', 'x'))
+        conn.executemany('''
+            INSERT INTO moods (user_id, detected_emotion, confidence_score, intensity, notes, timestamp, ts_epoch, local_day)
+            VALUES (?1, ?2, ?3, ?4, ?5, datetime('now', ?6), CAST(strftime('%s', 'now', ?6) AS INTEGER), date('now', ?6))
+        ''', [(user_id, random.choice(Config.EMOTION_LABELS), random.random(), random.randint(1, 10),
+               'note ' * random.randint(0, 40), f'-{random.randrange(364 * 1440)} minutes') for _ in range(moods)])
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'moods':>8}{'whole window':>15}{'first page':>13}{'deep page':>12}  (ms)")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+            db.cache.max_entries = 0
+            seed(db, 2, size)
+
+            # Cursor of the page halfway down the history
+            with db.connection() as conn:
+                middle = conn.execute('SELECT ts_epoch, id FROM moods WHERE user_id = 2 ORDER BY ts_epoch DESC, id DESC '
+                                      'LIMIT 1 OFFSET ?', (size // 2,)).fetchone()
+
+            whole = timed(lambda: db.get_mood_history(user_id=2, days=365), args.repeat)
+            first = timed(lambda: db.get_mood_page(user_id=2, days=365), args.repeat)
+            deep = timed(lambda: db.get_mood_page(user_id=2, days=365, before=tuple(middle)), args.repeat)
+            print(f"{size:>8}{whole:>15.2f}{first:>13.2f}{deep:>12.2f}")
+            db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
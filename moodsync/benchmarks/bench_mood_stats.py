@@ -0,0 +1,109 @@
+"""Analytics-page statistics: per-window raw queries vs get_mood_stats_windows.
+
+Seeds one synthetic user with --moods entries spread over --span days and
+times the analytics page's 7/30/365-day statistics computed the old way
+(five queries per window over raw moods) against get_mood_stats_windows,
+which reads the daily rollups. Both results are compared for equality.
+
+    python benchmarks/bench_mood_stats.py --moods 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+
+WINDOWS = (7, 30, 365)
+
+
+def legacy_mood_stats(conn, user_id, days):
+    """The previous get_mood_stats: five queries per window (with whole-day windows)."""
+    clause = "timestamp >= date('now', '-' || ? || ' days')"
+    emotion_counts = [dict(r) for r in conn.execute(f'''
+        SELECT detected_emotion, COUNT(*) as count FROM moods WHERE user_id = ? AND {clause}
+        GROUP BY detected_emotion ORDER BY count DESC''', (user_id, days))]
+    daily = conn.execute(f'''
+        SELECT date(timestamp) as date, AVG(intensity) as avg_intensity FROM moods
+        WHERE user_id = ? AND {clause} AND intensity IS NOT NULL GROUP BY date(timestamp) ORDER BY date''',
+        (user_id, days)).fetchall()
+    total = conn.execute(f'SELECT COUNT(*) FROM moods WHERE user_id = ? AND {clause}', (user_id, days)).fetchone()[0]
+    avg = conn.execute(f'SELECT AVG(intensity) FROM moods WHERE user_id = ? AND {clause} AND intensity IS NOT NULL',
+                       (user_id, days)).fetchone()[0]
+    days_set = {r[0] for r in conn.execute('''
+        SELECT date(timestamp) as day FROM moods WHERE user_id = ? AND timestamp >= date('now', '-365 day')
+        GROUP BY date(timestamp)''', (user_id,))}
+    streak, current = 0, date.today()
+    while current.strftime('%Y-%m-%d') in days_set:
+        streak += 1
+        current -= timedelta(days=1)
+    return {
+        'emotion_counts': emotion_counts,
+        'daily_averages': {r[0]: float(r[1]) for r in daily},
+        'total_entries': total,
+        'average_intensity': float(avg) if avg is not None else 0.0,
+        'dominant_emotion': emotion_counts[0]['detected_emotion'] if emotion_counts else None,
+        'streak': streak,
+    }
+
+
+def seed(db, user_id, moods, span):
+    with db.connection() as conn:
+        conn.execute('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                     (user_id, 'bench', 'bench@example.com', 'x'))
+        # Integer intensities and minute offsets keep both code paths' float sums exact
+        conn.executemany('''
+            INSERT INTO moods (user_id, detected_emotion, intensity, timestamp)
+            VALUES (?, ?, ?, datetime('now', ?))
+        ''', [(user_id, random.choice(Config.EMOTION_LABELS), random.choice([None, *range(1, 11)]),
+               f'-{random.randrange(span * 1440)} minutes') for _ in range(moods)])
+    db.rebuild_rollups(user_id)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moods', type=int, default=100000)
+    parser.add_argument('--span', type=int, default=730, help='Days of history to spread entries over')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        seed(db, 2, args.moods, args.span)
+
+        with db.connection() as conn:
+            legacy, legacy_ms = timed(lambda: {d: legacy_mood_stats(conn, 2, d) for d in WINDOWS}, args.repeat)
+        current, current_ms = timed(lambda: db.get_mood_stats_windows(user_id=2, windows=WINDOWS), args.repeat)
+
+        def comparable(stats):
+            # Streaks differ by design: the legacy walk only looked back one year
+            return {d: {**{k: v for k, v in s.items() if k not in ('streak', 'longest_streak')},
+                        'emotion_counts': sorted((e['detected_emotion'], e['count']) for e in s['emotion_counts'])}
+                    for d, s in stats.items()}
+
+        print(f"{args.moods} moods over {args.span} days, windows {WINDOWS}")
+        print(f"per-window queries (15 scans): {legacy_ms:8.1f} ms")
+        print(f"daily rollups:                 {current_ms:8.1f} ms")
+        print(f"results identical: {comparable(legacy) == comparable(current)}")
+        print(f"streak: legacy {legacy[WINDOWS[0]]['streak']} (one-year lookback), stored {current[WINDOWS[0]]['streak']}")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Concurrent mood logging: one database file vs per-user shards.
+
+--writers writers, each logging moods (with three suggestions) as its
+own user for --seconds, against DatabaseManager in single and sharded
+storage modes. Each request commits on its own, so in single mode the
+writers queue on one file's write lock; in sharded mode they spread
+over --shards files. Writers are threads of one process by default;
+--processes runs each in its own process, like several app workers
+(in one process the GIL caps both modes). --synchronous FULL makes
+every commit fsync.
+
+    python benchmarks/bench_sharding.py --writers 8 --processes --synchronous FULL
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+
+SUGGESTIONS = [{'type': 'activities', 'content': 'Go for a walk'}] * 3
+
+
+def open_db(tmp, mode, shards):
+    return DatabaseManager(os.path.join(tmp, 'main.db'), storage_mode=mode,
+                           shard_dir=os.path.join(tmp, 'shards'), shard_count=shards)
+
+
+def write_loop(db, user_id, deadline):
+    count = errors = 0
+    while time.time() < deadline:
+        try:
+            db.log_mood_with_suggestions(SUGGESTIONS, user_id=user_id, emotion='Happy', confidence=0.9, intensity=5)
+            count += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    return count, errors
+
+
+def process_writer(tmp, mode, shards, synchronous, user_id, deadline, results):
+    Config.SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'synchronous': synchronous}
+    results.put(write_loop(open_db(tmp, mode, shards), user_id, deadline))
+
+
+def run(tmp, mode, args):
+    deadline = time.time() + 1 + args.seconds  # a second for processes to start
+    if args.processes:
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=process_writer, args=(tmp, mode, args.shards, args.synchronous,
+                                                                        i + 1, deadline, results))
+                   for i in range(args.writers)]
+        for w in workers:
+            w.start()
+        totals = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+    else:
+        db = open_db(tmp, mode, args.shards)
+        totals = []
+        threads = [threading.Thread(target=lambda i=i: totals.append(write_loop(db, i + 1, deadline)))
+                   for i in range(args.writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return sum(c for c, _ in totals) / args.seconds, sum(e for _, e in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--processes', action='store_true', help='One process per writer instead of threads')
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--synchronous', default=Config.SQLITE_PRAGMAS['synchronous'])
+    args = parser.parse_args()
+    Config.SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'synchronous': args.synchronous}
+
+    print(f"{args.writers} writer {'processes' if args.processes else 'threads'}, synchronous={args.synchronous}")
+    for mode in ('single', 'sharded'):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = open_db(tmp, mode, args.shards)
+            with db.connection() as conn:
+                conn.executemany('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                                 [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, args.writers + 1)])
+            rate, errors = run(tmp, mode, args)
+            label = f'sharded x{args.shards}' if mode == 'sharded' else 'single'
+            print(f"{label:<12}{rate:10.1f} moods/s, {errors} errors")
+            for pool in db.all_pools():
+                pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Time-series analytics: loading, incremental updates and the vectorized analyses.
+
+Seeds one user with --moods entries over --span days and times the
+TimeSeriesEngine: the first (full) load of the series, a read after one
+new mood (incremental append), and each analysis on the loaded series,
+next to the same heatmap and transition counts computed with a Python
+loop over the rows (results are compared for equality).
+
+    python benchmarks/bench_timeseries.py --moods 300000 --timezone Europe/Berlin
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models import timeseries
+from models.database import DatabaseManager
+
+
+def seed(db, moods, span, zone_name):
+    rng = random.Random(0)
+    now = int(time.time())
+    with db.connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@example.com', 'x')")
+        conn.execute('UPDATE users SET timezone = ? WHERE id = 1', (zone_name,))
+        stamps = sorted(now - rng.randrange(span * 86400) for _ in range(moods))
+        conn.executemany('''
+            INSERT INTO moods (user_id, detected_emotion, intensity, timestamp, ts_epoch, local_day)
+            VALUES (1, ?, ?, datetime(?, 'unixepoch'), ?, date(?, 'unixepoch'))
+        ''', [(rng.choice(Config.EMOTION_LABELS), rng.choice([None, *range(1, 11)]), ts, ts, ts) for ts in stamps])
+    db.rebuild_rollups(1)
+
+
+def timed(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times)
+
+
+def loop_heatmap(series):
+    counts = [[0] * 24 for _ in range(7)]
+    for weekday, hour in zip(series['weekday'].tolist(), series['hour'].tolist()):
+        counts[weekday][hour] += 1
+    return counts
+
+
+def loop_transitions(series, max_gap):
+    k = len(timeseries.LABELS)
+    counts = [[0] * k for _ in range(k)]
+    rows = list(zip(series['emotion'].tolist(), series['ts'].tolist()))
+    for (a, t0), (b, t1) in zip(rows, rows[1:]):
+        if a >= 0 and b >= 0 and t1 - t0 <= max_gap:
+            counts[a][b] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moods', type=int, default=300000)
+    parser.add_argument('--span', type=int, default=3 * 365, help='Days the moods are spread over')
+    parser.add_argument('--timezone', default='UTC')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        seed(db, args.moods, args.span, args.timezone)
+        engine = db.timeseries
+
+        start = time.perf_counter()
+        series = engine.series(1)
+        print(f"full load        {(time.perf_counter() - start) * 1000:8.1f} ms  ({len(series['id'])} moods)")
+        appends = []
+        for _ in range(20):
+            db.log_mood(user_id=1, emotion='Happy', intensity=5)
+            start = time.perf_counter()
+            series = engine.series(1)
+            appends.append((time.perf_counter() - start) * 1000)
+        print(f"read + 1 new     {statistics.median(appends):8.2f} ms  (median of 20, {engine.loads} full load)")
+
+        today = timeseries.day_number(db.user_today(1))
+        cases = [
+            ('rolling 365d/7', lambda: timeseries.rolling_intensity(series, today, 365, 7)),
+            ('heatmap', lambda: timeseries.heatmap(series, today)),
+            ('transitions', lambda: timeseries.transitions(series, today)),
+            ('weekly 52', lambda: timeseries.weekly(series, today, 52)),
+        ]
+        for name, fn in cases:
+            _, ms = timed(fn)
+            print(f"{name:<16} {ms:8.2f} ms")
+
+        heat, ms = timed(lambda: timeseries.heatmap(series, today), 3)
+        loop, loop_ms = timed(lambda: loop_heatmap(series), 3)
+        print(f"heatmap          {ms:8.2f} ms vectorized vs {loop_ms:8.2f} ms loop, equal: {heat['entries'] == loop}")
+        max_gap = Config.TIMESERIES_TRANSITION_GAP_HOURS * 3600
+        trans, ms = timed(lambda: timeseries.transitions(series, today), 3)
+        loop, loop_ms = timed(lambda: loop_transitions(series, max_gap), 3)
+        print(f"transitions      {ms:8.2f} ms vectorized vs {loop_ms:8.2f} ms loop, equal: {trans['counts'] == loop}")
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Concurrent mood logging: a commit per request vs the group-commit queue.
+
+--threads request threads each log moods with three suggestions for
+--seconds, either calling log_mood_with_suggestions directly (one
+transaction and commit per request) or through WriteBehindQueue. Reports
+throughput, errors (e.g. "database is locked") and the queue's batch
+metrics. --synchronous FULL makes every commit fsync, as a durable
+deployment would.
+
+    python benchmarks/bench_write_queue.py --threads 16 --seconds 5 --synchronous FULL
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config import Config
+from models.database import DatabaseManager
+from models.write_queue import WriteBehindQueue
+
+SUGGESTIONS = [{'type': 'activities', 'content': 'Go for a walk'}] * 3
+
+
+def run(log, threads, seconds):
+    counts = [0] * threads
+    errors = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            try:
+                log(SUGGESTIONS, user_id=1 + index % 4, emotion='Happy', confidence=0.9, intensity=5)
+                counts[index] += 1
+            except sqlite3.OperationalError:
+                errors[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--synchronous', default=Config.SQLITE_PRAGMAS['synchronous'])
+    args = parser.parse_args()
+    Config.SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'synchronous': args.synchronous}
+
+    print(f"{args.threads} threads, synchronous={args.synchronous}")
+    for mode in ('direct', 'queued'):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+            with db.connection() as conn:
+                conn.executemany('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                                 [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, 5)])
+            if mode == 'direct':
+                rate, errors = run(db.log_mood_with_suggestions, args.threads, args.seconds)
+                print(f"direct: {rate:10.1f} moods/s, {errors} errors")
+            else:
+                queue = WriteBehindQueue(db, Config.WRITE_BEHIND_MAX_BATCH, Config.WRITE_BEHIND_MAX_DELAY_MS)
+                rate, errors = run(lambda *a, **kw: queue.submit(*a, **kw).result(), args.threads, args.seconds)
+                queue.close()
+                stats = queue.snapshot()
+                print(f"queued: {rate:10.1f} moods/s, {errors} errors, {stats['batches']} batches, "
+                      f"avg batch {stats['avg_batch_size']:.1f}, max {stats['max_batch_size']}, "
+                      f"{stats['avg_batch_ms']:.2f} ms/batch")
+            db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,121 @@ class Config:
     
     # Database configuration
     DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database/moodsync.db')
+    SQLITE_POOL_SIZE = 8
+    # Seconds a request waits for a free pooled connection before failing
+    SQLITE_POOL_TIMEOUT = 30
+    # 'single': everything in DATABASE_PATH. 'sharded': users/preferences stay there and
+    # each user's moods live in SHARD_DIR/shard_NN.db, NN = user_id % SHARD_COUNT
+    # (populate with `manage.py split-shards`; changing SHARD_COUNT needs a re-split)
+    STORAGE_MODE = os.environ.get('MOODSYNC_STORAGE_MODE', 'single')
+    SHARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database/shards')
+    SHARD_COUNT = 16
+    # Group-commit write-behind queue for mood logging (models/write_queue.py)
+    WRITE_BEHIND_ENABLED = os.environ.get('MOODSYNC_WRITE_BEHIND', '0') == '1'
+    WRITE_BEHIND_MAX_BATCH = 64
+    WRITE_BEHIND_MAX_DELAY_MS = 0  # extra wait for a batch to fill; 0 takes only what is already queued
+    WRITE_BEHIND_MAX_QUEUE = 10000
+    
+    # Entries per page of the mood log (keyset pagination)
+    MOOD_LOG_PAGE_SIZE = 50
+    
+    # Bulk mood import (models/importer.py): rows per transaction
+    IMPORT_BATCH_SIZE = 20000
+    
+    # Journal search ranks the newest this many matches by relevance, then lists older ones newest first
+    JOURNAL_SEARCH_RANK_WINDOW = 500
+    
+    # Per-user analytics read cache (models/cache.py); size 0 disables it
+    ANALYTICS_CACHE_SIZE = 1024
+    ANALYTICS_CACHE_TTL = 300  # seconds
+    
+    # Time-series analytics (models/timeseries.py): columnar mood series of up to MAX_USERS users,
+    # new moods appended on each read, reloaded in full after RELOAD_S (other processes' edits);
+    # moods further apart than TRANSITION_GAP_HOURS are not counted as a transition
+    TIMESERIES_MAX_USERS = 256
+    TIMESERIES_RELOAD_S = 600
+    TIMESERIES_TRANSITION_GAP_HOURS = 24
+    
+    # Next-mood forecast (models/forecast.py): each back-off level needs MIN_SUPPORT moods; a
+    # forecast negative emotion at PROACTIVE_THRESHOLD probability or more gets suggestions ahead
+    FORECAST_MIN_SUPPORT = 5
+    FORECAST_PROACTIVE_THRESHOLD = 0.4
+    
+    # Background PDF reports (models/reports.py), cached per user, timeframe and latest mood
+    REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database/reports')
+    REPORT_WORKERS = 2
+    
+    # Maintenance job (models/maintenance.py, `manage.py maintenance`): archive raw moods older
+    # than MOOD_RETENTION_DAYS into the daily rollups (0 keeps them forever), delete uploads no
+    # mood references once older than UPLOAD_GC_GRACE, then incrementally vacuum. Runs in the
+    # app every MAINTENANCE_INTERVAL_HOURS (0: only from manage.py/cron), in batches of
+    # MAINTENANCE_BATCH_SIZE rows per write transaction with MAINTENANCE_PAUSE_MS between them
+    MOOD_RETENTION_DAYS = int(os.environ.get('MOODSYNC_RETENTION_DAYS', '0'))
+    UPLOAD_GC_GRACE = 3600  # seconds
+    MAINTENANCE_INTERVAL_HOURS = float(os.environ.get('MOODSYNC_MAINTENANCE_HOURS', '0'))
+    MAINTENANCE_BATCH_SIZE = 200
+    MAINTENANCE_PAUSE_MS = 20
+    VACUUM_STEP_PAGES = 256
+    
+    # Online backups (models/backup.py, `manage.py backup`): copied STEP_PAGES pages at a time
+    # with PAUSE_MS between steps, verified, newest BACKUP_KEEP kept; every BACKUP_INTERVAL_HOURS
+    # in the app (0: only from manage.py/cron). The manifest lists the uploads when enabled
+    BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database/backups')
+    BACKUP_KEEP = 7
+    BACKUP_STEP_PAGES = 256
+    BACKUP_PAUSE_MS = 5
+    BACKUP_INTERVAL_HOURS = float(os.environ.get('MOODSYNC_BACKUP_HOURS', '0'))
+    BACKUP_UPLOADS_MANIFEST = True
+    
+    # Time zone for users who have not picked one (IANA name); decides which day a mood counts towards
+    DEFAULT_TIMEZONE = os.environ.get('MOODSYNC_TIMEZONE', 'UTC')
+    # Applied to every pooled connection (models/connection.py)
+    SQLITE_PRAGMAS = {
+        # Only takes on a new database, and only before journal_mode; existing files
+        # need `manage.py maintenance --enable-incremental-vacuum` once
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,  # negative = KiB, i.e. 16MB page cache per connection
+        'mmap_size': 268435456,  # 256MB
+        'busy_timeout': 5000,  # ms
+        'temp_store': 'MEMORY'
+    }
     
     # Model configuration
     MODEL_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'facialemotionmodel.json')
     MODEL_H5_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'facialemotionmodel.h5')
+    # Flat memory-mappable weights (see models/weight_store.py); preferred over H5 when present
+    MODEL_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'facialemotionmodel.weights.bin')
+    
+    # Inference mode: 'full' runs the CNN on every face, 'cascade' runs the fast
+    # model first and escalates to the CNN when its top probability is below the threshold
+    INFERENCE_MODE = os.environ.get('MOODSYNC_INFERENCE_MODE', 'full')
+    CASCADE_THRESHOLD = 0.8
+    FAST_MODEL_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fastemotionmodel.json')
+    FAST_MODEL_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fastemotionmodel.weights.bin')
+    
+    # Labelled face dataset (images/train, images/test)
+    DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
+    
+    # Face preprocessing shared by every inference path (models/preprocessing.py)
+    FACE_SIZE = 48
+    FACE_PADDING = 10
+    FACE_EQUALIZE_HIST = True
+    
+    # Re-scoring stored mood images with a new model (models/rescoring.py, `manage.py rescore-moods`):
+    # CHUNK_SIZE images per model call in each of WORKERS niced processes, at most MAX_RATE
+    # images a second in total (0: unlimited)
+    RESCORE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    RESCORE_CHUNK_SIZE = 32
+    RESCORE_MAX_RATE = 20
+    RESCORE_NICE = 10
+    
+    # Face crop cache (models/face_cache.py): the detection path appends each stored image's
+    # FACE_SIZE crop and face box to one file per day in FACE_CACHE_DIR, and re-scoring reads
+    # those instead of decoding the image and detecting the face again
+    FACE_CACHE_ENABLED = os.environ.get('MOODSYNC_FACE_CACHE', '0') == '1'
+    FACE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database/face_crops')
     
     # Allowed image extensions
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
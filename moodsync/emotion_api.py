@@ -5,9 +5,9 @@ import numpy as np
 import base64
 import io
 from PIL import Image
-import tensorflow as tf
-from tensorflow.keras.models import model_from_json, Sequential
 import os
+from models.weight_store import load_model
+from models.preprocessing import preprocess_faces
 
 app = Flask(__name__)
 CORS(app, origins=["*"], supports_credentials=True)  # Enable CORS for frontend communication
@@ -25,15 +25,6 @@ def load_emotion_model():
     try:
         app.logger.debug("Loading emotion detection model...")
         
-        custom_objects = {
-            'Sequential': Sequential,
-            'Conv2D': tf.keras.layers.Conv2D,
-            'MaxPooling2D': tf.keras.layers.MaxPooling2D,
-            'Dropout': tf.keras.layers.Dropout,
-            'Flatten': tf.keras.layers.Flatten,
-            'Dense': tf.keras.layers.Dense
-        }
-        
         # Get the directory where the script is located
         script_dir = os.path.dirname(os.path.abspath(__file__))
         
@@ -45,12 +36,14 @@ def load_emotion_model():
         
         json_path = None
         h5_path = None
+        weights_path = None
         
         # Find the JSON file
         for path in possible_paths:
             if os.path.exists(path):
                 json_path = path
                 h5_path = path.replace(".json", ".h5")
+                weights_path = path.replace(".json", ".weights.bin")
                 app.logger.debug(f"Found JSON file at: {json_path}")
                 break
         
@@ -59,18 +52,14 @@ def load_emotion_model():
             app.logger.debug(f"Checked paths: {possible_paths}")
             return False
         
-        if not os.path.exists(h5_path):
-            app.logger.warning(f"Model H5 file not found at: {h5_path}")
+        if not os.path.exists(h5_path) and not os.path.exists(weights_path):
+            app.logger.warning(f"Model weights not found at: {weights_path} or {h5_path}")
             return False
             
         app.logger.debug(f"Using JSON path: {json_path}")
-        app.logger.debug(f"Using H5 path: {h5_path}")
+        app.logger.debug(f"Using weights: {weights_path if os.path.exists(weights_path) else h5_path}")
         
-        with open(json_path, "r") as json_file:
-            model_json = json_file.read()
-            
-        model = model_from_json(model_json, custom_objects=custom_objects)
-        model.load_weights(h5_path)
+        model = load_model(json_path, h5_path, weights_path)
         app.logger.info("Emotion detection model loaded successfully!")
         return True
         
@@ -106,12 +95,8 @@ def extract_features(image):
     app.logger.debug(f"Extracting features from image with shape: {image.shape}")
     
     try:
-        # Preprocess image
-        image = cv2.equalizeHist(image)
-        image = cv2.resize(image, (48, 48))
-        feature = np.array(image, dtype=np.float32)
-        feature = feature.reshape(1, 48, 48, 1)
-        return feature / 255.0
+        # Preprocess the whole image as a single face crop
+        return preprocess_faces(image, [(0, 0, image.shape[1], image.shape[0])], padding=0)
     except Exception as e:
         app.logger.error(f"Error in extract_features: {e}")
         return None
@@ -157,19 +142,11 @@ def detect_faces_and_emotions(image_array):
         x, y, w, h = faces[0]
         app.logger.debug(f"Processing face at coordinates: x={x}, y={y}, w={w}, h={h}")
         
-        # Extract face region with padding
-        padding = 10
-        face_region = gray[max(0, y-padding):min(gray.shape[0], y+h+padding),
-                          max(0, x-padding):min(gray.shape[1], x+w+padding)]
+        # Crop, pad and normalize the face the same way as every other entry point
+        features = preprocess_faces(gray, faces[:1])
         
-        if face_region.size == 0:
-            return {'success': False, 'error': 'Invalid face region extracted'}
-        
-        # Extract features and predict emotion
-        features = extract_features(face_region)
-        
-        if features is None or model is None:
-            return {'success': False, 'error': 'Feature extraction failed or model not available'}
+        if model is None:
+            return {'success': False, 'error': 'Emotion detection model not available'}
         
         # Make prediction
         prediction = model.predict(features, verbose=0)
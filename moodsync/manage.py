@@ -0,0 +1,389 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from config import Config
+
+
+def export_weights(args):
+    from models.weight_store import load_model, export_weights as _export
+
+    model = load_model(args.json, args.h5)
+    manifest = _export(model, args.output)
+    print(f"Exported {len(manifest['tensors'])} tensors ({manifest['size']} bytes) to {args.output}")
+    print(f"sha256: {manifest['sha256']}")
+
+
+def train_fast_model(args):
+    import numpy as np
+    from models.cascade import build_fast_model, load_dataset
+    from models.weight_store import export_weights as _export
+
+    x, y, skipped = load_dataset(args.data, limit=args.limit)
+    print(f"Loaded {len(x)} training faces from {args.data} ({skipped} unreadable files skipped)")
+    model = build_fast_model()
+    model.fit(x, np.eye(len(Config.EMOTION_LABELS), dtype=np.float32)[y],
+              batch_size=args.batch_size, epochs=args.epochs, validation_split=0.1, shuffle=True)
+
+    with open(Config.FAST_MODEL_JSON_PATH, 'w') as f:
+        f.write(model.to_json())
+    _export(model, Config.FAST_MODEL_WEIGHTS_PATH)
+    print(f"Saved fast model to {Config.FAST_MODEL_JSON_PATH}")
+
+
+def _timed_predict(model, x, batch_size):
+    import numpy as np
+
+    start = time.perf_counter()
+    probs = np.concatenate([model(x[i:i + batch_size], training=False).numpy()
+                            for i in range(0, len(x), batch_size)])
+    return probs, (time.perf_counter() - start) * 1000 / len(x)
+
+
+def evaluate_cascade(args):
+    import numpy as np
+    from models.cascade import load_dataset, TwoStageClassifier
+    from models.weight_store import load_model
+
+    full_model = load_model(Config.MODEL_JSON_PATH, Config.MODEL_H5_PATH, Config.MODEL_WEIGHTS_PATH)
+    fast_model = load_model(Config.FAST_MODEL_JSON_PATH, weights_path=Config.FAST_MODEL_WEIGHTS_PATH)
+    x, y, skipped = load_dataset(args.data, limit=args.limit)
+    print(f"Evaluating on {len(x)} faces from {args.data} (batch size {args.batch_size}, "
+          f"{skipped} unreadable files skipped)")
+
+    full_probs, full_ms = _timed_predict(full_model, x, args.batch_size)
+    fast_probs, fast_ms = _timed_predict(fast_model, x, args.batch_size)
+    full_pred = full_probs.argmax(axis=1)
+    fast_pred = fast_probs.argmax(axis=1)
+    fast_conf = fast_probs.max(axis=1)
+
+    print(f"{'mode':<18}{'accuracy':>10}{'escalated':>11}{'ms/face':>10}")
+    print(f"{'full':<18}{(full_pred == y).mean():>10.4f}{1.0:>11.3f}{full_ms:>10.2f}")
+    print(f"{'fast':<18}{(fast_pred == y).mean():>10.4f}{0.0:>11.3f}{fast_ms:>10.2f}")
+    for threshold in args.thresholds:
+        escalate = fast_conf < threshold
+        pred = np.where(escalate, full_pred, fast_pred)
+        est_ms = fast_ms + escalate.mean() * full_ms
+        print(f"{f'cascade@{threshold:.2f}':<18}{(pred == y).mean():>10.4f}{escalate.mean():>11.3f}{est_ms:>10.2f}")
+
+    # Measured run through the same code path EmotionDetector uses
+    cascade = TwoStageClassifier(fast_model, full_model)
+    probs = np.concatenate([cascade.predict(x[i:i + args.batch_size])
+                            for i in range(0, len(x), args.batch_size)])
+    stats = cascade.stats.snapshot()
+    print(f"Measured cascade@{cascade.threshold:.2f}: accuracy {(probs.argmax(axis=1) == y).mean():.4f}, "
+          f"escalation {stats['escalation_rate']:.3f}, {stats['avg_total_ms']:.2f} ms/face")
+
+
+# Representative hot queries and the index each must use
+INDEXED_QUERIES = [
+    ('mood stats rollup', 'PRIMARY KEY', '''
+        SELECT day, emotion, entries, intensity_sum, intensity_count FROM mood_daily_rollup
+        WHERE user_id = ? AND day >= ?
+    ''', (1, '2024-01-01')),
+    ('context rollup', 'PRIMARY KEY', '''
+        SELECT context, SUM(intensity_sum) / SUM(intensity_count) FROM mood_daily_context_rollup
+        WHERE user_id = ? AND day >= ?
+        GROUP BY context
+    ''', (1, '2024-01-01')),
+    ('mood history', 'idx_moods_user_epoch', '''
+        SELECT * FROM moods WHERE user_id = ? AND ts_epoch >= ? ORDER BY ts_epoch DESC
+    ''', (1, 1700000000)),
+    ('mood log page', 'idx_moods_user_epoch', '''
+        SELECT id, timestamp, ts_epoch, detected_emotion, confidence_score, context, notes FROM moods
+        WHERE user_id = ? AND ts_epoch >= ? AND (ts_epoch, id) < (?, ?)
+        ORDER BY ts_epoch DESC, id DESC LIMIT ?
+    ''', (1, 1700000000, 1800000000, 1, 51)),
+    ('suggestions by mood', 'idx_suggestions_mood', '''
+        SELECT id, suggestion_type, content FROM suggestions WHERE mood_id = ? ORDER BY id ASC
+    ''', (1,)),
+    ('journal page', 'idx_journal_user_epoch', '''
+        SELECT id, mood_id, content, timestamp, ts_epoch, local_day FROM journal_entries
+        WHERE user_id = ? AND (ts_epoch, id) < (?, ?) ORDER BY ts_epoch DESC, id DESC LIMIT ?
+    ''', (1, 1800000000, 1, 51)),
+    ('streak', 'PRIMARY KEY', '''
+        SELECT current_streak, longest_streak, last_entry_day FROM user_streaks WHERE user_id = ?
+    ''', (1,)),
+]
+
+
+def migrate(args):
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    print(f"Schema version {db.schema_version}")
+
+
+def check_indexes(args):
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    failures = 0
+    for name, index, query, params in INDEXED_QUERIES:
+        plan = db.explain(query, params)
+        ok = any(index in detail for detail in plan)
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<6}{name}: {' | '.join(plan)}")
+    return 1 if failures else 0
+
+
+def rebuild_rollups(args):
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    db.rebuild_rollups(args.user)
+    print(f"Rebuilt rollups and streaks for {f'user {args.user}' if args.user is not None else 'all users'}")
+
+
+def check_rollups(args):
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    mismatches = db.check_rollups(args.user)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+def maintenance(args):
+    from models.database import DatabaseManager
+    from models.maintenance import MaintenanceJob
+
+    db = DatabaseManager(args.db)
+    if args.enable_incremental_vacuum:
+        # Rewrites each file (VACUUM): run with the app stopped
+        for pool in db.all_pools():
+            pool.close_all()
+            conn = sqlite3.connect(pool.db_path, isolation_level=None)
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            print(f"{pool.db_path}: auto_vacuum={conn.execute('PRAGMA auto_vacuum').fetchone()[0]}")
+            conn.close()
+    job = MaintenanceJob(db, args.uploads, retention_days=args.retention_days, grace=args.grace)
+    report = job.run()
+    archive = report['archive']
+    if archive['enabled']:
+        print(f"Archived {archive['moods']} moods older than {archive['retention_days']} days "
+              f"for {archive['users']} users")
+    else:
+        print("Retention off (MOODSYNC_RETENTION_DAYS=0): no moods archived")
+    print(f"Deleted {report['uploads']['files']} unreferenced uploads ({report['uploads']['bytes']} bytes)")
+    if report['face_crops']['files']:
+        print(f"Deleted {report['face_crops']['files']} expired face crop files ({report['face_crops']['bytes']} bytes)")
+    for database in report['databases']:
+        print(f"{database['path']}: auto_vacuum={database['auto_vacuum']} "
+              f"reclaimed={database['bytes_reclaimed']} bytes free_pages={database['free_pages']} "
+              f"size={database['file_bytes']} bytes")
+    print(f"{report['bytes_reclaimed']} bytes reclaimed in {report['duration_s']}s, "
+          f"longest write transaction {report['max_transaction_ms']} ms")
+
+
+def backup(args):
+    from models.backup import BackupService
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    service = BackupService(db, args.out, keep=args.keep, include_uploads=not args.no_uploads)
+    try:
+        manifest = service.run()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    for database in manifest['databases']:
+        print(f"{database['source']}: {database['bytes']} bytes in {database['steps']} steps, "
+              f"{database['duration_s']}s, integrity {database['integrity_check']}, "
+              f"longest step {database['longest_step_ms']} ms ({database['journal_mode']})")
+    if 'uploads' in manifest:
+        print(f"Manifest lists {len(manifest['uploads'])} uploads")
+    print(f"Backup {os.path.join(args.out, manifest['name'])} in {manifest['duration_s']}s, "
+          f"writers blocked at most {manifest['writer_block_max_ms']} ms")
+    if manifest['removed']:
+        print(f"Removed old backups: {', '.join(manifest['removed'])}")
+
+
+def import_moods(args):
+    from models import importer
+    from models.database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    fmt = args.format or ('csv' if args.file.endswith('.csv') else 'ndjson')
+    with open(args.file, encoding='utf-8-sig', newline='') as stream:
+        report = importer.import_stream(db, args.user, stream, fmt, args.batch_size)
+    for error in report['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"Imported {report['imported']} moods for user {args.user} ({report['duplicates']} already there, "
+          f"{report['repeated']} repeated in the file, {report['rejected']} rejected) in {report['duration_s']}s, {report['rows_per_s']} rows/s")
+    return 1 if report['rejected'] else 0
+
+
+def rescore_moods(args):
+    from models.database import DatabaseManager
+    from models.rescoring import RescoreJob
+
+    db = DatabaseManager(args.db)
+    job = RescoreJob(db, args.version, args.uploads, workers=args.workers, chunk_size=args.chunk_size,
+                     max_rate=args.max_rate, face_cache=False if args.no_face_cache else None)
+    if not args.apply_only:
+        try:
+            report = job.run(args.limit)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        statuses = ', '.join(f'{status} {count}' for status, count in report['statuses'].items())
+        print(f"Model {report['model_version']}: scored {report['images']} images in {report['duration_s']}s, "
+              f"{report['images_per_s']} images/s ({statuses}; detection {report['detect_s']}s, "
+              f"inference {report['inference_s']}s in the workers; {report['from_face_cache']} from cached face crops)")
+        if report['interrupted']:
+            print("Interrupted: run again to resume")
+    changes = job.label_changes()
+    print(f"{changes['changed']} of {changes['compared']} scored moods would change label "
+          f"({changes['changed_fraction']:.1%})")
+    for transition in changes['transitions'][:10]:
+        print(f"  {transition['from']} -> {transition['to']}: {transition['moods']}")
+    if args.apply or args.apply_only:
+        print(f"Updated {job.apply()} moods with model {job.version}")
+
+
+# Tables that live in the shards, and how to pick a shard's rows (params: count, shard)
+SHARDED_TABLES = [
+    ('moods', 'user_id % ? = ?'),
+    ('suggestions', 'mood_id IN (SELECT id FROM src.moods WHERE user_id % ? = ?)'),
+    ('mood_daily_rollup', 'user_id % ? = ?'),
+    ('mood_daily_context_rollup', 'user_id % ? = ?'),
+    ('user_streaks', 'user_id % ? = ?'),
+    ('mood_forecast', 'user_id % ? = ?'),
+    # The shard's triggers index mood notes and journal text for search as rows are copied
+    ('journal_entries', 'user_id % ? = ?'),
+    ('mood_archive', 'user_id % ? = ?'),
+    ('mood_predictions', 'mood_id IN (SELECT id FROM src.moods WHERE user_id % ? = ?)'),
+    ('archived_suggestion_ratings', 'user_id % ? = ?'),
+]
+
+
+def split_shards(args):
+    from models.database import DatabaseManager, shard_paths
+
+    paths = shard_paths(args.out, args.shards)
+    existing = [path for path in paths if os.path.exists(path)]
+    if existing:
+        print(f"Refusing to overwrite existing shards: {', '.join(existing)}")
+        return 1
+
+    DatabaseManager(args.db)  # bring the source up to the current schema
+    # Creates the shard files with the same schema
+    DatabaseManager(args.db, storage_mode='sharded', shard_dir=args.out, shard_count=args.shards)
+    for n, path in enumerate(paths):
+        conn = sqlite3.connect(path)
+        conn.execute('ATTACH DATABASE ? AS src', (args.db,))
+        counts = []
+        with conn:
+            for table, where in SHARDED_TABLES:
+                columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})'))
+                cursor = conn.execute(f'INSERT INTO main.{table} ({columns}) SELECT {columns} FROM src.{table} WHERE {where}',
+                                      (args.shards, n))
+                counts.append(f'{table}={cursor.rowcount}')
+        conn.execute('DETACH DATABASE src')
+        conn.close()
+        print(f"{path}: {' '.join(counts)}")
+    print(f"Set STORAGE_MODE='sharded' (MOODSYNC_STORAGE_MODE) and SHARD_COUNT={args.shards} to use them; "
+          f"mood data in {args.db} is left in place and ignored in sharded mode")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MoodSync maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('export-weights', help='Convert the H5 model weights to the flat fast-start format')
+    cmd.add_argument('--json', default=Config.MODEL_JSON_PATH)
+    cmd.add_argument('--h5', default=Config.MODEL_H5_PATH)
+    cmd.add_argument('--output', default=Config.MODEL_WEIGHTS_PATH)
+    cmd.set_defaults(func=export_weights)
+
+    cmd = commands.add_parser('train-fast-model', help='Train the small first-stage model used by the cascade')
+    cmd.add_argument('--data', default=os.path.join(Config.DATASET_DIR, 'train'))
+    cmd.add_argument('--epochs', type=int, default=15)
+    cmd.add_argument('--batch-size', type=int, default=128)
+    cmd.add_argument('--limit', type=int, help='Maximum images per label')
+    cmd.set_defaults(func=train_fast_model)
+
+    cmd = commands.add_parser('evaluate-cascade', help='Accuracy, escalation rate and latency of the cascade on the test set')
+    cmd.add_argument('--data', default=os.path.join(Config.DATASET_DIR, 'test'))
+    cmd.add_argument('--batch-size', type=int, default=1, help='Faces per model call (1 matches live detection)')
+    cmd.add_argument('--limit', type=int, help='Maximum images per label')
+    cmd.add_argument('--thresholds', type=float, nargs='+', default=[0.6, 0.7, 0.8, 0.9])
+    cmd.set_defaults(func=evaluate_cascade)
+
+    cmd = commands.add_parser('migrate', help='Apply pending schema migrations')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.set_defaults(func=migrate)
+
+    cmd = commands.add_parser('check-indexes', help='Verify the hot queries use their indexes (EXPLAIN QUERY PLAN)')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.set_defaults(func=check_indexes)
+
+    cmd = commands.add_parser('rebuild-rollups', help='Backfill the daily mood rollups and streaks from raw moods')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--user', type=int, help='Only this user (default: everyone)')
+    cmd.set_defaults(func=rebuild_rollups)
+
+    cmd = commands.add_parser('check-rollups', help='Compare the daily mood rollups and streaks against raw moods')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--user', type=int, help='Only this user (default: everyone)')
+    cmd.set_defaults(func=check_rollups)
+
+    cmd = commands.add_parser('split-shards', help='Copy each user\'s moods into per-user-id shard databases')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--out', default=Config.SHARD_DIR)
+    cmd.add_argument('--shards', type=int, default=Config.SHARD_COUNT)
+    cmd.set_defaults(func=split_shards)
+
+    cmd = commands.add_parser('maintenance', help='Archive old moods, delete unreferenced uploads and vacuum')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--uploads', default=Config.UPLOAD_FOLDER)
+    cmd.add_argument('--retention-days', type=int, default=Config.MOOD_RETENTION_DAYS,
+                     help='Archive raw moods older than this many days (0: keep them)')
+    cmd.add_argument('--grace', type=int, default=Config.UPLOAD_GC_GRACE,
+                     help='Only delete uploads older than this many seconds')
+    cmd.add_argument('--enable-incremental-vacuum', action='store_true',
+                     help='Convert the database files to auto_vacuum=INCREMENTAL first (offline, rewrites them)')
+    cmd.set_defaults(func=maintenance)
+
+    cmd = commands.add_parser('backup', help='Back up the database files online, verify them and rotate old backups')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--out', default=Config.BACKUP_DIR)
+    cmd.add_argument('--keep', type=int, default=Config.BACKUP_KEEP, help='Backups to keep, newest first')
+    cmd.add_argument('--no-uploads', action='store_true', help='Leave the upload files out of the manifest')
+    cmd.set_defaults(func=backup)
+
+    cmd = commands.add_parser('import-moods', help='Bulk-import a user\'s mood history from CSV or NDJSON')
+    cmd.add_argument('file')
+    cmd.add_argument('--user', type=int, required=True)
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--format', choices=['csv', 'ndjson'], help='Default: from the file extension')
+    cmd.add_argument('--batch-size', type=int, default=Config.IMPORT_BATCH_SIZE,
+                     help='Rows per transaction; larger is faster but holds the write lock longer')
+    cmd.set_defaults(func=import_moods)
+
+    cmd = commands.add_parser('rescore-moods', help='Re-score stored mood images with the current model')
+    cmd.add_argument('--db', default=Config.DATABASE_PATH)
+    cmd.add_argument('--uploads', default=Config.UPLOAD_FOLDER)
+    cmd.add_argument('--version', help='Model version to record the predictions under (default: hash of the model files)')
+    cmd.add_argument('--workers', type=int, default=Config.RESCORE_WORKERS)
+    cmd.add_argument('--chunk-size', type=int, default=Config.RESCORE_CHUNK_SIZE, help='Images per model call')
+    cmd.add_argument('--max-rate', type=float, default=Config.RESCORE_MAX_RATE,
+                     help='Images per second across all workers (0: unlimited)')
+    cmd.add_argument('--limit', type=int, help='Stop after this many images (run again to continue)')
+    cmd.add_argument('--no-face-cache', action='store_true',
+                     help='Read and detect every image even when its face crop is cached')
+    cmd.add_argument('--apply', action='store_true', help='Then copy the predictions into the moods')
+    cmd.add_argument('--apply-only', action='store_true', help='Only copy the predictions of --version into the moods')
+    cmd.set_defaults(func=rescore_moods)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
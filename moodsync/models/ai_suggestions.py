@@ -2,6 +2,8 @@ import random
 from datetime import datetime, timedelta
 
 class SuggestionEngine:
+    negative_emotions = ('Sad', 'Angry', 'Fear', 'Disgust')
+    
     def __init__(self):
         self.suggestions_db = {
             'Happy': {
@@ -172,6 +174,16 @@ class SuggestionEngine:
         
         return suggestions
     
+    def get_proactive_suggestions(self, forecast, threshold=0.4):
+        # Suggestions ahead of a forecast mood (DatabaseManager.get_mood_forecast), only
+        # when it is a negative emotion at ``threshold`` probability or more
+        if not forecast or forecast['emotion'] not in self.negative_emotions or forecast['probability'] < threshold:
+            return []
+        suggestions = self.get_suggestions(forecast['emotion'])
+        for suggestion in suggestions:
+            suggestion['proactive'] = True
+        return suggestions
+    
     def get_personalized_quote(self, emotion):
         if emotion not in self.quotes:
             emotion = 'Neutral'
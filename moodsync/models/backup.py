@@ -0,0 +1,229 @@
+"""Online backups with the SQLite backup API.
+
+``BackupService.run`` copies every database file (the main database and,
+in sharded storage, each shard) into a new directory under the backup
+directory, ``step_pages`` pages at a time, checks each copy with
+``PRAGMA integrity_check``, writes ``manifest.json`` and keeps the newest
+``keep`` backups. The directory only gets its final name once everything
+in it is verified, so a backup directory is always complete.
+
+In WAL mode the copy runs inside one read transaction on the source:
+every step reads the same snapshot, so writes during the backup neither
+restart it nor wait for it (readers never block WAL writers; only
+checkpoints stop short of the snapshot until it ends). In rollback-journal
+mode each step holds a shared lock, which a committing writer waits out;
+the longest step is reported as the longest a writer could have waited.
+In both modes the pause between steps leaves the disk to the app.
+
+The manifest can list the upload folder (name, size, mtime, SHA-256); a
+file unchanged in size and mtime since the previous manifest keeps its
+hash instead of being read again.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+_PARTIAL = '.partial'
+
+
+class BackupService:
+    def __init__(self, db, backup_dir=None, keep=None, step_pages=None, pause_ms=None, upload_folder=None,
+                 include_uploads=None):
+        self.db = db
+        self.backup_dir = backup_dir or Config.BACKUP_DIR
+        self.keep = keep or Config.BACKUP_KEEP
+        self.step_pages = step_pages or Config.BACKUP_STEP_PAGES
+        self.pause = (Config.BACKUP_PAUSE_MS if pause_ms is None else pause_ms) / 1000.0
+        self.upload_folder = upload_folder or Config.UPLOAD_FOLDER
+        self.include_uploads = Config.BACKUP_UPLOADS_MANIFEST if include_uploads is None else include_uploads
+        self.last_report = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def backups(self):
+        """Completed backup directories, oldest first (names sort by time)."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        return sorted(os.path.join(self.backup_dir, name) for name in os.listdir(self.backup_dir)
+                      if not name.endswith(_PARTIAL) and os.path.isfile(os.path.join(self.backup_dir, name, MANIFEST)))
+
+    def run(self):
+        """Take one backup; returns (and keeps as ``last_report``) the manifest.
+
+        Raises RuntimeError, leaving no backup behind, if a copy fails its
+        integrity check or no new backup directory can be named.
+        """
+        with self._run_lock:
+            started = time.time()
+            name, target, partial = self._new_directory()
+            try:
+                databases = [backup_file(pool.db_path, os.path.join(partial, os.path.basename(pool.db_path)),
+                                         self.step_pages, self.pause)
+                             for pool in self.db.all_pools()]
+                manifest = {
+                    'name': name,
+                    'created_at': int(started),
+                    'databases': databases,
+                    'writer_block_max_ms': max(d['writer_block_max_ms'] for d in databases),
+                }
+                if self.include_uploads:
+                    manifest['uploads'] = upload_manifest(self.upload_folder, self._previous_uploads())
+                manifest['duration_s'] = round(time.time() - started, 2)
+                with open(os.path.join(partial, MANIFEST), 'w') as f:
+                    json.dump(manifest, f, indent=1)
+                os.rename(partial, target)
+            except BaseException:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+            manifest['removed'] = self.rotate()
+            self.last_report = {key: value for key, value in manifest.items() if key != 'uploads'}
+            if self.include_uploads:
+                self.last_report['uploads'] = {'files': len(manifest['uploads']),
+                                               'bytes': sum(f['bytes'] for f in manifest['uploads'])}
+            return manifest
+
+    def _new_directory(self):
+        # (name, final path, partial path) of a new backup, its partial directory created. Names
+        # have microseconds and, if another run (another process) took the name anyway, a counter
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        for n in range(100):
+            name = f'{stamp}-{n}' if n else stamp
+            target = os.path.join(self.backup_dir, name)
+            if os.path.exists(target):
+                continue
+            try:
+                os.makedirs(target + _PARTIAL)
+            except FileExistsError:
+                continue
+            return name, target, target + _PARTIAL
+        raise RuntimeError(f'Could not create a new backup directory in {self.backup_dir}: {stamp} is taken')
+
+    def rotate(self):
+        """Delete all but the newest ``keep`` backups; returns the names removed."""
+        removed = []
+        for path in self.backups()[:-self.keep]:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(os.path.basename(path))
+        return removed
+
+    def _previous_uploads(self):
+        backups = self.backups()
+        if not backups:
+            return {}
+        try:
+            with open(os.path.join(backups[-1], MANIFEST)) as f:
+                return {entry['name']: entry for entry in json.load(f).get('uploads', [])}
+        except (OSError, ValueError):
+            return {}
+
+    def start(self, interval_hours):
+        """Back up every ``interval_hours`` on a daemon thread until ``close``."""
+        def loop():
+            while not self._stop.wait(interval_hours * 3600):
+                try:
+                    manifest = self.run()
+                    logger.info('backup %s in %ss', manifest['name'], manifest['duration_s'])
+                except Exception:
+                    logger.exception('backup failed')
+
+        self._thread = threading.Thread(target=loop, name='backup', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def backup_file(source_path, target_path, step_pages=256, pause=0.005):
+    """Copy one database file online and verify the copy; returns its report."""
+    started = time.perf_counter()
+    steps = []
+    last = [started]
+
+    def progress(status, remaining, total):
+        # Called after each step; the lock (if any) was held since the previous call returned
+        now = time.perf_counter()
+        steps.append(now - last[0])
+        if pause and remaining:
+            time.sleep(pause)
+        last[0] = time.perf_counter()
+
+    source = sqlite3.connect(source_path, timeout=Config.SQLITE_PRAGMAS.get('busy_timeout', 5000) / 1000)
+    target = sqlite3.connect(target_path)
+    try:
+        wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        if wal:
+            # One snapshot for every step: no restarts when the app writes meanwhile
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        last[0] = time.perf_counter()
+        source.backup(target, pages=step_pages, progress=progress)
+        if wal:
+            source.rollback()
+        # A standalone file, without -wal/-shm companions
+        target.execute('PRAGMA journal_mode = DELETE')
+        check = [row[0] for row in target.execute('PRAGMA integrity_check')]
+        pages = target.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    if check != ['ok']:
+        raise RuntimeError(f'backup of {source_path} failed its integrity check: {"; ".join(check[:5])}')
+    longest = max(steps, default=0) * 1000
+    return {
+        'file': os.path.basename(target_path),
+        'source': source_path,
+        'bytes': os.path.getsize(target_path),
+        'pages': pages,
+        'steps': len(steps),
+        'journal_mode': 'wal' if wal else 'rollback',
+        'longest_step_ms': round(longest, 2),
+        # See the module docstring: WAL writers never wait for a backup step
+        'writer_block_max_ms': 0.0 if wal else round(longest, 2),
+        'duration_s': round(time.perf_counter() - started, 2),
+        'integrity_check': 'ok',
+    }
+
+
+def upload_manifest(upload_folder, previous=None):
+    """Name, size, mtime and SHA-256 of every upload, reusing ``previous`` hashes of unchanged files."""
+    previous = previous or {}
+    entries = []
+    if not os.path.isdir(upload_folder):
+        return entries
+    for entry in sorted(os.scandir(upload_folder), key=lambda e: e.name):
+        if not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+            known = previous.get(entry.name)
+            if known and known['bytes'] == stat.st_size and known['mtime'] == int(stat.st_mtime):
+                digest = known['sha256']
+            else:
+                digest = _sha256(entry.path)
+        except FileNotFoundError:
+            continue  # deleted meanwhile (e.g. by the maintenance job)
+        entries.append({'name': entry.name, 'bytes': stat.st_size, 'mtime': int(stat.st_mtime), 'sha256': digest})
+    return entries
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
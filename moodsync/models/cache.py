@@ -0,0 +1,103 @@
+"""In-process cache for per-user analytics reads.
+
+Entries are keyed by user and call arguments, kept in LRU order up to
+``max_entries`` and dropped after ``ttl`` seconds (windows such as "last
+7 days" move even without new writes). Writers call ``invalidate(user_id)``
+after committing, which drops every entry of that user. Each process has
+its own cache, so with several worker processes a write invalidates only
+the worker that served it; the TTL bounds staleness elsewhere.
+"""
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+class AnalyticsCache:
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user_id, key) -> (expires, value)
+        self._user_keys = {}  # user_id -> set of entry keys
+        self._generations = {}  # user_id -> bumped on every invalidation
+        self._epoch = 0  # bumped by clear()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, user_id, key, compute):
+        """Cached value for (user_id, key), calling ``compute()`` on a miss.
+
+        Values are deep-copied in and out so callers can't modify cached data.
+        """
+        if not self.max_entries:
+            return compute()
+        entry_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(user_id, 0))
+
+        value = compute()
+
+        with self._lock:
+            # A write for this user while computing makes the value stale
+            if (self._epoch, self._generations.get(user_id, 0)) == generation:
+                self._entries[entry_key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+                self._entries.move_to_end(entry_key)
+                self._user_keys.setdefault(user_id, set()).add(entry_key)
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._forget(old_key)
+                    self.evictions += 1
+        return value
+
+    def _forget(self, entry_key):
+        keys = self._user_keys.get(entry_key[0])
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                del self._user_keys[entry_key[0]]
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for entry_key in self._user_keys.pop(user_id, ()):
+                self._entries.pop(entry_key, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._user_keys.clear()
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def cached(method):
+    """Cache a DatabaseManager read in ``self.cache``, per user_id and arguments."""
+    @functools.wraps(method)
+    def wrapper(self, user_id=1, *args, **kwargs):
+        key = (method.__name__, repr(args), repr(sorted(kwargs.items())))
+        return self.cache.get_or_compute(user_id, key, lambda: method(self, user_id, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from models.preprocessing import preprocess_faces
+
+
+def build_fast_model():
+    """Small CNN used as the first cascade stage; a fraction of the full model's cost."""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Conv2D, MaxPooling2D, Dropout, Flatten, Dense
+
+    model = Sequential()
+    model.add(Conv2D(16, kernel_size=(3, 3), strides=(2, 2), activation='relu', input_shape=(48, 48, 1)))
+    model.add(MaxPooling2D(pool_size=(2, 2)))
+    model.add(Conv2D(32, kernel_size=(3, 3), activation='relu'))
+    model.add(MaxPooling2D(pool_size=(2, 2)))
+    model.add(Flatten())
+    model.add(Dropout(0.3))
+    model.add(Dense(64, activation='relu'))
+    model.add(Dense(len(Config.EMOTION_LABELS), activation='softmax'))
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def load_dataset(data_dir, limit=None):
+    """Load a folder-per-label dataset (images/train, images/test) as a model batch.
+
+    Returns (batch, labels, skipped); files OpenCV cannot read are skipped.
+    """
+    paths = []
+    labels = []
+    for index, label in enumerate(Config.EMOTION_LABELS):
+        label_dir = os.path.join(data_dir, label.lower())
+        if not os.path.isdir(label_dir):
+            continue
+        names = sorted(os.listdir(label_dir))[:limit]
+        paths.extend(os.path.join(label_dir, name) for name in names)
+        labels.extend([index] * len(names))
+
+    batch = np.empty((len(paths), Config.FACE_SIZE, Config.FACE_SIZE, 1), dtype=np.float32)
+    kept = []
+    for path, label in zip(paths, labels):
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            continue
+        n = len(kept)
+        preprocess_faces(image, [(0, 0, image.shape[1], image.shape[0])], padding=0, out=batch[n:n + 1])
+        kept.append(label)
+    return batch[:len(kept)], np.array(kept, dtype=np.int64), len(paths) - len(kept)
+
+
+class CascadeStats:
+    """Thread-safe counters for the cascade: escalation rate and time per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.faces = 0
+            self.escalated = 0
+            self.fast_seconds = 0.0
+            self.full_seconds = 0.0
+
+    def record(self, faces, escalated, fast_seconds, full_seconds):
+        with self._lock:
+            self.faces += faces
+            self.escalated += escalated
+            self.fast_seconds += fast_seconds
+            self.full_seconds += full_seconds
+
+    def snapshot(self):
+        with self._lock:
+            faces = self.faces or 1
+            return {
+                'faces': self.faces,
+                'escalated': self.escalated,
+                'escalation_rate': self.escalated / faces,
+                'avg_fast_ms': self.fast_seconds * 1000 / faces,
+                'avg_full_ms': self.full_seconds * 1000 / faces,
+                'avg_total_ms': (self.fast_seconds + self.full_seconds) * 1000 / faces
+            }
+
+
+class TwoStageClassifier:
+    """Run the fast model on every face and the full model only on unsure ones.
+
+    A face is escalated when the fast model's top probability is below
+    ``threshold``; escalated rows are replaced by the full model's output.
+    """
+
+    def __init__(self, fast_model, full_model, threshold=None):
+        self.fast_model = fast_model
+        self.full_model = full_model
+        self.threshold = Config.CASCADE_THRESHOLD if threshold is None else threshold
+        self.stats = CascadeStats()
+
+    def predict(self, batch):
+        start = time.perf_counter()
+        probs = self.fast_model(batch, training=False).numpy()
+        fast_seconds = time.perf_counter() - start
+
+        unsure = np.flatnonzero(probs.max(axis=1) < self.threshold)
+        full_seconds = 0.0
+        if len(unsure):
+            start = time.perf_counter()
+            probs[unsure] = self.full_model(batch[unsure], training=False).numpy()
+            full_seconds = time.perf_counter() - start
+
+        self.stats.record(len(batch), len(unsure), fast_seconds, full_seconds)
+        return probs
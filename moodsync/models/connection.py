@@ -0,0 +1,98 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+
+class PoolTimeout(RuntimeError):
+    """No pooled connection became free within the pool's timeout."""
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections shared by DatabaseManager and app.py.
+
+    A thread checks out one connection for its outermost ``connection()``
+    block; nested blocks on the same thread reuse that connection and so
+    share its transaction. The outermost block commits on success, rolls
+    back on error and returns the connection to the pool. With every
+    connection checked out, a checkout waits up to ``timeout`` seconds and
+    then raises PoolTimeout.
+    """
+
+    def __init__(self, db_path, size=None, pragmas=None, timeout=None):
+        self.db_path = db_path
+        self.size = size or Config.SQLITE_POOL_SIZE
+        self.timeout = Config.SQLITE_POOL_TIMEOUT if timeout is None else timeout
+        self.pragmas = Config.SQLITE_PRAGMAS if pragmas is None else pragmas
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f'All {self.size} connections to {self.db_path} stayed in use '
+                              f'for {self.timeout}s') from None
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._all = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Return the process-wide pool for ``db_path``, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
@@ -1,91 +1,219 @@
+import bisect
 import sqlite3
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import itertools
 import os
 import sys
+import time
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
+from models.connection import get_pool
+from models.migrations import migrate
+from models import emotion_vectors, forecast, journal, rollups, streaks, timezones
+from models.cache import AnalyticsCache, cached
+from models.timeseries import TimeSeriesEngine
+
+def _window_start(days):
+    # Epoch seconds of the start of a trailing window of ``days``
+    return int(time.time()) - int(days) * 86400
+
+def shard_paths(shard_dir=None, shard_count=None):
+    shard_dir = shard_dir or Config.SHARD_DIR
+    shard_count = shard_count or Config.SHARD_COUNT
+    return [os.path.join(shard_dir, f'shard_{n:02d}.db') for n in range(shard_count)]
+
+_IMPORT_MOOD = '''
+    INSERT INTO moods (user_id, detected_emotion, confidence_score, manual_mood, intensity, notes, context,
+                       timestamp, ts_epoch, local_day)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_JOURNAL_FIELDS = 'id, mood_id, content, timestamp, ts_epoch, local_day'
+
+# Moods (or journal entries) read per query in data exports
+_EXPORT_PAGE = 500
+
+# Mood columns in data exports (the suggestions are nested under each mood)
+_EXPORT_MOOD_FIELDS = ('id', 'timestamp', 'local_day', 'detected_emotion', 'confidence_score', 'manual_mood',
+                       'intensity', 'notes', 'context', 'image_path')
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = Config.DATABASE_PATH
+    def __init__(self, db_path=None, storage_mode=None, shard_dir=None, shard_count=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.pool = get_pool(self.db_path)
+        # Sharded mode: users and preferences stay in db_path, each user's
+        # moods, suggestions, rollups and streak live in shard user_id % count
+        self.storage_mode = storage_mode or Config.STORAGE_MODE
+        self.shards = None
+        if self.storage_mode == 'sharded':
+            paths = shard_paths(shard_dir, shard_count)
+            os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+            self.shards = [get_pool(path) for path in paths]
+        self.cache = AnalyticsCache(Config.ANALYTICS_CACHE_SIZE, Config.ANALYTICS_CACHE_TTL)
+        # Appends new moods by itself; writers that change or delete moods invalidate it
+        self.timeseries = TimeSeriesEngine(self)
         self.init_database()
     
+    def pool_for(self, user_id=None):
+        if self.shards is None or user_id is None:
+            return self.pool
+        return self.shards[int(user_id) % len(self.shards)]
+    
+    def all_pools(self):
+        return [self.pool] + (self.shards or [])
+    
+    def connection(self, user_id=None):
+        # Pooled connection to the user's shard (the main DB without a user or
+        # in single mode); the outermost block on a thread commits or rolls back
+        return self.pool_for(user_id).connection()
+    
     def init_database(self):
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create tables
-            cursor.executescript('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username VARCHAR(50) UNIQUE NOT NULL,
-                    email VARCHAR(100) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    first_name VARCHAR(50),
-                    last_name VARCHAR(50),
-                    profile_image VARCHAR(255),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                
-                CREATE TABLE IF NOT EXISTS moods (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER DEFAULT 1,
-                    detected_emotion VARCHAR(50),
-                    confidence_score FLOAT,
-                    manual_mood VARCHAR(50),
-                    intensity INTEGER,
-                    notes TEXT,
-                    context VARCHAR(100),
-                    image_path VARCHAR(255),
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                );
-                
-                CREATE TABLE IF NOT EXISTS suggestions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    mood_id INTEGER,
-                    suggestion_type VARCHAR(50),
-                    content TEXT,
-                    used BOOLEAN DEFAULT FALSE,
-                    helpful_rating INTEGER,
-                    FOREIGN KEY (mood_id) REFERENCES moods (id)
-                );
-                
-                -- Insert default user if not exists
-                INSERT OR IGNORE INTO users (id, username, email, password_hash) 
-                VALUES (1, 'default_user', 'user@moodsync.com', 'pbkdf2:sha256:150000$default_hash');
-            ''')
-            
-            conn.commit()
+        # All schema changes live in models/migrations.py; shards get the same schema
+        for pool in self.all_pools():
+            with pool.connection() as conn:
+                version = migrate(conn)
+            if pool is self.pool:
+                self.schema_version = version
+    
+    def explain(self, query, params=()):
+        # Query plan detail lines, e.g. to confirm an index is used
+        with self.connection() as conn:
+            return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+    
+    def user_zone(self, user_id):
+        with self.connection() as conn:
+            row = conn.execute('SELECT timezone FROM users WHERE id = ?', (user_id,)).fetchone()
+        return timezones.get_zone(row['timezone'] if row else None)
     
-    def log_mood(self, user_id=1, emotion=None, confidence=None, manual_mood=None, intensity=None, notes=None, context=None, image_path=None):
-        with sqlite3.connect(self.db_path) as conn:
+    def log_mood(self, user_id=1, emotion=None, confidence=None, manual_mood=None, intensity=None, notes=None, context=None, image_path=None, timestamp=None, probabilities=None):
+        # timestamp: aware datetime, or naive UTC; defaults to now
+        # probabilities: the model's output per EMOTION_LABELS label (list or dict), if detected
+        moment = timezones.to_utc(timestamp)
+        zone = self.user_zone(user_id)
+        day = timezones.local_day(moment, zone)
+        probs = emotion_vectors.encode(probabilities)
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO moods (user_id, detected_emotion, confidence_score, manual_mood, intensity, notes, context, image_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, emotion, confidence, manual_mood, intensity, notes, context, image_path))
+                INSERT INTO moods (user_id, detected_emotion, confidence_score, manual_mood, intensity, notes, context, image_path, timestamp, ts_epoch, local_day, emotion_probs)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, emotion, confidence, manual_mood, intensity, notes, context, image_path,
+                  timezones.format_utc(moment), int(moment.timestamp()), day, probs))
             
             mood_id = cursor.lastrowid
-            conn.commit()
-            return mood_id
+            # Same transaction as the insert
+            rollups.apply_mood(conn, mood_id)
+            streaks.record_day(conn, user_id, day)
+            forecast.record(conn, user_id, mood_id, emotion, int(moment.timestamp()), zone)
+        self.cache.invalidate(user_id)
+        return mood_id
     
-    def save_suggestions(self, mood_id, suggestions):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            for suggestion in suggestions:
-                cursor.execute('''
-                    INSERT INTO suggestions (mood_id, suggestion_type, content)
-                    VALUES (?, ?, ?)
-                ''', (mood_id, suggestion['type'], suggestion['content']))
-            
-            conn.commit()
+    def save_suggestions(self, mood_id, suggestions, user_id=None):
+        """Insert suggestions for a mood; returns them as get_suggestions_by_mood would.
+        
+        user_id (the mood's owner) picks the shard in sharded mode.
+        """
+        rows = [(mood_id, suggestion['type'], suggestion['content']) for suggestion in suggestions]
+        if not rows:
+            return []
+        with self.connection(user_id) as conn:
+            # A few rows a mood: one statement each, in the caller's transaction
+            ids = [conn.execute('''
+                INSERT INTO suggestions (mood_id, suggestion_type, content)
+                VALUES (?, ?, ?)
+            ''', row).lastrowid for row in rows]
+        return [{'id': suggestion_id, 'mood_id': mood_id, 'suggestion_type': suggestion_type, 'content': content,
+                 'helpful_rating': None, 'used': 0}
+                for suggestion_id, (_, suggestion_type, content) in zip(ids, rows)]
+    
+    def log_mood_with_suggestions(self, suggestions, **mood):
+        """Log a mood (log_mood keyword arguments) and its suggestions in one transaction.
+        
+        One commit instead of two; returns (mood_id, saved suggestions with ids).
+        """
+        user_id = mood.get('user_id', 1)
+        with self.connection(user_id):
+            mood_id = self.log_mood(**mood)
+            saved = self.save_suggestions(mood_id, suggestions, user_id)
+        # Again after the commit, so no reader caches the pre-commit state
+        self.cache.invalidate(user_id)
+        return mood_id, saved
+    
+    def import_moods(self, user_id, rows, batch_size=None):
+        """Bulk-insert importer.rows tuples for one user; returns (imported, duplicates, repeated).
+        
+        Each batch of ``batch_size`` rows is one transaction: sorted by time
+        so index inserts land next to each other, inserted with executemany,
+        then its notes indexed for search and its moods added to the rollups
+        with one statement each. A thread reads and validates the next batch
+        meanwhile. Streaks, the forecast counts and the cache are rebuilt
+        once at the end. A row with the same second, emotion, context and
+        notes as an entry the user already had is skipped as a duplicate, so
+        re-running an import adds nothing twice; one repeating an earlier row
+        of the same import is skipped and counted as repeated. Days before
+        the user's archive horizon get their rollups updated like any other
+        day.
+        """
+        batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+        rows = iter(rows)
+        pool = self.pool_for(user_id)
+        imported = duplicates = repeated = 0
+        # Ids this import added, one range (after, last] per batch, in order; moods
+        # logged meanwhile fall between them
+        added_after, added_last = [], []
+
+        def added(mood_id):
+            n = bisect.bisect_left(added_last, mood_id)
+            return n < len(added_last) and mood_id > added_after[n]
+
+        with ThreadPoolExecutor(1) as reader:
+            read = lambda: sorted(itertools.islice(rows, batch_size), key=lambda row: row[7])
+            pending = reader.submit(read)
+            while True:
+                batch = pending.result()
+                if not batch:
+                    break
+                pending = reader.submit(read)
+                with pool.connection() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    last_id = conn.execute('SELECT MAX(id) FROM moods').fetchone()[0] or 0
+                    # (ts_epoch, emotion, context, notes): whether this import added it
+                    seen = {tuple(row[:4]): added(row[4]) for row in conn.execute(
+                        'SELECT ts_epoch, detected_emotion, context, notes, id FROM moods '
+                        'WHERE user_id = ? AND ts_epoch BETWEEN ? AND ?',
+                        (user_id, batch[0][7], batch[-1][7]))}
+                    new = []
+                    for row in batch:
+                        key = (row[7], row[0], row[5], row[4])
+                        if key not in seen:
+                            seen[key] = True
+                            new.append((user_id, *row))
+                        elif seen[key]:
+                            repeated += 1
+                        else:
+                            duplicates += 1
+                    conn.execute('INSERT INTO journal_search_deferred (user_id) VALUES (?)', (user_id,))
+                    conn.executemany(_IMPORT_MOOD, new)
+                    if new:
+                        # Consecutive ids: the batch holds the write lock
+                        added_after.append(last_id)
+                        added_last.append(conn.execute('SELECT MAX(id) FROM moods').fetchone()[0])
+                    journal.index_moods(conn, user_id, last_id)
+                    conn.execute('DELETE FROM journal_search_deferred WHERE user_id = ?', (user_id,))
+                    rollups.apply_moods(conn, 'id > ?', (last_id,))
+                imported += len(new)
+        if imported:
+            with pool.connection() as conn:
+                streaks.rebuild(conn, user_id)
+                forecast.rebuild(conn, user_id, self.user_zone(user_id))
+            self.cache.invalidate(user_id)
+        return imported, duplicates, repeated
     
-    def get_suggestions_by_mood(self, mood_id):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def get_suggestions_by_mood(self, mood_id, user_id=None):
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, mood_id, suggestion_type, content, helpful_rating, used
@@ -95,179 +223,393 @@ class DatabaseManager:
             ''', (mood_id,))
             return [dict(row) for row in cursor.fetchall()]
     
+    def _suggestion_owner(self, conn, suggestion_id):
+        row = conn.execute('''
+            SELECT m.user_id FROM suggestions s JOIN moods m ON s.mood_id = m.id WHERE s.id = ?
+        ''', (suggestion_id,)).fetchone()
+        return row['user_id'] if row else None
+    
     def mark_suggestion_used(self, user_id, suggestion_id):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE suggestions
                 SET used = TRUE
                 WHERE id = ?
             ''', (suggestion_id,))
-            conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            owner = self._suggestion_owner(conn, suggestion_id)
+        if owner is not None:
+            self.cache.invalidate(owner)
+        return updated
     
+    @cached
     def get_mood_history(self, user_id=1, days=7, limit=None, emotion=None):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             
             base = '''
                 SELECT * FROM moods 
-                WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
+                WHERE user_id = ? AND ts_epoch >= ?
             '''
-            params = [user_id, days]
+            params = [user_id, _window_start(days)]
             
             if emotion:
                 base += " AND detected_emotion = ?"
                 params.append(emotion)
             
-            base += " ORDER BY timestamp DESC"
+            base += " ORDER BY ts_epoch DESC"
             
             if limit:
-                base += f" LIMIT {limit}"
+                base += " LIMIT ?"
+                params.append(limit)
             
             cursor.execute(base, tuple(params))
             return [dict(row) for row in cursor.fetchall()]
     
-    def get_mood_stats(self, user_id=1, days=30):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+    @cached
+    def get_mood_page(self, user_id=1, days=30, emotion=None, before=None, limit=None):
+        """One page of the mood log, newest first, with the columns the table shows.
+        
+        Keyset pagination on (ts_epoch, id): ``before`` is the cursor
+        returned with the previous page. Returns (entries, cursor), where
+        cursor is None on the last page, so each page costs the same
+        however much history the user has.
+        """
+        limit = limit or Config.MOOD_LOG_PAGE_SIZE
+        query = '''
+            SELECT id, timestamp, ts_epoch, detected_emotion, confidence_score, context, notes
+            FROM moods
+            WHERE user_id = ? AND ts_epoch >= ?
+        '''
+        params = [user_id, _window_start(days)]
+        if emotion:
+            query += " AND detected_emotion = ?"
+            params.append(emotion)
+        if before is not None:
+            query += " AND (ts_epoch, id) < (?, ?)"
+            params.extend(before)
+        # One extra row tells whether another page follows
+        query += " ORDER BY ts_epoch DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        with self.connection(user_id) as conn:
+            rows = conn.execute(query, params).fetchall()
+        entries = [dict(row) for row in rows[:limit]]
+        cursor = (entries[-1]['ts_epoch'], entries[-1]['id']) if len(rows) > limit else None
+        return entries, cursor
+    
+    def get_latest_mood_id(self, user_id=1):
+        # Id of the user's most recently written mood (None without moods); changes on every new entry
+        with self.connection(user_id) as conn:
+            return conn.execute('SELECT MAX(id) FROM moods WHERE user_id = ?', (user_id,)).fetchone()[0]
 
-            # Base filter for timeframe
-            timeframe_clause = "timestamp >= datetime('now', '-' || ? || ' days')"
+    def user_today(self, user_id=1):
+        return timezones.today(self.user_zone(user_id))
 
-            # Emotion counts
-            cursor.execute(
-                f'''
-                SELECT detected_emotion, COUNT(*) as count
-                FROM moods
-                WHERE user_id = ? AND {timeframe_clause}
-                GROUP BY detected_emotion
-                ORDER BY count DESC
-                ''',
-                (user_id, days)
-            )
-            emotion_counts = [dict(row) for row in cursor.fetchall()]
+    def get_mood_forecast(self, user_id=1, now=None):
+        # Not cached: one primary key read, and the part of the day moves with the clock
+        zone = self.user_zone(user_id)
+        with self.connection(user_id) as conn:
+            result = forecast.predict(conn, user_id, zone, now)
+            if result is None and not forecast.counted(conn, user_id) and conn.execute(
+                    'SELECT 1 FROM moods WHERE user_id = ? LIMIT 1', (user_id,)).fetchone():
+                # Moods logged before the counts existed: counted once, on first use
+                forecast.rebuild(conn, user_id, zone)
+                result = forecast.predict(conn, user_id, zone, now)
+        return result
 
-            # Daily averages of intensity
-            cursor.execute(
-                f'''
-                SELECT date(timestamp) as date, AVG(intensity) as avg_intensity
-                FROM moods
-                WHERE user_id = ? AND {timeframe_clause} AND intensity IS NOT NULL
-                GROUP BY date(timestamp)
-                ORDER BY date
+    def get_mood_stats(self, user_id=1, days=30):
+        return self.get_mood_stats_windows(user_id=user_id, windows=(days,))[days]
+    
+    @cached
+    def get_mood_stats_windows(self, user_id=1, windows=(7, 30, 365)):
+        """Mood statistics for several trailing windows (in days) at once.
+        
+        Reads the user's daily rollup rows for the longest window in one
+        query and buckets them per window; a window of ``days`` is that many
+        whole local days in the user's time zone, today included. The
+        streak is read from user_streaks. Returns {days: stats} with the
+        same stats shape as get_mood_stats.
+        """
+        windows = sorted(set(windows))
+        
+        today = timezones.today(self.user_zone(user_id))
+        with self.connection(user_id) as conn:
+            cutoffs = [(today - timedelta(days=days - 1)).isoformat() for days in windows]
+            rows = conn.execute(
+                '''
+                SELECT day, emotion, entries, intensity_sum, intensity_count
+                FROM mood_daily_rollup
+                WHERE user_id = ? AND day >= ?
                 ''',
-                (user_id, days)
-            )
-            daily_rows = [dict(row) for row in cursor.fetchall()]
-            daily_averages = {row['date']: float(row['avg_intensity']) if row['avg_intensity'] is not None else 0.0 for row in daily_rows}
-
-            # Total entries in window
-            cursor.execute(
-                f"""
-                SELECT COUNT(*) as total
-                FROM moods
-                WHERE user_id = ? AND {timeframe_clause}
-                """,
-                (user_id, days)
-            )
-            total_entries = int(cursor.fetchone()['total'])
-
-            # Average intensity over window
-            cursor.execute(
-                f"""
-                SELECT AVG(intensity) as avg_intensity
-                FROM moods
-                WHERE user_id = ? AND {timeframe_clause} AND intensity IS NOT NULL
-                """,
-                (user_id, days)
-            )
-            avg_row = cursor.fetchone()
-            average_intensity = float(avg_row['avg_intensity']) if avg_row and avg_row['avg_intensity'] is not None else 0.0
-
-            # Dominant emotion by count
-            dominant_emotion = emotion_counts[0]['detected_emotion'] if emotion_counts else None
-
-            # Streak calculation: consecutive days with any entry up to today
-            cursor.execute(
-                """
-                SELECT date(timestamp) as day
-                FROM moods
-                WHERE user_id = ? AND timestamp >= date('now', '-365 day')
-                GROUP BY date(timestamp)
-                ORDER BY day DESC
-                """,
-                (user_id,)
-            )
-            days_with_entries = [row['day'] for row in cursor.fetchall()]
-            days_set = set(days_with_entries)
-
-            # Walk back from today counting consecutive days present in set
-            from datetime import date, timedelta as _timedelta
-            streak = 0
-            current = date.today()
-            while current.strftime('%Y-%m-%d') in days_set:
-                streak += 1
-                current -= _timedelta(days=1)
-
-            return {
+                (user_id, cutoffs[-1])
+            ).fetchall()
+            streak = streaks.read(conn, user_id, today)
+        
+        stats = {}
+        for days, cutoff in zip(windows, cutoffs):
+            counts = {}
+            daily = {}
+            total_entries = 0
+            intensity_sum = 0
+            intensity_count = 0
+            for row in rows:
+                if row['day'] < cutoff:
+                    continue
+                emotion = row['emotion'] or None
+                counts[emotion] = counts.get(emotion, 0) + row['entries']
+                total_entries += row['entries']
+                if row['intensity_count']:
+                    day_sum, day_count = daily.get(row['day'], (0, 0))
+                    daily[row['day']] = (day_sum + row['intensity_sum'], day_count + row['intensity_count'])
+                    intensity_sum += row['intensity_sum']
+                    intensity_count += row['intensity_count']
+            
+            emotion_counts = [{'detected_emotion': emotion, 'count': count}
+                              for emotion, count in sorted(counts.items(), key=lambda item: -item[1])]
+            stats[days] = {
                 'emotion_counts': emotion_counts,
-                'daily_averages': daily_averages,
+                'daily_averages': {day: float(total) / count for day, (total, count) in sorted(daily.items())},
                 'total_entries': total_entries,
-                'average_intensity': average_intensity,
-                'dominant_emotion': dominant_emotion,
-                'streak': streak,
+                'average_intensity': float(intensity_sum) / intensity_count if intensity_count else 0.0,
+                'dominant_emotion': emotion_counts[0]['detected_emotion'] if emotion_counts else None,
+                'streak': streak['current'],
+                'longest_streak': streak['longest'],
             }
+        return stats
+    
+    def rebuild_rollups(self, user_id=None):
+        # Streaks are derived from the rollup days, forecast counts from the moods
+        for pool in self.mood_pools(user_id):
+            with pool.connection() as conn:
+                rollups.rebuild(conn, user_id)
+                streaks.rebuild(conn, user_id)
+                if user_id is None:
+                    conn.execute('DELETE FROM mood_forecast')
+                    user_ids = [row[0] for row in conn.execute(
+                        'SELECT DISTINCT user_id FROM moods WHERE user_id IS NOT NULL')]
+                else:
+                    user_ids = [user_id]
+                for uid in user_ids:
+                    forecast.rebuild(conn, uid, self.user_zone(uid))
+        if user_id is None:
+            self.cache.clear()
+            self.timeseries.clear()
+        else:
+            self.cache.invalidate(user_id)
+            self.timeseries.invalidate(user_id)
+    
+    def check_rollups(self, user_id=None):
+        mismatches = []
+        for pool in self.mood_pools(user_id):
+            with pool.connection() as conn:
+                mismatches += rollups.check(conn, user_id) + streaks.check(conn, user_id)
+        return mismatches
     
+    def mood_pools(self, user_id=None):
+        # Pools holding moods: the user's, or every one that can
+        if user_id is not None:
+            return [self.pool_for(user_id)]
+        return self.shards or [self.pool]
+    
+    @cached
     def get_suggestion_effectiveness(self, user_id=1):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             
+            # Ratings of archived moods' suggestions are kept as totals
             cursor.execute('''
-                SELECT s.suggestion_type, AVG(s.helpful_rating) as avg_rating, COUNT(*) as count
-                FROM suggestions s
-                JOIN moods m ON s.mood_id = m.id
-                WHERE m.user_id = ? AND s.helpful_rating IS NOT NULL
-                GROUP BY s.suggestion_type
+                SELECT suggestion_type, CAST(SUM(rating_sum) AS REAL) / SUM(ratings) as avg_rating, SUM(ratings) as count
+                FROM (
+                    SELECT s.suggestion_type, SUM(s.helpful_rating) AS rating_sum, COUNT(*) AS ratings
+                    FROM suggestions s
+                    JOIN moods m ON s.mood_id = m.id
+                    WHERE m.user_id = ? AND s.helpful_rating IS NOT NULL
+                    GROUP BY s.suggestion_type
+                    UNION ALL
+                    SELECT suggestion_type, rating_sum, ratings FROM archived_suggestion_ratings WHERE user_id = ?
+                )
+                GROUP BY suggestion_type
                 ORDER BY avg_rating DESC
-            ''', (user_id,))
+            ''', (user_id, user_id))
             
             return [dict(row) for row in cursor.fetchall()]
 
+    @cached
     def get_context_avg_intensity(self, user_id=1, days=30):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        # The last ``days`` local days, today included
+        cutoff = timezones.today(self.user_zone(user_id)) - timedelta(days=days - 1)
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 '''
-                SELECT context, AVG(intensity) as avg_intensity
-                FROM moods
-                WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days') AND intensity IS NOT NULL AND (context IS NOT NULL AND context <> '')
+                SELECT context, SUM(intensity_sum) / SUM(intensity_count) as avg_intensity
+                FROM mood_daily_context_rollup
+                WHERE user_id = ? AND day >= ?
                 GROUP BY context
+                HAVING SUM(intensity_count) > 0
                 ORDER BY avg_intensity DESC
                 ''',
-                (user_id, days)
+                (user_id, cutoff.isoformat())
             )
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_emotion_vectors(self, user_id=1, days=None):
+        """(ts_epoch int64 array, (N, 7) float32 probability array) of the user's
+        detected moods, oldest first, in one query; ``days`` limits it to a trailing window."""
+        since = _window_start(days) if days else 0
+        with self.connection(user_id) as conn:
+            rows = conn.execute('''
+                SELECT ts_epoch, emotion_probs FROM moods
+                WHERE user_id = ? AND ts_epoch >= ? AND emotion_probs IS NOT NULL
+                ORDER BY ts_epoch
+            ''', (user_id, since)).fetchall()
+        return (np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+                emotion_vectors.matrix(row[1] for row in rows))
+    
+    @cached
+    def get_emotion_profile(self, user_id=1, days=30):
+        """Average probability per emotion over the window (emotion_vectors.profile)."""
+        _, vectors = self.get_emotion_vectors(user_id, days)
+        return emotion_vectors.profile(vectors)
+    
     def rate_suggestion(self, user_id, suggestion_id, rating):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connection(user_id) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE suggestions
                 SET helpful_rating = ?, used = TRUE
                 WHERE id = ?
             ''', (rating, suggestion_id))
-            
-            conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            owner = self._suggestion_owner(conn, suggestion_id)
+        if owner is not None:
+            self.cache.invalidate(owner)
+        return updated
+    
+    def save_journal_entry(self, user_id, content, mood_id=None, timestamp=None):
+        # Indexed for search by a trigger, in the same transaction
+        moment = timezones.to_utc(timestamp)
+        with self.connection(user_id) as conn:
+            # Only link the user's own moods
+            if mood_id is not None and not conn.execute('SELECT 1 FROM moods WHERE id = ? AND user_id = ?',
+                                                        (mood_id, user_id)).fetchone():
+                mood_id = None
+            cursor = conn.execute('''
+                INSERT INTO journal_entries (user_id, mood_id, content, timestamp, ts_epoch, local_day)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, mood_id, content, timezones.format_utc(moment), int(moment.timestamp()),
+                  timezones.local_day(moment, self.user_zone(user_id))))
+            return cursor.lastrowid
+    
+    def get_journal_entries(self, user_id, before=None, limit=None):
+        """One page of the user's journal, newest first; keyset-paginated like get_mood_page.
+        
+        Returns (entries, cursor), cursor being None on the last page.
+        """
+        limit = limit or Config.MOOD_LOG_PAGE_SIZE
+        query = f'SELECT {_JOURNAL_FIELDS} FROM journal_entries WHERE user_id = ?'
+        params = [user_id]
+        if before is not None:
+            query += " AND (ts_epoch, id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY ts_epoch DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self.connection(user_id) as conn:
+            rows = conn.execute(query, params).fetchall()
+        entries = [dict(row) for row in rows[:limit]]
+        cursor = (entries[-1]['ts_epoch'], entries[-1]['id']) if len(rows) > limit else None
+        return entries, cursor
+    
+    def search_journal(self, user_id, text, offset=0, limit=None):
+        """Journal entries and mood notes matching ``text``; see models/journal.py for the order.
+        
+        Words are ANDed, ``word*`` matches a prefix. Each result has kind
+        ('journal' or 'mood'), source_id, ts_epoch, timestamp and an HTML
+        snippet with the matches in <mark>. Returns (results, more).
+        """
+        limit = limit or Config.MOOD_LOG_PAGE_SIZE
+        with self.connection(user_id) as conn:
+            rows = journal.search(conn, user_id, text, offset, limit + 1, Config.JOURNAL_SEARCH_RANK_WINDOW)
+        results = rows[:limit]
+        for result in results:
+            result['timestamp'] = time.strftime(timezones.TIMESTAMP_FORMAT, time.gmtime(result['ts_epoch']))
+        return results, len(rows) > limit
+    
+    def _export_pages(self, user_id, query, params=()):
+        # Rows of ``query`` (ending in "(ts_epoch, id) > (?, ?) ... LIMIT ?") page by page in
+        # (ts_epoch, id) order; each page is read with its own short connection checkout,
+        # so a slow download never keeps a pooled connection
+        after = (-2 ** 63, 0)
+        while True:
+            with self.connection(user_id) as conn:
+                rows = conn.execute(query, (*params, *after, _EXPORT_PAGE)).fetchall()
+            if not rows:
+                return
+            yield rows
+            after = (rows[-1]['ts_epoch'], rows[-1]['id'])
+    
+    def iter_user_export(self, user_id):
+        """Yield ('profile', dict), ('mood', dict) for each mood with its suggestions, then
+        ('journal', dict) for each journal entry, oldest first.
+        
+        Rows are read in pages of _EXPORT_PAGE moods or entries, resuming
+        after the last (ts_epoch, id), so memory stays flat however long
+        the history and no pooled connection is held between pages. Moods
+        logged during the export may or may not be in it; none is listed
+        twice or missed otherwise.
+        """
+        with self.connection() as conn:
+            profile = conn.execute('''
+                SELECT id, username, email, first_name, last_name, bio, timezone, created_at FROM users WHERE id = ?
+            ''', (user_id,)).fetchone()
+        yield 'profile', dict(profile) if profile else {'id': user_id}
+        
+        pages = self._export_pages(user_id, '''
+            SELECT m.id, m.ts_epoch, m.timestamp, m.local_day, m.detected_emotion, m.confidence_score, m.manual_mood,
+                   m.intensity, m.notes, m.context, m.image_path,
+                   s.id AS suggestion_id, s.suggestion_type, s.content, s.used, s.helpful_rating
+            FROM (SELECT * FROM moods WHERE user_id = ? AND (ts_epoch, id) > (?, ?) ORDER BY ts_epoch, id LIMIT ?) m
+            LEFT JOIN suggestions s ON s.mood_id = m.id
+            ORDER BY m.ts_epoch, m.id, s.id
+        ''', (user_id,))
+        for rows in pages:
+            mood = None
+            for row in rows:
+                if mood is None or mood['id'] != row['id']:
+                    if mood is not None:
+                        yield 'mood', mood
+                    mood = {key: row[key] for key in _EXPORT_MOOD_FIELDS}
+                    mood['suggestions'] = []
+                if row['suggestion_id'] is not None:
+                    mood['suggestions'].append({'id': row['suggestion_id'], 'type': row['suggestion_type'],
+                                                'content': row['content'], 'used': bool(row['used']),
+                                                'helpful_rating': row['helpful_rating']})
+            # A page holds all suggestions of its moods
+            yield 'mood', mood
+        
+        pages = self._export_pages(user_id, f'''
+            SELECT {_JOURNAL_FIELDS} FROM journal_entries
+            WHERE user_id = ? AND (ts_epoch, id) > (?, ?) ORDER BY ts_epoch, id LIMIT ?
+        ''', (user_id,))
+        for rows in pages:
+            for row in rows:
+                yield 'journal', dict(row)
+    
+    def iter_user_images(self, user_id):
+        # Stored image paths (relative to static/) of a user's moods, paged like the export
+        pages = self._export_pages(user_id, '''
+            SELECT id, ts_epoch, image_path FROM moods
+            WHERE user_id = ? AND image_path IS NOT NULL AND image_path <> '' AND (ts_epoch, id) > (?, ?)
+            ORDER BY ts_epoch, id LIMIT ?
+        ''', (user_id,))
+        for rows in pages:
+            for row in rows:
+                yield row['image_path']
     
     def get_user_profile(self, user_id=1):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('SELECT id, username, email, first_name, last_name, profile_image, created_at FROM users WHERE id = ?', (user_id,))
@@ -275,7 +617,7 @@ class DatabaseManager:
             
     def register_user(self, username, email, password_hash, first_name=None, last_name=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO users (username, email, password_hash, first_name, last_name)
@@ -283,15 +625,13 @@ class DatabaseManager:
                 ''', (username, email, password_hash, first_name, last_name))
                 
                 user_id = cursor.lastrowid
-                conn.commit()
                 return user_id
         except sqlite3.IntegrityError:
             # Username or email already exists
             return None
     
     def get_user_by_username(self, username):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
@@ -299,16 +639,29 @@ class DatabaseManager:
             return dict(user) if user else None
     
     def get_user_by_email(self, email):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
             user = cursor.fetchone()
             return dict(user) if user else None
             
+    def set_user_timezone(self, user_id, name):
+        # Applies to moods logged from now on; stored local days are kept
+        if not timezones.is_valid(name):
+            return False
+        with self.connection() as conn:
+            cursor = conn.execute('UPDATE users SET timezone = ? WHERE id = ?', (name, user_id))
+        if cursor.rowcount:
+            # Parts of the day move with the zone
+            with self.connection(user_id) as conn:
+                forecast.rebuild(conn, user_id, timezones.get_zone(name))
+        self.cache.invalidate(user_id)
+        self.timeseries.invalidate(user_id)
+        return cursor.rowcount > 0
+    
     def update_user_profile(self, user_id, first_name=None, last_name=None, profile_image=None):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             # Build update query dynamically based on provided fields
@@ -334,5 +687,4 @@ class DatabaseManager:
             params.append(user_id)
             
             cursor.execute(query, params)
-            conn.commit()
             return cursor.rowcount > 0
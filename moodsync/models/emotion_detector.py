@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from tensorflow.keras.models import load_model, model_from_json
 from PIL import Image
 import base64
 import io
@@ -8,33 +7,22 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
+from models.weight_store import load_model
+from models.preprocessing import crop_faces, preprocess_faces
+from models.cascade import TwoStageClassifier
 
 class EmotionDetector:
-    def __init__(self):
+    def __init__(self, inference_mode=None):
+        self.classifier = None
         try:
-            # Load model architecture from JSON file
-            json_file = open(Config.MODEL_JSON_PATH, "r")
-            model_json = json_file.read()
-            json_file.close()
-            
-            # Register custom objects to ensure compatibility
-            from tensorflow.keras.models import Sequential
-            from tensorflow.keras.layers import Conv2D, MaxPooling2D, Dropout, Flatten, Dense
-            
-            custom_objects = {
-                'Sequential': Sequential,
-                'Conv2D': Conv2D,
-                'MaxPooling2D': MaxPooling2D,
-                'Dropout': Dropout,
-                'Flatten': Flatten,
-                'Dense': Dense
-            }
-            
-            # Create model from JSON and load weights
-            self.model = model_from_json(model_json, custom_objects=custom_objects)
-            self.model.load_weights(Config.MODEL_H5_PATH)
+            # Create model from JSON and load weights (flat weight file when exported, else H5)
+            self.model = load_model(Config.MODEL_JSON_PATH, Config.MODEL_H5_PATH, Config.MODEL_WEIGHTS_PATH)
             print("Model loaded successfully!")
             
+            # Optional two-stage cascade in front of the full model
+            if (inference_mode or Config.INFERENCE_MODE) == 'cascade':
+                self.load_cascade()
+            
             # Initialize face detection
             self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
             self.emotion_labels = Config.EMOTION_LABELS
@@ -42,22 +30,49 @@ class EmotionDetector:
             print(f"Error loading model: {e}")
             self.model = None
     
+    def load_cascade(self, threshold=None):
+        try:
+            fast_model = load_model(Config.FAST_MODEL_JSON_PATH, weights_path=Config.FAST_MODEL_WEIGHTS_PATH)
+            self.classifier = TwoStageClassifier(fast_model, self.model, threshold)
+            print("Cascade fast model loaded successfully!")
+        except Exception as e:
+            print(f"Error loading cascade fast model, using full model only: {e}")
+            self.classifier = None
+    
+    def predict(self, faces):
+        # Class probabilities for a preprocessed (N, 48, 48, 1) batch
+        if self.classifier is not None:
+            return self.classifier.predict(faces)
+        return self.model(faces, training=False).numpy()
+    
     def detect_emotion_from_image(self, image_data):
-        # Convert base64 to image
+        emotion, confidence, _ = self.analyze_image(image_data)
+        return emotion, confidence
+    
+    def analyze_image(self, image_data):
+        # (emotion, confidence, probability per emotion label); (None, 0.0, None) without a face
+        emotion, confidence, probabilities, _, _ = self.analyze_face(image_data)
+        return emotion, confidence, probabilities
+    
+    def analyze_face(self, image_data):
+        # analyze_image plus the face box (x, y, w, h) and its uint8 crop, for the face crop cache
         image = self.base64_to_image(image_data)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Detect face and predict emotion
-        faces = self.detect_faces(image)
+        faces = self.detect_faces(gray)
         if len(faces) == 0:
-            return None, 0.0
+            return None, 0.0, None, None, None
         
         # Process largest face
-        face = self.extract_face(image, faces[0])
-        emotion_probs = self.model(face, training=False).numpy()
-        emotion_index = np.argmax(emotion_probs)
-        confidence = emotion_probs[0][emotion_index]
+        crop = crop_faces(gray, faces[:1])
+        face = np.divide(crop[..., np.newaxis], np.float32(255.0))
+        emotion_probs = self.predict(face)[0]
+        emotion_index = int(np.argmax(emotion_probs))
+        probabilities = [float(p) for p in emotion_probs]
+        box = tuple(int(v) for v in faces[0])
         
-        return self.emotion_labels[emotion_index], float(confidence)
+        return self.emotion_labels[emotion_index], probabilities[emotion_index], probabilities, box, crop[0]
     
     def base64_to_image(self, base64_string):
         # Remove header if present
@@ -73,7 +88,7 @@ class EmotionDetector:
     
     def detect_faces(self, image):
         # Convert to grayscale for face detection
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Detect faces with improved parameters
         faces = self.face_cascade.detectMultiScale(
@@ -87,44 +102,26 @@ class EmotionDetector:
         return faces
     
     def extract_face(self, image, face_coords):
-        x, y, w, h = face_coords
-        
-        # Extract face region
-        face_img = image[y:y+h, x:x+w]
-        
-        # Resize to model input size (48x48)
-        face_img = cv2.resize(face_img, (48, 48))
-        
-        # Convert to grayscale
-        face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        
-        # Normalize pixel values
-        face_img = face_img / 255.0
-        
-        # Reshape for model input
-        face_img = np.reshape(face_img, (1, 48, 48, 1))
-        
-        return face_img
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return preprocess_faces(gray, [face_coords])
     
     def detect_emotion_from_frame(self, frame):
         # Detect faces
-        faces = self.detect_faces(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.detect_faces(gray)
+        if len(faces) == 0:
+            return []
+        
+        # Predict all faces in one batch
+        emotion_probs = self.predict(preprocess_faces(gray, faces))
         
         results = []
-        for (x, y, w, h) in faces:
-            # Extract and process face
-            face = self.extract_face(frame, (x, y, w, h))
-            
-            # Predict emotion
-            emotion_probs = self.model(face, training=False).numpy()
-            emotion_index = np.argmax(emotion_probs)
-            confidence = emotion_probs[0][emotion_index]
-            emotion = self.emotion_labels[emotion_index]
-            
+        for (x, y, w, h), probs in zip(faces, emotion_probs):
+            emotion_index = np.argmax(probs)
             results.append({
                 'coords': (x, y, w, h),
-                'emotion': emotion,
-                'confidence': float(confidence)
+                'emotion': self.emotion_labels[emotion_index],
+                'confidence': float(probs[emotion_index])
             })
         
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,92 @@
+"""Per-mood emotion probability vectors.
+
+A detected mood keeps the model's whole softmax output, one probability
+per ``Config.EMOTION_LABELS`` label in that order, in
+``moods.emotion_probs`` as little-endian float16: 14 bytes a mood. float16
+is good to about three decimal places, which is plenty for probabilities.
+The labels and confidences can then be re-derived (another threshold,
+another aggregation) without running the model on stored images again.
+
+``matrix`` turns the blobs of one query into an (N, 7) float32 array with
+a single ``frombuffer``; ``profile`` and ``relabel`` work on that array.
+"""
+import math
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+LABELS = Config.EMOTION_LABELS
+DTYPE = np.dtype('<f2')
+BLOB_SIZE = len(LABELS) * DTYPE.itemsize
+
+
+def encode(probabilities):
+    """Blob for a probability vector (sequence in LABELS order, or dict of label: p); None for None.
+
+    Raises ValueError for the wrong length, unknown labels or values
+    outside 0-1.
+    """
+    if probabilities is None:
+        return None
+    if isinstance(probabilities, dict):
+        unknown = set(probabilities) - set(LABELS)
+        if unknown:
+            raise ValueError(f'Unknown emotion labels: {", ".join(sorted(map(str, unknown)))}')
+        probabilities = [probabilities.get(label, 0.0) for label in LABELS]
+    vector = np.asarray(probabilities, dtype=np.float64).reshape(-1)
+    if vector.size != len(LABELS):
+        raise ValueError(f'Expected {len(LABELS)} probabilities, got {vector.size}')
+    if not np.all(np.isfinite(vector)) or vector.min() < 0 or vector.max() > 1:
+        raise ValueError('Probabilities must be between 0 and 1')
+    return vector.astype(DTYPE).tobytes()
+
+
+def decode(blob):
+    """float32 vector of one blob."""
+    return np.frombuffer(blob, dtype=DTYPE).astype(np.float32)
+
+
+def as_dict(blob):
+    return {label: round(float(p), 4) for label, p in zip(LABELS, decode(blob))} if blob else None
+
+
+def matrix(blobs):
+    """(N, len(LABELS)) float32 array of N blobs."""
+    blobs = list(blobs)
+    if not blobs:
+        return np.zeros((0, len(LABELS)), dtype=np.float32)
+    return np.frombuffer(b''.join(blobs), dtype=DTYPE).reshape(len(blobs), len(LABELS)).astype(np.float32)
+
+
+def profile(vectors):
+    """Average emotion profile of an (N, 7) array.
+
+    ``average``: mean probability per label; ``dominant``: its top label;
+    ``confidence``: mean top probability; ``uncertainty``: mean entropy
+    over its maximum (0 = always certain, 1 = always uniform).
+    """
+    if len(vectors) == 0:
+        return {'entries': 0, 'average': {label: 0.0 for label in LABELS}, 'dominant': None,
+                'confidence': None, 'uncertainty': None}
+    vectors = vectors.astype(np.float64)
+    average = vectors.mean(axis=0)
+    clipped = np.clip(vectors, 1e-12, 1.0)
+    entropy = -(vectors * np.log(clipped)).sum(axis=1) / math.log(len(LABELS))
+    return {
+        'entries': int(len(vectors)),
+        'average': {label: round(float(p), 4) for label, p in zip(LABELS, average)},
+        'dominant': LABELS[int(average.argmax())],
+        'confidence': round(float(vectors.max(axis=1).mean()), 4),
+        'uncertainty': round(float(entropy.mean()), 4),
+    }
+
+
+def relabel(vectors, threshold=0.0):
+    """Top label per row, None where its probability is below ``threshold``."""
+    if len(vectors) == 0:
+        return []
+    top = vectors.argmax(axis=1)
+    confident = vectors.max(axis=1) >= threshold
+    return [LABELS[index] if ok else None for index, ok in zip(top.tolist(), confident.tolist())]
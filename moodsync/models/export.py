@@ -0,0 +1,115 @@
+"""Streaming exports of a user's data (Settings -> Download your data).
+
+Each function turns DatabaseManager.iter_user_export records into a
+generator of response chunks, so an export starts sending immediately
+and never holds the whole history (or all images) in memory:
+
+- ``ndjson_lines``: one JSON object per line, the profile first, then a
+  line per mood with its suggestions and ratings nested, then a line per
+  journal entry
+- ``csv_lines``: one row per mood and suggestion (the profile and journal
+  are only in the NDJSON and zip exports)
+- ``zip_chunks``: a zip with ``export.ndjson`` plus the mood images,
+  written entry by entry to the response
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+
+CSV_COLUMNS = ['mood_id', 'timestamp', 'local_day', 'detected_emotion', 'confidence_score', 'manual_mood',
+               'intensity', 'notes', 'context', 'suggestion_id', 'suggestion_type', 'suggestion', 'used',
+               'helpful_rating']
+
+_COPY_CHUNK = 64 * 1024
+
+
+def ndjson_lines(records):
+    for kind, record in records:
+        yield json.dumps({'type': kind, **record}, default=str) + '\n'
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for kind, record in records:
+        if kind != 'mood':
+            continue
+        mood = [record['id'], record['timestamp'], record['local_day'], record['detected_emotion'],
+                record['confidence_score'], record['manual_mood'], record['intensity'], record['notes'],
+                record['context']]
+        for suggestion in record['suggestions'] or [None]:
+            if suggestion is None:
+                writer.writerow(mood + [None] * 5)
+            else:
+                writer.writerow(mood + [suggestion['id'], suggestion['type'], suggestion['content'],
+                                        suggestion['used'], suggestion['helpful_rating']])
+        yield flush()
+
+
+def resolve_upload(image_path, upload_folder):
+    """Absolute path of a stored image path ('uploads/x.jpg', possibly with
+    Windows separators), or None if it is missing or outside the upload folder."""
+    relative = image_path.replace('\\', '/')
+    root = os.path.realpath(upload_folder)
+    path = os.path.realpath(os.path.join(os.path.dirname(root), relative))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that collects what ZipFile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_chunks(records, image_paths, upload_folder):
+    """Zip of export.ndjson and images/<file> for each path in ``image_paths``."""
+    sink = _ChunkSink()
+    # An unseekable sink makes ZipFile write data descriptors instead of seeking back
+    with zipfile.ZipFile(sink, 'w') as archive:
+        info = zipfile.ZipInfo('export.ndjson')
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, 'w') as entry:
+            for line in ndjson_lines(records):
+                entry.write(line.encode())
+                yield sink.drain()
+
+        seen = set()
+        for image_path in image_paths:
+            path = resolve_upload(image_path, upload_folder)
+            name = f'images/{os.path.basename(path)}' if path else None
+            if name is None or name in seen:
+                continue
+            seen.add(name)
+            # Images are already compressed: store them
+            with archive.open(zipfile.ZipInfo(name), 'w', force_zip64=os.path.getsize(path) > 2 ** 31) as entry, \
+                    open(path, 'rb') as f:
+                for block in iter(lambda: f.read(_COPY_CHUNK), b''):
+                    entry.write(block)
+                    yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,120 @@
+"""Face crops of stored mood images, so they can be scored again without the images.
+
+With ``Config.FACE_CACHE_ENABLED`` the detection path keeps, for every
+mood whose image it stores, the uint8 face crop the model was given
+(``preprocessing.crop_faces``) and the face box. Crops are fixed-size
+records appended to one file per UTC day, named after the day and the
+preprocessing settings (``2026-10-19.48x48p10e.crops``); crops made
+with other settings are simply not read. Each record is written with a
+single append, so concurrent writers in several processes never
+interleave. A torn record at the end after a crash is ignored by
+``read`` and cut off by the next ``append`` (which holds an exclusive
+``flock`` on the file meanwhile), so later records stay aligned.
+
+``FaceCache.read`` maps a file as a NumPy record array without reading
+it; ``index`` finds the crop of each mood and ``crops`` gathers any set
+of them into one array, which RescoreJob scales straight into a model
+batch, with no JPEG decoding or face detection.
+"""
+import fcntl
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+SUFFIX = '.crops'
+
+
+def record_dtype(size):
+    return np.dtype([('user_id', '<i8'), ('mood_id', '<i8'), ('ts_epoch', '<i8'), ('box', '<i4', (4,)),
+                     ('pixels', 'u1', (size, size))])
+
+
+class FaceCache:
+    def __init__(self, directory=None, size=None, padding=None, equalize=None):
+        self.directory = directory or Config.FACE_CACHE_DIR
+        self.size = size or Config.FACE_SIZE
+        padding = Config.FACE_PADDING if padding is None else padding
+        equalize = Config.FACE_EQUALIZE_HIST if equalize is None else equalize
+        self.suffix = f".{self.size}x{self.size}p{padding}{'e' if equalize else ''}{SUFFIX}"
+        self.dtype = record_dtype(self.size)
+
+    def path_for(self, day):
+        return os.path.join(self.directory, day + self.suffix)
+
+    def append(self, user_id, mood_id, box, crop, ts_epoch=None):
+        """Add the (size, size) uint8 crop and (x, y, w, h) box of a mood to today's file."""
+        ts_epoch = int(time.time()) if ts_epoch is None else int(ts_epoch)
+        record = np.zeros(1, dtype=self.dtype)
+        record['user_id'] = user_id
+        record['mood_id'] = mood_id
+        record['ts_epoch'] = ts_epoch
+        record['box'] = box
+        record['pixels'] = crop
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(time.strftime('%Y-%m-%d', time.gmtime(ts_epoch)))
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            size = os.fstat(fd).st_size
+            if size % self.dtype.itemsize:
+                # Torn record of an interrupted append: drop it so this one starts on a record boundary
+                os.ftruncate(fd, size - size % self.dtype.itemsize)
+            data = memoryview(record.tobytes())
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+
+    def files(self):
+        """The day files in the current format, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith(self.suffix))
+
+    def read(self, path):
+        """Memory-mapped records of one file (complete records only)."""
+        count = os.path.getsize(path) // self.dtype.itemsize
+        if not count:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+
+    def index(self):
+        """{(user_id, mood_id): (path, row)} of every cached crop; the newest wins."""
+        locations = {}
+        for path in self.files():
+            records = self.read(path)
+            for row, key in enumerate(zip(records['user_id'].tolist(), records['mood_id'].tolist())):
+                locations[key] = (path, row)
+        return locations
+
+    def crops(self, locations):
+        """uint8 (N, size, size) array of the crops at N (path, row) locations, in that order."""
+        out = np.empty((len(locations), self.size, self.size), dtype=np.uint8)
+        by_path = {}
+        for n, (path, row) in enumerate(locations):
+            by_path.setdefault(path, []).append((n, row))
+        for path, entries in by_path.items():
+            positions, rows = zip(*entries)
+            out[list(positions)] = self.read(path)['pixels'][list(rows)]
+        return out
+
+    def remove_before(self, day):
+        """Delete the files of days before ``day`` (ISO date); returns (files, bytes)."""
+        files = freed = 0
+        if not os.path.isdir(self.directory):
+            return files, freed
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX) and name[:10] < day:
+                path = os.path.join(self.directory, name)
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                files += 1
+                freed += size
+        return files, freed
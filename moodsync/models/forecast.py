@@ -0,0 +1,185 @@
+"""Next-mood forecasts from per-user transition counts, kept in ``mood_forecast``.
+
+The model of a user is a Markov chain over ``Config.EMOTION_LABELS``
+conditioned on the part of the (local) day: ``transitions[part, a, b]``
+counts moods b that followed a mood a (within
+``Config.TIMESERIES_TRANSITION_GAP_HOURS``, like the transition matrix of
+models/timeseries.py) and were logged in ``part``; ``occurrences[part, b]``
+counts every mood b logged in ``part``. Both are uint32 arrays in one
+896-byte blob per user, next to the user's last mood.
+
+``record`` updates the row in O(1) in the insert's transaction. A mood
+older than the user's last one goes between two moods that followed each
+other: their transition is replaced by the two through the new mood, with
+the neighbours found by two index probes. A user without a row yet (see
+``counted``) gets the counts recomputed from their moods. Like the
+rollups, the counts keep moods that were archived since; ``rebuild``
+counts only the moods still stored.
+
+``predict`` reads the one row and backs off from the most specific
+distribution with at least ``Config.FORECAST_MIN_SUPPORT`` moods: after
+the last mood at this part of the day, after the last mood at any time,
+any mood at this part of the day, any mood.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from models import timeseries
+
+LABELS = Config.EMOTION_LABELS
+PARTS = ['night', 'morning', 'afternoon', 'evening']
+
+_K = len(LABELS)
+_P = len(PARTS)
+# Blob layout: transitions (part, previous, next), then occurrences (part, emotion)
+_DTYPE = np.dtype('<u4')
+
+# The moods right before and after a backdated one, in (ts_epoch, id) order
+_BEFORE = '''
+    SELECT detected_emotion, ts_epoch FROM moods
+    WHERE user_id = ? AND ts_epoch <= ? AND id <> ?
+    ORDER BY ts_epoch DESC, id DESC LIMIT 1
+'''
+_AFTER = '''
+    SELECT detected_emotion, ts_epoch FROM moods
+    WHERE user_id = ? AND ts_epoch > ?
+    ORDER BY ts_epoch, id LIMIT 1
+'''
+
+_UPSERT = '''
+    INSERT INTO mood_forecast (user_id, last_mood_id, last_emotion, last_ts, counts)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_mood_id = excluded.last_mood_id,
+        last_emotion = excluded.last_emotion,
+        last_ts = excluded.last_ts,
+        counts = excluded.counts
+'''
+
+
+def part_of(ts, zone):
+    """Index into PARTS of the local hour of epoch ``ts`` (6 hours each, from midnight)."""
+    return datetime.fromtimestamp(int(ts), zone).hour // 6
+
+
+def _split(counts):
+    return counts[:_P * _K * _K].reshape(_P, _K, _K), counts[_P * _K * _K:].reshape(_P, _K)
+
+
+def _max_gap():
+    return Config.TIMESERIES_TRANSITION_GAP_HOURS * 3600
+
+
+def _transition(first, second, zone):
+    # Cell of a counted transition between two (emotion index, ts) moods, or None
+    (a, t0), (b, t1) = first, second
+    if a < 0 or b < 0 or t1 - t0 > _max_gap():
+        return None
+    return part_of(t1, zone), a, b
+
+
+def record(conn, user_id, mood_id, emotion, ts, zone):
+    """Count a new mood (stored ``detected_emotion``, epoch ``ts``).
+
+    Call in the insert's transaction, after the insert.
+    """
+    row = conn.execute('SELECT last_mood_id, last_emotion, last_ts, counts FROM mood_forecast WHERE user_id = ?',
+                       (user_id,)).fetchone()
+    if row is None:
+        rebuild(conn, user_id, zone)
+        return
+    counts = np.frombuffer(row['counts'], dtype=_DTYPE).copy()
+    transitions, occurrences = _split(counts)
+    mood = (timeseries.emotion_index(emotion), ts)
+    if mood[0] >= 0:
+        occurrences[part_of(ts, zone), mood[0]] += 1
+    last = (row['last_emotion'], row['last_ts'])
+    after = None
+    if ts < row['last_ts']:
+        after = conn.execute(_AFTER, (user_id, ts)).fetchone()
+        if after is not None:
+            before = conn.execute(_BEFORE, (user_id, ts, mood_id)).fetchone()
+            after = (timeseries.emotion_index(after['detected_emotion']), after['ts_epoch'])
+            last = before and (timeseries.emotion_index(before['detected_emotion']), before['ts_epoch'])
+            replaced = last and _transition(last, after, zone)
+            # Not counted if archiving made the two neighbours
+            if replaced and transitions[replaced]:
+                transitions[replaced] -= 1
+    for cell in (last and _transition(last, mood, zone),
+                 after and _transition(mood, after, zone)):
+        if cell:
+            transitions[cell] += 1
+    if after is None:
+        conn.execute(_UPSERT, (user_id, mood_id, mood[0], ts, counts.tobytes()))
+    else:
+        conn.execute('UPDATE mood_forecast SET counts = ? WHERE user_id = ?', (counts.tobytes(), user_id))
+
+
+def rebuild(conn, user_id, zone):
+    """Recompute one user's counts from their stored moods."""
+    series = timeseries.load(conn, user_id, zone)
+    if not len(series['id']):
+        conn.execute('DELETE FROM mood_forecast WHERE user_id = ?', (user_id,))
+        return
+    emotion = series['emotion'].astype(np.int64)
+    part = series['hour'].astype(np.int64) // 6
+    known = emotion >= 0
+    occurrences = np.bincount(part[known] * _K + emotion[known], minlength=_P * _K)
+    follows = known[:-1] & known[1:] & (np.diff(series['ts']) <= _max_gap())
+    transitions = np.bincount(((part[1:] * _K + emotion[:-1]) * _K + emotion[1:])[follows],
+                              minlength=_P * _K * _K)
+    counts = np.concatenate([transitions, occurrences]).astype(_DTYPE)
+    conn.execute(_UPSERT, (user_id, int(series['id'][-1]), int(emotion[-1]), int(series['ts'][-1]),
+                           counts.tobytes()))
+
+
+def counted(conn, user_id):
+    """Whether the user has a row (moods logged before the table existed have none)."""
+    return conn.execute('SELECT 1 FROM mood_forecast WHERE user_id = ?', (user_id,)).fetchone() is not None
+
+
+def predict(conn, user_id, zone, now=None, min_support=None):
+    """Distribution of the user's next mood, or None without any counted mood.
+
+    ``now``: epoch seconds (default the current time), which picks the part
+    of the day; the last mood only conditions the forecast while it is
+    within the transition gap. Returns {'emotion', 'probability',
+    'probabilities' (label: p), 'based_on' (moods), 'level', 'part',
+    'after' (the last mood's label or None)}.
+    """
+    row = conn.execute('SELECT last_emotion, last_ts, counts FROM mood_forecast WHERE user_id = ?',
+                       (user_id,)).fetchone()
+    if row is None:
+        return None
+    now = int(time.time()) if now is None else int(now)
+    min_support = Config.FORECAST_MIN_SUPPORT if min_support is None else min_support
+    transitions, occurrences = _split(np.frombuffer(row['counts'], dtype=_DTYPE).astype(np.int64))
+    part = part_of(now, zone)
+    last = row['last_emotion']
+    recent = last >= 0 and now - row['last_ts'] <= _max_gap()
+    levels = []
+    if recent:
+        levels += [('transition', transitions[part, last]), ('transition_any_time', transitions[:, last].sum(axis=0))]
+    levels += [('time_of_day', occurrences[part]), ('overall', occurrences.sum(axis=0))]
+    total = 0
+    for level, counts in levels:
+        total = int(counts.sum())
+        if total >= min_support:
+            break
+    if not total:
+        return None
+    best = int(counts.argmax())
+    return {
+        'emotion': LABELS[best],
+        'probability': round(int(counts[best]) / total, 4),
+        'probabilities': {label: round(int(n) / total, 4) for label, n in zip(LABELS, counts)},
+        'based_on': total,
+        'level': level,
+        'part': PARTS[part],
+        'after': LABELS[last] if recent and level.startswith('transition') else None,
+    }
+
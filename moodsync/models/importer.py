@@ -0,0 +1,187 @@
+"""Bulk import of mood history (Settings -> Import, ``manage.py import-moods``).
+
+Reads CSV or NDJSON from a text stream a line at a time, so a file of
+any size is imported in constant memory. MoodSync's own exports import
+as they are (CSV suggestion rows of one mood and non-mood NDJSON records
+are skipped); other trackers' files need a timestamp and an emotion
+column:
+
+- ``timestamp`` (or ``date``/``time``/``datetime``): ISO 8601 or epoch
+  seconds; without an offset it is UTC, as in the export
+- ``detected_emotion`` (or ``emotion``/``mood``, else ``manual_mood``):
+  mapped to ``Config.EMOTION_LABELS`` case-insensitively, with common
+  synonyms
+- optional ``manual_mood`` (mapped the same way), ``confidence_score``
+  (0-1), ``intensity`` (1-10), ``notes`` and ``context``
+
+``rows`` validates and yields insert tuples in MOOD_COLUMNS order and
+records why each rejected line was rejected,
+DatabaseManager.import_moods writes them, and ``import_stream`` does
+both and reports the counts.
+"""
+import csv
+import json
+import time
+from datetime import datetime, timezone
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+FORMATS = ('csv', 'ndjson')
+
+MOOD_COLUMNS = ('detected_emotion', 'confidence_score', 'manual_mood', 'intensity', 'notes', 'context',
+                'timestamp', 'ts_epoch', 'local_day')
+
+_TIMESTAMP_KEYS = ('timestamp', 'datetime', 'date', 'time')
+_EMOTION_KEYS = ('detected_emotion', 'emotion', 'mood')
+
+_SYNONYMS = {
+    'anger': 'Angry', 'mad': 'Angry', 'annoyed': 'Angry', 'frustrated': 'Angry', 'irritated': 'Angry',
+    'disgusted': 'Disgust',
+    'afraid': 'Fear', 'scared': 'Fear', 'fearful': 'Fear', 'anxious': 'Fear', 'anxiety': 'Fear', 'nervous': 'Fear',
+    'joy': 'Happy', 'joyful': 'Happy', 'happiness': 'Happy', 'great': 'Happy', 'good': 'Happy', 'excited': 'Happy',
+    'calm': 'Neutral', 'ok': 'Neutral', 'okay': 'Neutral', 'meh': 'Neutral', 'fine': 'Neutral', 'relaxed': 'Neutral',
+    'sadness': 'Sad', 'down': 'Sad', 'unhappy': 'Sad', 'depressed': 'Sad', 'awful': 'Sad', 'bad': 'Sad',
+    'surprised': 'Surprise', 'shocked': 'Surprise', 'amazed': 'Surprise',
+}
+
+EMOTIONS = {**_SYNONYMS, **{label.lower(): label for label in Config.EMOTION_LABELS}}
+
+# Rejected lines kept in the report; the count covers all of them
+MAX_ERRORS = 50
+
+
+class ImportErrors:
+    """Line numbers and reasons of rejected lines (the first MAX_ERRORS of them)."""
+
+    def __init__(self):
+        self.count = 0
+        self.samples = []
+
+    def add(self, line, message):
+        self.count += 1
+        if len(self.samples) < MAX_ERRORS:
+            self.samples.append({'line': line, 'error': message})
+
+
+def records(stream, fmt):
+    """(line number, dict) per record of a CSV or NDJSON text stream."""
+    if fmt == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        for row in reader:
+            yield reader.line_num, dict(zip(header, row))
+    elif fmt == 'ndjson':
+        for line_num, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError:
+                    yield line_num, None
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+
+def emotion_label(value):
+    """The EMOTION_LABELS label for an emotion name, or None."""
+    return EMOTIONS.get(str(value).strip().lower()) if value not in (None, '') else None
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _moment(value):
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            if not value.strip().replace('.', '', 1).isdigit():
+                raise
+            return datetime.fromtimestamp(float(value), timezone.utc)
+        return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+    return datetime.fromtimestamp(float(value), timezone.utc)
+
+
+def _number(value, kind, low, high, name):
+    if value in (None, ''):
+        return None
+    number = kind(value)
+    if not low <= number <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return number
+
+
+def _text(value, limit=None):
+    if value in (None, ''):
+        return None
+    return str(value)[:limit] if limit else str(value)
+
+
+def rows(stream, fmt, zone, errors):
+    """Validated MOOD_COLUMNS tuples from a stream; rejected lines go to ``errors``."""
+    utc = zone is timezone.utc or getattr(zone, 'key', None) == 'UTC'
+    last_mood_id = None
+    for line, record in records(stream, fmt):
+        if not isinstance(record, dict):
+            errors.add(line, 'not a JSON object')
+            continue
+        if fmt == 'ndjson' and record.get('type', 'mood') != 'mood':
+            continue
+        # A CSV export has a row per suggestion of each mood
+        mood_id = record.get('mood_id')
+        if mood_id not in (None, '') and mood_id == last_mood_id:
+            continue
+        last_mood_id = mood_id
+        try:
+            stamp = _first(record, _TIMESTAMP_KEYS)
+            if stamp is None:
+                raise ValueError('timestamp is required')
+            moment = _moment(stamp)
+            manual = record.get('manual_mood')
+            raw_emotion = _first(record, _EMOTION_KEYS) or manual
+            emotion = emotion_label(raw_emotion)
+            if emotion is None:
+                raise ValueError(f'unknown emotion: {raw_emotion!r}' if raw_emotion else 'emotion is required')
+            manual_mood = emotion_label(manual)
+            if manual not in (None, '') and manual_mood is None:
+                raise ValueError(f'unknown manual_mood: {manual!r}')
+            # isoformat is TIMESTAMP_FORMAT up to the offset, and much faster than strftime
+            timestamp = moment.isoformat(' ', 'seconds')[:19]
+            yield (
+                emotion,
+                _number(record.get('confidence_score'), float, 0.0, 1.0, 'confidence_score'),
+                manual_mood,
+                _number(record.get('intensity'), int, 1, 10, 'intensity'),
+                _text(record.get('notes')),
+                _text(record.get('context'), 100),
+                timestamp,
+                int(moment.timestamp()),
+                timestamp[:10] if utc else moment.astimezone(zone).date().isoformat(),
+            )
+        except (TypeError, ValueError, OverflowError, OSError) as e:
+            errors.add(line, str(e))
+
+
+def import_stream(db, user_id, stream, fmt, batch_size=None):
+    """Import a CSV or NDJSON text stream for a user; returns the report."""
+    errors = ImportErrors()
+    started = time.perf_counter()
+    imported, duplicates, repeated = db.import_moods(user_id, rows(stream, fmt, db.user_zone(user_id), errors),
+                                                    batch_size)
+    elapsed = time.perf_counter() - started
+    total = imported + duplicates + repeated + errors.count
+    return {
+        'imported': imported,
+        'duplicates': duplicates,
+        'repeated': repeated,
+        'rejected': errors.count,
+        'errors': errors.samples,
+        'duration_s': round(elapsed, 2),
+        'rows_per_s': round(total / elapsed) if elapsed else total,
+    }
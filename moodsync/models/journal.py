@@ -0,0 +1,132 @@
+"""Full-text search over journal entries and mood notes.
+
+Triggers (migration 8) copy journal text and non-empty mood notes into
+``journal_search_docs``, the external content of the FTS5 table
+``journal_search``. A document's id is ``user_id << 32`` plus a per-user
+sequence, so:
+
+- a user's documents are one rowid range, which FTS5 seeks to directly
+  instead of matching every user's rows and filtering them
+- within the range, a higher id is a more recently written document,
+  journal entry or note alike
+
+A search ranks the user's newest ``window`` matches and lists older ones
+after them, newest first, so common words cost about the same as rare
+ones. Ranking is BM25's term-frequency and length parts computed here
+over those matches. FTS5's bm25() also computes each word's IDF, which
+reads the word's whole doclist, i.e. every user's documents, on every
+query; every match contains every word anyway. Two- and three-letter
+prefix indexes keep short prefix queries cheap.
+"""
+import html
+import re
+
+_TERM = re.compile(r'(\w+)(\*?)')
+
+# highlight() marks matches with these; the text is escaped before they become <mark>
+_OPEN = '\x02'
+_CLOSE = '\x03'
+
+# BM25 parameters (FTS5's defaults)
+_K1 = 1.2
+_B = 0.75
+
+SNIPPET_WORDS = 16
+
+# Rowid of the oldest of the newest ``window`` matches
+_WINDOW_START = '''
+    SELECT rowid FROM journal_search
+    WHERE journal_search MATCH ? AND rowid BETWEEN ? AND ?
+    ORDER BY rowid DESC LIMIT 1 OFFSET ?
+'''
+
+_MATCHES = '''
+    SELECT rowid, kind, source_id, ts_epoch, highlight(journal_search, 0, char(2), char(3)) AS marked
+    FROM journal_search
+    WHERE journal_search MATCH ? AND rowid BETWEEN ? AND ?
+'''
+
+_NEWEST = _MATCHES + ' ORDER BY rowid DESC LIMIT ? OFFSET ?'
+
+# Notes of the user's moods after an id, as documents numbered on from the user's last one
+_INDEX_MOODS = '''
+    INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+    SELECT COALESCE((SELECT id FROM journal_search_docs WHERE id BETWEEN :low AND :high
+                     ORDER BY id DESC LIMIT 1), :low) + ROW_NUMBER() OVER (ORDER BY id),
+           user_id, 'mood', id, ts_epoch, notes
+    FROM moods
+    WHERE id > :after AND user_id = :user AND notes IS NOT NULL AND notes <> ''
+'''
+
+
+def match_query(text):
+    """FTS5 query for search text, or None if it has no words.
+
+    Words are ANDed and a trailing ``*`` makes a word a prefix; every word
+    is quoted and anything else is dropped, so input can't be FTS5 syntax.
+    """
+    terms = [f'"{word}"' + star for word, star in _TERM.findall(text or '')]
+    return ' '.join(terms) or None
+
+
+def index_moods(conn, user_id, after_id):
+    """Index the notes of the user's moods with ids above ``after_id`` in one statement.
+
+    For bulk imports, which list the user in ``journal_search_deferred``
+    so the insert trigger skips them: FTS5 writes its pending terms out at
+    the end of every statement, so one statement for a batch is many
+    times cheaper than one per row.
+    """
+    low = int(user_id) << 32
+    conn.execute(_INDEX_MOODS, {'low': low, 'high': low + (1 << 32) - 1, 'after': after_id, 'user': user_id})
+
+
+def search(conn, user_id, text, offset=0, limit=20, window=500):
+    """One page of the user's matches as dicts of kind, source_id, ts_epoch and snippet.
+
+    The newest ``window`` matches come first, best first, then older
+    matches, newest first. Snippets are HTML with matches in <mark>.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    low = int(user_id) << 32
+    high = low + (1 << 32) - 1
+    row = conn.execute(_WINDOW_START, (query, low, high, window - 1)).fetchone()
+    # None: every match is in the window
+    start = row[0] if row else low
+    rows = []
+    if offset < window:
+        rows = _rank(conn.execute(_MATCHES, (query, start, high)).fetchall())[offset:offset + limit]
+    if row and len(rows) < limit:
+        rows += conn.execute(_NEWEST, (query, low, start - 1, limit - len(rows), max(0, offset - window))).fetchall()
+    return [{'kind': row['kind'], 'source_id': row['source_id'], 'ts_epoch': row['ts_epoch'],
+             'snippet': snippet(row['marked'])}
+            for row in rows]
+
+
+def _rank(rows):
+    # Length in characters stands in for length in tokens
+    if not rows:
+        return rows
+    average = sum(len(row['marked']) for row in rows) / len(rows)
+
+    def score(row):
+        frequency = row['marked'].count(_OPEN)
+        norm = _K1 * (1 - _B + _B * len(row['marked']) / average)
+        return frequency * (_K1 + 1) / (frequency + norm)
+
+    # Ties: newest first
+    return sorted(rows, key=lambda row: (-score(row), -row['rowid']))
+
+
+def snippet(marked, words=SNIPPET_WORDS):
+    """HTML excerpt of highlighted text around its first match: text escaped, matches in <mark>."""
+    tokens = marked.split()
+    first = next((i for i, token in enumerate(tokens) if _OPEN in token), 0)
+    begin = max(0, min(first - words // 4, len(tokens) - words))
+    text = ' '.join(tokens[begin:begin + words])
+    if text.count(_OPEN) > text.count(_CLOSE):
+        text += _CLOSE
+    text = html.escape(text).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+    return ('…' if begin > 0 else '') + text + ('…' if begin + words < len(tokens) else '')
@@ -0,0 +1,243 @@
+"""Online retention, upload garbage collection and incremental vacuum.
+
+``MaintenanceJob.run`` does three passes and returns a report of what it
+reclaimed:
+
+- archive: raw moods older than ``retention_days`` (on the user's local
+  calendar) are deleted. Their days stay in the daily rollups, which
+  every analytics query reads already, and ``mood_archive`` records the
+  day before which the rollups have no raw moods behind them. Ratings of
+  the deleted moods' suggestions are added to
+  ``archived_suggestion_ratings``, and journal entries linked to those
+  moods are unlinked.
+- uploads: files in the upload folder that no mood or profile refers to
+  and that are older than ``grace`` seconds (so an upload is never
+  collected before its mood row is written) are deleted, as are face
+  crop cache files of days past the retention horizon.
+- vacuum: free pages are returned to the file system with
+  ``PRAGMA incremental_vacuum``, a few pages per transaction. A database
+  created before auto_vacuum was configured reports ``auto_vacuum: none``
+  and needs ``manage.py maintenance --enable-incremental-vacuum`` once.
+
+Every write is a short ``BEGIN IMMEDIATE`` transaction of at most
+``batch_size`` moods or ``vacuum_pages`` pages with a pause after it, so
+request handlers wait at most one batch for the write lock.
+"""
+import calendar
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from models.face_cache import FaceCache
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+_ARCHIVE_BATCH = '''
+    SELECT id FROM moods
+    WHERE user_id = ? AND ts_epoch < ? AND COALESCE(local_day, date(timestamp)) < ?
+    ORDER BY ts_epoch LIMIT ?
+'''
+
+_ARCHIVE_RATINGS = '''
+    INSERT INTO archived_suggestion_ratings (user_id, suggestion_type, rating_sum, ratings)
+    SELECT ?, suggestion_type, SUM(helpful_rating), COUNT(*)
+    FROM suggestions
+    WHERE mood_id IN ({ids}) AND helpful_rating IS NOT NULL
+    GROUP BY suggestion_type
+    ON CONFLICT (user_id, suggestion_type) DO UPDATE SET
+        rating_sum = rating_sum + excluded.rating_sum,
+        ratings = ratings + excluded.ratings
+'''
+
+_ARCHIVE_MARK = '''
+    INSERT INTO mood_archive (user_id, archived_before, moods) VALUES (?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        archived_before = MAX(archived_before, excluded.archived_before),
+        moods = moods + excluded.moods
+'''
+
+
+class MaintenanceJob:
+    def __init__(self, db, upload_folder=None, retention_days=None, grace=None, batch_size=None,
+                 pause_ms=None, vacuum_pages=None):
+        self.db = db
+        self.upload_folder = upload_folder or Config.UPLOAD_FOLDER
+        self.retention_days = Config.MOOD_RETENTION_DAYS if retention_days is None else retention_days
+        self.grace = Config.UPLOAD_GC_GRACE if grace is None else grace
+        self.batch_size = batch_size or Config.MAINTENANCE_BATCH_SIZE
+        self.pause = (Config.MAINTENANCE_PAUSE_MS if pause_ms is None else pause_ms) / 1000.0
+        self.vacuum_pages = vacuum_pages or Config.VACUUM_STEP_PAGES
+        self.last_report = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._max_transaction_ms = 0.0
+
+    def run(self):
+        """One full pass; returns (and keeps as ``last_report``) what it did."""
+        with self._run_lock:
+            started = time.time()
+            self._max_transaction_ms = 0.0
+            report = {'started_at': int(started)}
+            report['archive'] = self.archive()
+            report['uploads'] = self.collect_uploads()
+            report['face_crops'] = self.collect_face_crops()
+            report['databases'] = self.vacuum()
+            report['bytes_reclaimed'] = (report['uploads']['bytes'] + report['face_crops']['bytes']
+                                         + sum(d['bytes_reclaimed'] for d in report['databases']))
+            report['max_transaction_ms'] = round(self._max_transaction_ms, 2)
+            report['duration_s'] = round(time.time() - started, 2)
+            self.last_report = report
+            return report
+
+    def _write(self, pool, fn):
+        # fn(conn) in one short write transaction, then a pause for everyone else
+        start = time.perf_counter()
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            result = fn(conn)
+        self._max_transaction_ms = max(self._max_transaction_ms, (time.perf_counter() - start) * 1000)
+        if self.pause:
+            time.sleep(self.pause)
+        return result
+
+    def archive(self):
+        """Delete raw moods past the retention horizon; rollups keep their days."""
+        if self.retention_days <= 0:
+            return {'enabled': False, 'users': 0, 'moods': 0}
+        with self.db.connection() as conn:
+            user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+        users = moods = 0
+        for user_id in user_ids:
+            archived = self.archive_user(user_id)
+            if archived:
+                users += 1
+                moods += archived
+        return {'enabled': True, 'retention_days': self.retention_days, 'users': users, 'moods': moods}
+
+    def archive_user(self, user_id):
+        cutoff = self.db.user_today(user_id) - timedelta(days=self.retention_days)
+        # Every mood on a local day before the cutoff is before this instant
+        # (UTC midnight after the cutoff day), so ts_epoch narrows the index range
+        bound = calendar.timegm(cutoff.timetuple()) + 86400
+        cutoff = cutoff.isoformat()
+        pool = self.db.pool_for(user_id)
+        total = 0
+        while not self._stop.is_set():
+            archived = self._write(pool, lambda conn: self._archive_batch(conn, user_id, bound, cutoff))
+            total += archived
+            if archived < self.batch_size:
+                break
+        if total:
+            self.db.cache.invalidate(user_id)
+            self.db.timeseries.invalidate(user_id)
+        return total
+
+    def _archive_batch(self, conn, user_id, bound, cutoff):
+        mood_ids = [row[0] for row in conn.execute(_ARCHIVE_BATCH, (user_id, bound, cutoff, self.batch_size))]
+        if not mood_ids:
+            return 0
+        ids = ', '.join('?' * len(mood_ids))
+        conn.execute(_ARCHIVE_RATINGS.format(ids=ids), [user_id] + mood_ids)
+        conn.execute(f'DELETE FROM suggestions WHERE mood_id IN ({ids})', mood_ids)
+        conn.execute(f'DELETE FROM mood_predictions WHERE mood_id IN ({ids})', mood_ids)
+        conn.execute(f'UPDATE journal_entries SET mood_id = NULL WHERE mood_id IN ({ids})', mood_ids)
+        conn.execute(f'DELETE FROM moods WHERE id IN ({ids})', mood_ids)
+        conn.execute(_ARCHIVE_MARK, (user_id, cutoff, len(mood_ids)))
+        return len(mood_ids)
+
+    def referenced_uploads(self):
+        """File names of every upload a mood or profile still points to."""
+        names = set()
+        for pool in self.db.mood_pools():
+            with pool.connection() as conn:
+                names.update(os.path.basename(row[0].replace('\\', '/')) for row in conn.execute(
+                    "SELECT DISTINCT image_path FROM moods WHERE image_path IS NOT NULL AND image_path <> ''"))
+        with self.db.connection() as conn:
+            names.update(os.path.basename(row[0].replace('\\', '/')) for row in conn.execute(
+                "SELECT profile_image FROM users WHERE profile_image IS NOT NULL AND profile_image <> ''"))
+        return names
+
+    def collect_uploads(self):
+        """Delete unreferenced image uploads older than the grace period."""
+        if not os.path.isdir(self.upload_folder):
+            return {'files': 0, 'bytes': 0, 'referenced': 0}
+        # Listed before reading references: a file uploaded after the listing is
+        # not considered, one uploaded before it is protected by the grace period
+        entries = [entry for entry in os.scandir(self.upload_folder)
+                   if entry.is_file() and entry.name.rsplit('.', 1)[-1].lower() in Config.ALLOWED_EXTENSIONS]
+        referenced = self.referenced_uploads()
+        horizon = time.time() - self.grace
+        files = freed = 0
+        for entry in entries:
+            if entry.name in referenced:
+                continue
+            try:
+                stat = entry.stat()
+                if stat.st_mtime > horizon:
+                    continue
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            freed += stat.st_size
+        return {'files': files, 'bytes': freed, 'referenced': len(referenced)}
+
+    def collect_face_crops(self):
+        """Delete face crop cache files of days past the retention horizon."""
+        if self.retention_days <= 0:
+            return {'files': 0, 'bytes': 0}
+        # Files are per UTC day; a day more covers every user's local calendar
+        cutoff = datetime.now(timezone.utc).date() - timedelta(days=self.retention_days + 1)
+        files, freed = FaceCache().remove_before(cutoff.isoformat())
+        return {'files': files, 'bytes': freed}
+
+    def vacuum(self):
+        """Release free pages of every database file, a few at a time."""
+        return [self.vacuum_pool(pool) for pool in self.db.all_pools()]
+
+    def vacuum_pool(self, pool):
+        with pool.connection() as conn:
+            mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        free = before
+        if mode == 2:
+            while free and not self._stop.is_set():
+                free = self._write(pool, self._vacuum_step)
+            with pool.connection() as conn:
+                # Passive: shrinks the file as far as no reader needs the WAL
+                conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+        return {'path': pool.db_path, 'auto_vacuum': AUTO_VACUUM_MODES.get(mode, mode),
+                'free_pages': free, 'bytes_reclaimed': (before - free) * page_size,
+                'file_bytes': os.path.getsize(pool.db_path)}
+
+    def _vacuum_step(self, conn):
+        # Each row returned is one page moved; fetchall runs the step to completion
+        conn.execute(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})').fetchall()
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def start(self, interval_hours):
+        """Run every ``interval_hours`` on a daemon thread until ``close``."""
+        def loop():
+            while not self._stop.wait(interval_hours * 3600):
+                try:
+                    report = self.run()
+                    logger.info('maintenance: %s', report)
+                except Exception:
+                    logger.exception('maintenance run failed')
+
+        self._thread = threading.Thread(target=loop, name='maintenance', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        # Stops between batches; the current transaction still commits
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
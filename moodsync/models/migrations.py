@@ -0,0 +1,402 @@
+"""Versioned schema migrations, applied in order at startup.
+
+Every schema change goes here as a new entry at the end of MIGRATIONS;
+never edit one that has shipped. Steps are SQL strings or callables
+taking the connection. Each migration runs in its own transaction and
+is recorded in ``schema_migrations`` (and ``PRAGMA user_version``).
+"""
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def _add_users_bio(conn):
+    # Older databases got this column from the settings page
+    if not _column_exists(conn, 'users', 'bio'):
+        conn.execute('ALTER TABLE users ADD COLUMN bio TEXT')
+
+
+MIGRATIONS = [
+    (1, 'initial schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            first_name VARCHAR(50),
+            last_name VARCHAR(50),
+            profile_image VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS moods (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER DEFAULT 1,
+            detected_emotion VARCHAR(50),
+            confidence_score FLOAT,
+            manual_mood VARCHAR(50),
+            intensity INTEGER,
+            notes TEXT,
+            context VARCHAR(100),
+            image_path VARCHAR(255),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mood_id INTEGER,
+            suggestion_type VARCHAR(50),
+            content TEXT,
+            used BOOLEAN DEFAULT FALSE,
+            helpful_rating INTEGER,
+            FOREIGN KEY (mood_id) REFERENCES moods (id)
+        )
+        ''',
+        # Default user
+        '''
+        INSERT OR IGNORE INTO users (id, username, email, password_hash)
+        VALUES (1, 'default_user', 'user@moodsync.com', 'pbkdf2:sha256:150000$default_hash')
+        '''
+    ]),
+    (2, 'users.bio column', [_add_users_bio]),
+    (3, 'preferences table', [
+        '''
+        CREATE TABLE IF NOT EXISTS preferences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            theme VARCHAR(20) DEFAULT 'light',
+            dashboard_layout VARCHAR(20) DEFAULT 'grid',
+            show_suggestions BOOLEAN DEFAULT 1,
+            language VARCHAR(10) DEFAULT 'en',
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        '''
+    ]),
+    (4, 'mood and suggestion indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_moods_user_timestamp ON moods (user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_suggestions_mood ON suggestions (mood_id)',
+        'CREATE INDEX IF NOT EXISTS idx_preferences_user ON preferences (user_id)'
+    ]),
+    (5, 'daily mood rollups', [
+        '''
+        CREATE TABLE IF NOT EXISTS mood_daily_rollup (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            emotion VARCHAR(50) NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            intensity_sum REAL NOT NULL DEFAULT 0,
+            intensity_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, emotion)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS mood_daily_context_rollup (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            context VARCHAR(100) NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            intensity_sum REAL NOT NULL DEFAULT 0,
+            intensity_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, context)
+        ) WITHOUT ROWID
+        ''',
+        # Backfill from existing moods
+        '''
+        INSERT INTO mood_daily_rollup (user_id, day, emotion, entries, intensity_sum, intensity_count)
+        SELECT user_id, date(timestamp), COALESCE(detected_emotion, ''),
+               COUNT(*), COALESCE(SUM(intensity), 0), COUNT(intensity)
+        FROM moods
+        GROUP BY 1, 2, 3
+        ''',
+        '''
+        INSERT INTO mood_daily_context_rollup (user_id, day, context, entries, intensity_sum, intensity_count)
+        SELECT user_id, date(timestamp), context,
+               COUNT(*), COALESCE(SUM(intensity), 0), COUNT(intensity)
+        FROM moods
+        WHERE context IS NOT NULL AND context <> ''
+        GROUP BY 1, 2, 3
+        '''
+    ]),
+    (6, 'local days, user time zones and streaks', [
+        'ALTER TABLE moods ADD COLUMN local_day TEXT',
+        # Existing rows have no known time zone; keep the day the rollups already use
+        'UPDATE moods SET local_day = date(timestamp)',
+        'ALTER TABLE users ADD COLUMN timezone TEXT',
+        '''
+        CREATE TABLE IF NOT EXISTS user_streaks (
+            user_id INTEGER PRIMARY KEY,
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            last_entry_day TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        # Backfill: consecutive days share julianday(day) - row_number
+        '''
+        INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_entry_day)
+        WITH days AS (
+            SELECT DISTINCT user_id, day FROM mood_daily_rollup
+        ), runs AS (
+            SELECT user_id, COUNT(*) AS length, MAX(day) AS last_day
+            FROM (SELECT user_id, day, julianday(day) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS run
+                  FROM days)
+            GROUP BY user_id, run
+        )
+        SELECT user_id,
+               (SELECT length FROM runs latest WHERE latest.user_id = runs.user_id ORDER BY last_day DESC LIMIT 1),
+               MAX(length), MAX(last_day)
+        FROM runs
+        GROUP BY user_id
+        '''
+    ]),
+    (7, 'integer epoch timestamps', [
+        'ALTER TABLE moods ADD COLUMN ts_epoch INTEGER',
+        # save_mood used to store datetime.now() (server local time, with
+        # microseconds); everything else wrote CURRENT_TIMESTAMP (UTC)
+        '''
+        UPDATE moods SET ts_epoch = CASE
+            WHEN timestamp LIKE '%.%' THEN CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            ELSE CAST(strftime('%s', timestamp) AS INTEGER)
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_moods_user_epoch ON moods (user_id, ts_epoch)',
+        # Range scans and pagination use ts_epoch now
+        'DROP INDEX IF EXISTS idx_moods_user_timestamp'
+    ]),
+    (8, 'journal entries and full-text search', [
+        '''
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood_id INTEGER,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ts_epoch INTEGER NOT NULL,
+            local_day TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (mood_id) REFERENCES moods (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_journal_user_epoch ON journal_entries (user_id, ts_epoch)',
+        # Searchable text (journal entries and mood notes), one row per source;
+        # see models/journal.py for the id scheme
+        '''
+        CREATE TABLE IF NOT EXISTS journal_search_docs (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            ts_epoch INTEGER,
+            body TEXT NOT NULL
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_search_docs_source ON journal_search_docs (kind, source_id)',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS journal_search USING fts5(
+            body, kind UNINDEXED, source_id UNINDEXED, ts_epoch UNINDEXED,
+            content = 'journal_search_docs', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS journal_search_docs_insert AFTER INSERT ON journal_search_docs BEGIN
+            INSERT INTO journal_search (rowid, body, kind, source_id, ts_epoch)
+            VALUES (new.id, new.body, new.kind, new.source_id, new.ts_epoch);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS journal_search_docs_delete AFTER DELETE ON journal_search_docs BEGIN
+            INSERT INTO journal_search (journal_search, rowid, body, kind, source_id, ts_epoch)
+            VALUES ('delete', old.id, old.body, old.kind, old.source_id, old.ts_epoch);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS journal_entries_search_insert AFTER INSERT ON journal_entries BEGIN
+            INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+            SELECT COALESCE((SELECT id FROM journal_search_docs
+                             WHERE id BETWEEN new.user_id << 32 AND (new.user_id << 32) + 4294967295
+                             ORDER BY id DESC LIMIT 1), new.user_id << 32) + 1,
+                   new.user_id, 'journal', new.id, new.ts_epoch, new.content
+            WHERE new.user_id IS NOT NULL;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS journal_entries_search_update AFTER UPDATE OF content, user_id, ts_epoch ON journal_entries BEGIN
+            DELETE FROM journal_search_docs WHERE kind = 'journal' AND source_id = old.id;
+            INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+            SELECT COALESCE((SELECT id FROM journal_search_docs
+                             WHERE id BETWEEN new.user_id << 32 AND (new.user_id << 32) + 4294967295
+                             ORDER BY id DESC LIMIT 1), new.user_id << 32) + 1,
+                   new.user_id, 'journal', new.id, new.ts_epoch, new.content
+            WHERE new.user_id IS NOT NULL;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS journal_entries_search_delete AFTER DELETE ON journal_entries BEGIN
+            DELETE FROM journal_search_docs WHERE kind = 'journal' AND source_id = old.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS moods_search_insert AFTER INSERT ON moods BEGIN
+            INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+            SELECT COALESCE((SELECT id FROM journal_search_docs
+                             WHERE id BETWEEN new.user_id << 32 AND (new.user_id << 32) + 4294967295
+                             ORDER BY id DESC LIMIT 1), new.user_id << 32) + 1,
+                   new.user_id, 'mood', new.id, new.ts_epoch, new.notes
+            WHERE new.user_id IS NOT NULL AND new.notes IS NOT NULL AND new.notes <> '';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS moods_search_update AFTER UPDATE OF notes, user_id, ts_epoch ON moods BEGIN
+            DELETE FROM journal_search_docs WHERE kind = 'mood' AND source_id = old.id;
+            INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+            SELECT COALESCE((SELECT id FROM journal_search_docs
+                             WHERE id BETWEEN new.user_id << 32 AND (new.user_id << 32) + 4294967295
+                             ORDER BY id DESC LIMIT 1), new.user_id << 32) + 1,
+                   new.user_id, 'mood', new.id, new.ts_epoch, new.notes
+            WHERE new.user_id IS NOT NULL AND new.notes IS NOT NULL AND new.notes <> '';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS moods_search_delete AFTER DELETE ON moods BEGIN
+            DELETE FROM journal_search_docs WHERE kind = 'mood' AND source_id = old.id;
+        END
+        ''',
+        # Backfill existing notes, oldest first
+        '''
+        INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+        SELECT (user_id << 32) + ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY ts_epoch, id),
+               user_id, 'mood', id, ts_epoch, notes
+        FROM moods
+        WHERE user_id IS NOT NULL AND notes IS NOT NULL AND notes <> ''
+        '''
+    ]),
+    (9, 'mood retention archive', [
+        # Days before archived_before have no raw moods left, only their rollups
+        '''
+        CREATE TABLE IF NOT EXISTS mood_archive (
+            user_id INTEGER PRIMARY KEY,
+            archived_before TEXT NOT NULL,
+            moods INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        # Ratings of archived moods' suggestions, for suggestion effectiveness
+        '''
+        CREATE TABLE IF NOT EXISTS archived_suggestion_ratings (
+            user_id INTEGER NOT NULL,
+            suggestion_type VARCHAR(50) NOT NULL,
+            rating_sum INTEGER NOT NULL DEFAULT 0,
+            ratings INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, suggestion_type)
+        ) WITHOUT ROWID
+        ''',
+        # Archiving unlinks journal entries from the moods it deletes
+        'CREATE INDEX IF NOT EXISTS idx_journal_mood ON journal_entries (mood_id) WHERE mood_id IS NOT NULL'
+    ]),
+    (10, 'deferred note indexing for imports', [
+        # A bulk import lists its user here for the length of one transaction and
+        # indexes the batch's notes with one statement (journal.index_moods); WHEN
+        # skips the trigger program entirely for moods without notes
+        '''
+        CREATE TABLE IF NOT EXISTS journal_search_deferred (
+            user_id INTEGER PRIMARY KEY
+        )
+        ''',
+        'DROP TRIGGER IF EXISTS moods_search_insert',
+        '''
+        CREATE TRIGGER moods_search_insert AFTER INSERT ON moods
+        WHEN new.user_id IS NOT NULL AND new.notes IS NOT NULL AND new.notes <> ''
+             AND NOT EXISTS (SELECT 1 FROM journal_search_deferred WHERE user_id = new.user_id) BEGIN
+            INSERT INTO journal_search_docs (id, user_id, kind, source_id, ts_epoch, body)
+            SELECT COALESCE((SELECT id FROM journal_search_docs
+                             WHERE id BETWEEN new.user_id << 32 AND (new.user_id << 32) + 4294967295
+                             ORDER BY id DESC LIMIT 1), new.user_id << 32) + 1,
+                   new.user_id, 'mood', new.id, new.ts_epoch, new.notes;
+        END
+        '''
+    ]),
+    (11, 'mood emotion probabilities', [
+        # The model's probability per Config.EMOTION_LABELS label, float16 (models/emotion_vectors.py)
+        'ALTER TABLE moods ADD COLUMN emotion_probs BLOB'
+    ]),
+    (12, 'mood predictions per model version', [
+        # Re-scored stored images (models/rescoring.py); moods keep their labels until applied
+        '''
+        CREATE TABLE IF NOT EXISTS mood_predictions (
+            mood_id INTEGER NOT NULL,
+            model_version TEXT NOT NULL,
+            status TEXT NOT NULL,
+            detected_emotion TEXT,
+            confidence_score REAL,
+            emotion_probs BLOB,
+            scored_at INTEGER NOT NULL,
+            PRIMARY KEY (model_version, mood_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_mood_predictions_mood ON mood_predictions (mood_id)'
+    ]),
+    (13, 'next-mood forecast counts', [
+        # Per-user transition counts by part of the day (models/forecast.py); filled
+        # from a user's moods on first use or by rebuild-rollups
+        '''
+        CREATE TABLE IF NOT EXISTS mood_forecast (
+            user_id INTEGER PRIMARY KEY,
+            last_mood_id INTEGER NOT NULL,
+            last_emotion INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            counts BLOB NOT NULL
+        )
+        '''
+    ]),
+]
+
+
+def schema_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=None):
+    """Apply every pending migration; returns the resulting schema version."""
+    migrations = MIGRATIONS if migrations is None else migrations
+    if conn.in_transaction:
+        conn.commit()
+
+    version = schema_version(conn)
+    for number, name, steps in migrations:
+        if number <= version:
+            continue
+        # IMMEDIATE takes the write lock up front so concurrent starters
+        # serialize here; re-check in case another process got there first.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (number,)).fetchone():
+                conn.commit()
+                version = number
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (number, name))
+            conn.execute(f'PRAGMA user_version = {int(number)}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        version = number
+    return version
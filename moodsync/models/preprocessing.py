@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+
+def preprocess_faces(gray, boxes, equalize=None, padding=None, size=None, out=None):
+    """Turn N face boxes of one grayscale image into a model input batch.
+
+    Returns a float32 array of shape (N, size, size, 1) scaled to [0, 1].
+    Every face is cropped (with padding, clipped to the image), optionally
+    histogram-equalized and resized into one preallocated uint8 buffer,
+    which is then scaled into the float32 batch in a single operation.
+    Pass ``out`` to reuse a batch buffer across calls.
+    """
+    size = size or Config.FACE_SIZE
+    n = len(boxes)
+    if out is None or out.shape[0] < n or out.shape[1:] != (size, size, 1):
+        out = np.empty((n, size, size, 1), dtype=np.float32)
+    batch = out[:n]
+    pixels = crop_faces(gray, boxes, equalize, padding, size)
+    np.divide(pixels, np.float32(255.0), out=batch[..., 0])
+    return batch
+
+
+def crop_faces(gray, boxes, equalize=None, padding=None, size=None):
+    """The uint8 (N, size, size) face crops that preprocess_faces scales into a batch."""
+    equalize = Config.FACE_EQUALIZE_HIST if equalize is None else equalize
+    padding = Config.FACE_PADDING if padding is None else padding
+    size = size or Config.FACE_SIZE
+
+    n = len(boxes)
+    pixels = np.empty((n, size, size), dtype=np.uint8)
+    height, width = gray.shape[:2]
+    for i, (x, y, w, h) in enumerate(boxes):
+        face = gray[max(0, y - padding):min(height, y + h + padding),
+                    max(0, x - padding):min(width, x + w + padding)]
+        if face.size == 0:
+            pixels[i] = 0
+            continue
+        if equalize:
+            face = cv2.equalizeHist(face)
+        cv2.resize(face, (size, size), dst=pixels[i])
+    return pixels
@@ -0,0 +1,233 @@
+"""Mood summary reports as PDFs, rendered in the background and cached on disk.
+
+``ReportService.submit`` returns a job id at once and a small thread pool
+reads the report's figures, then hands them to a pool of worker processes
+(spawned, like the rescoring workers) that renders the PDF (reportlab):
+request threads never wait on rendering, and rendering, which is pure
+Python, does not compete for the app's GIL.
+The job id is the cache key -- user, timeframe, the user's latest mood id
+and local day (the windows trail today) -- and names the file in the
+report directory. An unchanged report is served from disk without
+rendering, identical requests share one job, and every app process sees
+a report once it is on disk. A failed job is remembered (the newest
+``_FAILED_KEEP``) until its status is read once; submitting it again
+renders it again.
+"""
+import glob
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from xml.sax.saxutils import escape
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+# Optional: reportlab (requirements.txt); without it reports are unavailable
+try:
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    _reportlab_ready = True
+except Exception:
+    _reportlab_ready = False
+
+TIMEFRAMES = {'week': 7, 'month': 30, 'year': 365}
+
+_FAILED_KEEP = 256
+
+_JOB_ID = re.compile(r'^u(\d+)-(week|month|year)-(\d+)-(\d{8})$')
+
+
+def _report_key(path):
+    # (latest mood id, day) of a report file, to tell which of a timeframe's reports is newest
+    _, _, latest, day = _JOB_ID.match(os.path.basename(path)[:-len('.pdf')]).groups()
+    return int(latest), day
+
+
+def timeframe(job_id):
+    """Timeframe of a job id, or None if it is not a job id."""
+    match = _JOB_ID.match(job_id)
+    return match and match.group(2)
+
+
+def available():
+    return _reportlab_ready
+
+
+class ReportService:
+    def __init__(self, db, report_dir=None, workers=None):
+        self.db = db
+        self.report_dir = report_dir or Config.REPORT_DIR
+        os.makedirs(self.report_dir, exist_ok=True)
+        workers = workers or Config.REPORT_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        self._renderers = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> Future, until it finishes
+        self._failed = OrderedDict()  # job id -> error, until its status is read
+
+    def job_id(self, user_id, timeframe):
+        latest = self.db.get_latest_mood_id(user_id) or 0
+        return f'u{int(user_id)}-{timeframe}-{latest}-{self.db.user_today(user_id):%Y%m%d}'
+
+    def path(self, user_id, job_id):
+        """PDF path of one of the user's jobs, or None if the id is not theirs or not a job id."""
+        match = _JOB_ID.match(job_id)
+        if match is None or int(match.group(1)) != int(user_id):
+            return None
+        return os.path.join(self.report_dir, job_id + '.pdf')
+
+    def submit(self, user_id, timeframe):
+        """Queue the user's report for ``timeframe`` unless it is cached or queued; returns the job id."""
+        job_id = self.job_id(user_id, timeframe)
+        path = self.path(user_id, job_id)
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if os.path.exists(path) or (future is not None and not future.done()):
+                return job_id
+            self._failed.pop(job_id, None)
+            future = self._executor.submit(self._render, user_id, timeframe, path)
+            self._jobs[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def status(self, user_id, job_id):
+        """{'status': 'queued' | 'running' | 'done' | 'failed'[, 'error']}, or None for an unknown job.
+
+        A failure is reported once, then forgotten.
+        """
+        path = self.path(user_id, job_id)
+        if path is None:
+            return None
+        if os.path.exists(path):
+            return {'status': 'done'}
+        with self._lock:
+            future = self._jobs.get(job_id)
+            error = self._failed.pop(job_id, None)
+        if error is not None:
+            return {'status': 'failed', 'error': error}
+        if future is None:
+            return None
+        if future.running():
+            return {'status': 'running'}
+        if not future.done():
+            return {'status': 'queued'}
+        # Failed, and _finished has not moved it to _failed yet
+        return {'status': 'failed', 'error': str(future.exception())}
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            if self._jobs.get(job_id) is future:
+                del self._jobs[job_id]
+                if future.exception() is not None:
+                    self._failed[job_id] = str(future.exception())
+                    while len(self._failed) > _FAILED_KEEP:
+                        self._failed.popitem(last=False)
+
+    def _render(self, user_id, timeframe, path):
+        days = TIMEFRAMES[timeframe]
+        stats = self.db.get_mood_stats(user_id=user_id, days=days)
+        contexts = self.db.get_context_avg_intensity(user_id=user_id, days=days)
+        profile = self.db.get_user_profile(user_id)
+        self._renderers.submit(_render_file, path, profile, timeframe, stats, contexts).result()
+        # Older reports for this timeframe are superseded
+        key = _report_key(path)
+        for other in glob.glob(glob.escape(path.rsplit('-', 2)[0]) + '-*.pdf'):
+            if _report_key(other) < key:
+                os.remove(other)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._renderers.shutdown(wait=True)
+
+
+def _render_file(path, profile, timeframe, stats, contexts):
+    # In a worker process: render next to the target and rename, so a half-written file is never served
+    partial = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        render_pdf(partial, profile, timeframe, stats, contexts)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _bar_chart(emotion_counts):
+    drawing = Drawing(16 * cm, 6 * cm)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 1.2 * cm, 1 * cm
+    chart.width, chart.height = 14 * cm, 4.5 * cm
+    chart.data = [[row['count'] for row in emotion_counts]]
+    chart.categoryAxis.categoryNames = [row['detected_emotion'] or 'Unknown' for row in emotion_counts]
+    chart.valueAxis.valueMin = 0
+    chart.bars[0].fillColor = colors.HexColor('#6f42c1')
+    drawing.add(chart)
+    return drawing
+
+
+def _line_chart(daily_averages):
+    drawing = Drawing(16 * cm, 6 * cm)
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 1.2 * cm, 1 * cm
+    chart.width, chart.height = 14 * cm, 4.5 * cm
+    days = list(daily_averages)
+    chart.data = [[daily_averages[day] for day in days]]
+    # Label about eight days whatever the window
+    step = max(1, len(days) // 8)
+    chart.categoryAxis.categoryNames = [day[5:] if i % step == 0 else '' for i, day in enumerate(days)]
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = 10
+    chart.lines[0].strokeColor = colors.HexColor('#0d6efd')
+    drawing.add(chart)
+    return drawing
+
+
+def render_pdf(path, profile, timeframe, stats, contexts):
+    """Write a one-page mood summary for ``timeframe`` to ``path``."""
+    if not _reportlab_ready:
+        raise RuntimeError('reportlab is not installed')
+    styles = getSampleStyleSheet()
+    name = ' '.join(filter(None, [profile.get('first_name'), profile.get('last_name')])) or profile['username']
+    story = [
+        Paragraph(f'MoodSync {timeframe}ly report', styles['Title']),
+        Paragraph(f'{escape(name)} - last {TIMEFRAMES[timeframe]} days', styles['Normal']),
+        Spacer(1, 0.5 * cm),
+    ]
+
+    summary = [
+        ['Entries', stats['total_entries']],
+        ['Dominant emotion', stats['dominant_emotion'] or '-'],
+        ['Average intensity', f"{stats['average_intensity']:.1f}"],
+        ['Current streak', f"{stats['streak']} days"],
+        ['Longest streak', f"{stats['longest_streak']} days"],
+    ]
+    table = Table(summary, colWidths=[5 * cm, 6 * cm])
+    table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+                               ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke)]))
+    story += [table, Spacer(1, 0.5 * cm)]
+
+    if stats['emotion_counts']:
+        story += [Paragraph('Emotions', styles['Heading2']), _bar_chart(stats['emotion_counts'])]
+    if len(stats['daily_averages']) > 1:
+        story += [Paragraph('Average intensity per day', styles['Heading2']), _line_chart(stats['daily_averages'])]
+    if contexts:
+        story.append(Paragraph('Average intensity by context', styles['Heading2']))
+        table = Table([['Context', 'Average intensity']] +
+                      [[row['context'] or 'Unspecified', f"{row['avg_intensity']:.1f}"] for row in contexts],
+                      colWidths=[6 * cm, 5 * cm])
+        table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+                                   ('BACKGROUND', (0, 0), (-1, 0), colors.whitesmoke)]))
+        story.append(table)
+    if not stats['total_entries']:
+        story.append(Paragraph('No moods were logged in this period.', styles['Normal']))
+
+    SimpleDocTemplate(path, pagesize=A4, title=f'MoodSync {timeframe}ly report').build(story)
@@ -0,0 +1,316 @@
+"""Re-scoring stored mood images with a new model (``manage.py rescore-moods``).
+
+``RescoreJob.run`` walks the moods that have an ``image_path``, in id
+order per database file, and runs the stored image through face
+detection and the model again, exactly as EmotionDetector.analyze_image
+does (first detected face, shared preprocessing, full model). Images are
+read, detected and scored in a pool of worker processes, ``chunk_size``
+images per worker task and one batched model call per task; each worker
+loads the model once, runs at a lower priority (``nice``) and uses one
+inference thread, so the app keeps the rest of the machine.
+
+Moods with a crop in the face crop cache (models/face_cache.py, when it
+was written with the current preprocessing settings) skip reading the
+image and detection: the parent gathers their crops from the cache files
+and the worker scales them straight into the batch.
+
+Every result goes into ``mood_predictions`` under the model version
+(``model_version``: a hash of the architecture and weight files), with a
+status of ``ok``, ``no_face``, ``unreadable`` or ``missing`` (no file).
+Results are written in id order in one short transaction per task, so
+the highest scored id is a high-water mark: an interrupted run picks up
+after it. ``max_rate`` caps the images a second handed to the workers.
+
+The moods themselves keep their labels until ``apply`` copies the
+``ok`` predictions of a version into them and rebuilds the rollups of
+the users concerned; ``label_changes`` compares the two before that.
+"""
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from models import emotion_vectors
+from models.export import resolve_upload
+from models.face_cache import FaceCache
+from models.importer import emotion_label
+from models.preprocessing import preprocess_faces
+
+STATUSES = ('ok', 'no_face', 'unreadable', 'missing')
+
+_PENDING = '''
+    SELECT id, user_id, image_path FROM moods
+    WHERE id > ? AND image_path IS NOT NULL AND image_path <> ''
+    ORDER BY id LIMIT ?
+'''
+
+_SAVE = '''
+    INSERT OR REPLACE INTO mood_predictions
+        (mood_id, model_version, status, detected_emotion, confidence_score, emotion_probs, scored_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_CHANGES = '''
+    SELECT m.detected_emotion, p.detected_emotion, COUNT(*)
+    FROM mood_predictions p JOIN moods m ON m.id = p.mood_id
+    WHERE p.model_version = ? AND p.status = 'ok'
+    GROUP BY m.detected_emotion, p.detected_emotion
+'''
+
+_APPLY = '''
+    UPDATE moods SET detected_emotion = p.detected_emotion, confidence_score = p.confidence_score,
+                     emotion_probs = p.emotion_probs
+    FROM mood_predictions p
+    WHERE p.model_version = ? AND p.status = 'ok' AND p.mood_id = moods.id AND moods.id BETWEEN ? AND ?
+    RETURNING moods.user_id
+'''
+
+
+def model_version(json_path=None, h5_path=None, weights_path=None):
+    """Short hash of the architecture file and the weight file load_model would use."""
+    json_path = json_path or Config.MODEL_JSON_PATH
+    h5_path = h5_path or Config.MODEL_H5_PATH
+    weights_path = weights_path or Config.MODEL_WEIGHTS_PATH
+    digest = hashlib.sha256()
+    for path in (json_path, weights_path if os.path.exists(weights_path) else h5_path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+# Per worker process: the model and face detector, loaded once by _init_worker
+_worker = {}
+
+
+def _init_worker(json_path, h5_path, weights_path, nice):
+    try:
+        if nice:
+            os.nice(nice)
+        cv2.setNumThreads(1)
+        import tensorflow as tf
+        from models.weight_store import load_model
+
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        _worker['model'] = load_model(json_path, h5_path, weights_path)
+        _worker['faces'] = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    except Exception as e:
+        # Raised again from _score_chunk, where the parent sees it
+        _worker['error'] = e
+
+
+def _score_chunk(items, cached_ids=(), crops=None):
+    """[(mood_id, status, label, confidence, probability blob)] for [(mood_id, path)], plus timings.
+
+    ``crops`` are the uint8 cached face crops of the moods ``cached_ids``.
+    """
+    if 'error' in _worker:
+        raise RuntimeError(f"Could not load the model: {_worker['error']}")
+    started = time.perf_counter()
+    size = Config.FACE_SIZE
+    batch = np.empty((len(items) + len(cached_ids), size, size, 1), dtype=np.float32)
+    scored, results = list(cached_ids), []
+    if scored:
+        np.divide(crops, np.float32(255.0), out=batch[:len(scored), ..., 0])
+    for mood_id, path in items:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            results.append((mood_id, 'unreadable', None, None, None))
+            continue
+        # Same parameters as EmotionDetector.detect_faces
+        faces = _worker['faces'].detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30),
+                                                  flags=cv2.CASCADE_SCALE_IMAGE)
+        if len(faces) == 0:
+            results.append((mood_id, 'no_face', None, None, None))
+            continue
+        preprocess_faces(gray, faces[:1], out=batch[len(scored):len(scored) + 1])
+        scored.append(mood_id)
+    detected = time.perf_counter()
+    if scored:
+        probabilities = _worker['model'](batch[:len(scored)], training=False).numpy()
+        top = probabilities.argmax(axis=1)
+        for mood_id, index, vector in zip(scored, top.tolist(), probabilities):
+            results.append((mood_id, 'ok', emotion_vectors.LABELS[index], float(vector[index]),
+                            emotion_vectors.encode(vector)))
+    results.sort(key=lambda result: result[0])
+    return results, detected - started, time.perf_counter() - detected
+
+
+class RescoreJob:
+    def __init__(self, db, version=None, upload_folder=None, workers=None, chunk_size=None, max_rate=None,
+                 nice=None, face_cache=None):
+        self.db = db
+        self.version = version or model_version()
+        self.upload_folder = upload_folder or Config.UPLOAD_FOLDER
+        self.workers = workers or Config.RESCORE_WORKERS
+        self.chunk_size = chunk_size or Config.RESCORE_CHUNK_SIZE
+        self.max_rate = Config.RESCORE_MAX_RATE if max_rate is None else max_rate
+        self.nice = Config.RESCORE_NICE if nice is None else nice
+        # False: always read and detect from the images
+        self.face_cache = FaceCache() if face_cache is None else face_cache
+        self.last_report = None
+        self._stop = threading.Event()
+        self._handed = 0
+        self._cached = {}
+
+    def _executor(self):
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+            initargs=(Config.MODEL_JSON_PATH, Config.MODEL_H5_PATH, Config.MODEL_WEIGHTS_PATH, self.nice))
+
+    def run(self, limit=None):
+        """Score every image not yet scored by this version (at most ``limit``); returns the report."""
+        started = time.perf_counter()
+        report = {'model_version': self.version, 'images': 0, 'statuses': dict.fromkeys(STATUSES, 0),
+                  'from_face_cache': 0, 'detect_s': 0.0, 'inference_s': 0.0, 'interrupted': False}
+        self._handed = 0
+        self._cached = self.face_cache.index() if self.face_cache else {}
+        executor = self._executor()
+        try:
+            for pool in self.db.mood_pools():
+                if not self._run_pool(pool, executor, report, started, limit):
+                    break
+        except KeyboardInterrupt:
+            report['interrupted'] = True
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        elapsed = time.perf_counter() - started
+        report['interrupted'] = report['interrupted'] or self._stop.is_set()
+        report['duration_s'] = round(elapsed, 2)
+        report['images_per_s'] = round(report['images'] / elapsed, 1) if elapsed else 0.0
+        report['detect_s'] = round(report['detect_s'], 2)
+        report['inference_s'] = round(report['inference_s'], 2)
+        report['label_changes'] = self.label_changes()
+        self.last_report = report
+        return report
+
+    def _run_pool(self, pool, executor, report, started, limit):
+        # Score one database file's images; False once stopped or at the limit
+        with pool.connection() as conn:
+            last_id = conn.execute('SELECT MAX(mood_id) FROM mood_predictions WHERE model_version = ?',
+                                   (self.version,)).fetchone()[0] or 0
+        in_flight = deque()
+        submitted = 0
+        done = False
+        while True:
+            while not done and len(in_flight) < self.workers * 2:
+                if self._stop.is_set() or (limit is not None and report['images'] + submitted >= limit):
+                    done = True
+                    break
+                size = self.chunk_size if limit is None else min(self.chunk_size, limit - report['images'] - submitted)
+                with pool.connection() as conn:
+                    rows = conn.execute(_PENDING, (last_id, size)).fetchall()
+                if not rows:
+                    done = True
+                    break
+                last_id = rows[-1][0]
+                found, missing, cached_ids, locations = [], [], [], []
+                for mood_id, user_id, image_path in rows:
+                    location = self._cached.get((user_id, mood_id))
+                    if location is not None:
+                        cached_ids.append(mood_id)
+                        locations.append(location)
+                        continue
+                    path = resolve_upload(image_path, self.upload_folder)
+                    if path is None:
+                        missing.append((mood_id, 'missing', None, None, None))
+                    else:
+                        found.append((mood_id, path))
+                future = None
+                if found or cached_ids:
+                    self._handed += len(found) + len(cached_ids)
+                    self._throttle(started)
+                    crops = self.face_cache.crops(locations) if locations else None
+                    future = executor.submit(_score_chunk, found, cached_ids, crops)
+                report['from_face_cache'] += len(cached_ids)
+                in_flight.append((future, missing))
+                submitted += len(rows)
+            if not in_flight:
+                return not self._stop.is_set() and (limit is None or report['images'] < limit)
+            future, missing = in_flight.popleft()
+            results, detect_s, inference_s = future.result() if future is not None else ([], 0.0, 0.0)
+            results = sorted(results + missing, key=lambda result: result[0])
+            self._save(pool, results)
+            submitted -= len(results)
+            report['images'] += len(results)
+            report['detect_s'] += detect_s
+            report['inference_s'] += inference_s
+            for result in results:
+                report['statuses'][result[1]] += 1
+
+    def _throttle(self, started):
+        # Hold back until the images handed to the workers so far are within max_rate
+        if self.max_rate > 0:
+            wait = self._handed / self.max_rate - (time.perf_counter() - started)
+            if wait > 0:
+                self._stop.wait(wait)
+
+    def _save(self, pool, results):
+        now = int(time.time())
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(_SAVE, [(mood_id, self.version, status, label, confidence, probs, now)
+                                     for mood_id, status, label, confidence, probs in results])
+
+    def label_changes(self):
+        """How this version's labels compare to the ones the moods have now.
+
+        ``compared``: moods with an ``ok`` prediction; ``changed``: how many
+        of them it would relabel, and their fraction; ``transitions``: the
+        count per (old label, new label), most frequent first.
+        """
+        transitions = Counter()
+        compared = 0
+        for pool in self.db.mood_pools():
+            with pool.connection() as conn:
+                for old, new, count in conn.execute(_CHANGES, (self.version,)):
+                    compared += count
+                    old = emotion_label(old) or old
+                    if old != new:
+                        transitions[(old, new)] += count
+        changed = sum(transitions.values())
+        return {
+            'compared': compared,
+            'changed': changed,
+            'changed_fraction': round(changed / compared, 4) if compared else 0.0,
+            'transitions': [{'from': old, 'to': new, 'moods': count}
+                            for (old, new), count in transitions.most_common()],
+        }
+
+    def apply(self, batch_size=None):
+        """Copy this version's ``ok`` predictions into the moods; returns the moods updated.
+
+        Works through each database file in id ranges, one short
+        transaction each, then rebuilds the rollups and streaks of every
+        user whose moods changed.
+        """
+        batch_size = batch_size or Config.MAINTENANCE_BATCH_SIZE
+        updated = 0
+        users = set()
+        for pool in self.db.mood_pools():
+            with pool.connection() as conn:
+                low, high = conn.execute('SELECT MIN(mood_id), MAX(mood_id) FROM mood_predictions '
+                                         'WHERE model_version = ?', (self.version,)).fetchone()
+            if low is None:
+                continue
+            for start in range(low, high + 1, batch_size):
+                with pool.connection() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    rows = conn.execute(_APPLY, (self.version, start, start + batch_size - 1)).fetchall()
+                updated += len(rows)
+                users.update(row[0] for row in rows)
+        for user_id in users:
+            self.db.rebuild_rollups(user_id)
+        return updated
+
+    def close(self):
+        """Stop a run from another thread after the tasks in flight."""
+        self._stop.set()
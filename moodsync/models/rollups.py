@@ -0,0 +1,84 @@
+"""Per-user daily rollups of the moods table.
+
+``mood_daily_rollup`` holds, per (user_id, day, emotion), the entry count
+and the intensity sum/count; ``mood_daily_context_rollup`` holds the same
+per (user_id, day, context). ``day`` is the mood's local day (rows
+written without one count on their UTC date). Rows with no detected
+emotion are kept under emotion ''. Rollups are updated in the same transaction as the
+mood insert, so analytics read a few hundred small rows per user
+instead of scanning raw moods.
+"""
+
+# Key and measures of one mood row, shared by the incremental update,
+# the rebuild and the consistency check.
+_EMOTION_SELECT = '''
+    SELECT user_id, COALESCE(local_day, date(timestamp)) AS day, COALESCE(detected_emotion, '') AS emotion,
+           COUNT(*) AS entries, COALESCE(SUM(intensity), 0) AS intensity_sum, COUNT(intensity) AS intensity_count
+    FROM moods
+    WHERE {where}
+    GROUP BY user_id, day, emotion
+'''
+
+_CONTEXT_SELECT = '''
+    SELECT user_id, COALESCE(local_day, date(timestamp)) AS day, context,
+           COUNT(*) AS entries, COALESCE(SUM(intensity), 0) AS intensity_sum, COUNT(intensity) AS intensity_count
+    FROM moods
+    WHERE {where} AND context IS NOT NULL AND context <> ''
+    GROUP BY user_id, day, context
+'''
+
+_UPSERT = '''
+    INSERT INTO {table} (user_id, day, {key}, entries, intensity_sum, intensity_count)
+    {select}
+    ON CONFLICT (user_id, day, {key}) DO UPDATE SET
+        entries = entries + excluded.entries,
+        intensity_sum = intensity_sum + excluded.intensity_sum,
+        intensity_count = intensity_count + excluded.intensity_count
+'''
+
+ROLLUP_TABLES = [
+    ('mood_daily_rollup', 'emotion', _EMOTION_SELECT),
+    ('mood_daily_context_rollup', 'context', _CONTEXT_SELECT),
+]
+
+
+def apply_moods(conn, where, params=()):
+    """Add the moods matching ``where`` to the rollups (call inside the insert's transaction)."""
+    for table, key, select in ROLLUP_TABLES:
+        conn.execute(_UPSERT.format(table=table, key=key, select=select.format(where=where)), params)
+
+
+def apply_mood(conn, mood_id):
+    apply_moods(conn, 'id = ?', (mood_id,))
+
+
+# Days before a user's mood_archive.archived_before have no raw moods
+# left, only rollups; rebuild and check leave those days alone
+_LIVE_MOODS = '''COALESCE(local_day, date(timestamp)) >= COALESCE(
+    (SELECT archived_before FROM mood_archive a WHERE a.user_id = moods.user_id), '')'''
+
+_LIVE_DAYS = "day >= COALESCE((SELECT archived_before FROM mood_archive a WHERE a.user_id = {table}.user_id), '')"
+
+
+def rebuild(conn, user_id=None):
+    """Recompute rollups from raw moods for one user, or for everyone (archived days are kept)."""
+    where, params = ('user_id = ?', (user_id,)) if user_id is not None else ('1', ())
+    for table, _, _ in ROLLUP_TABLES:
+        conn.execute(f'DELETE FROM {table} WHERE {where} AND {_LIVE_DAYS.format(table=table)}', params)
+    apply_moods(conn, f'{where} AND {_LIVE_MOODS}', params)
+
+
+def check(conn, user_id=None):
+    """Compare rollups with raw moods; returns a list of mismatch descriptions."""
+    where, params = ('user_id = ?', (user_id,)) if user_id is not None else ('1', ())
+    mismatches = []
+    for table, key, select in ROLLUP_TABLES:
+        expected = {tuple(row[:3]): tuple(row[3:]) for row in conn.execute(
+            select.format(where=f'{where} AND {_LIVE_MOODS}'), params)}
+        stored = {tuple(row[:3]): tuple(row[3:]) for row in conn.execute(
+            f'SELECT user_id, day, {key}, entries, intensity_sum, intensity_count FROM {table} '
+            f'WHERE {where} AND {_LIVE_DAYS.format(table=table)}', params)}
+        for k in sorted(set(expected) | set(stored), key=repr):
+            if expected.get(k) != stored.get(k):
+                mismatches.append(f'{table} {k}: raw={expected.get(k)} rollup={stored.get(k)}')
+    return mismatches
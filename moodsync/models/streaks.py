@@ -0,0 +1,88 @@
+"""Per-user logging streaks, kept in ``user_streaks``.
+
+A streak is a run of consecutive local days with at least one mood. The
+row holds the length of the run ending on ``last_entry_day`` and the
+longest run ever. ``record_day`` keeps it current in O(1) when a mood is
+logged on the last entry day or later; a mood backdated onto a day that
+had no entries can join or split runs, so that case recomputes the
+user's row from the days in ``mood_daily_rollup``.
+"""
+from datetime import date, timedelta
+
+# Gaps and islands over the distinct rollup days: consecutive days share
+# julianday(day) - row_number, so each group is one run.
+_STREAKS_SELECT = '''
+    WITH days AS (
+        SELECT DISTINCT user_id, day FROM mood_daily_rollup WHERE {where}
+    ), runs AS (
+        SELECT user_id, COUNT(*) AS length, MAX(day) AS last_day
+        FROM (SELECT user_id, day, julianday(day) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS run
+              FROM days)
+        GROUP BY user_id, run
+    )
+    SELECT user_id,
+           (SELECT length FROM runs latest WHERE latest.user_id = runs.user_id ORDER BY last_day DESC LIMIT 1),
+           MAX(length), MAX(last_day)
+    FROM runs
+    GROUP BY user_id
+'''
+
+_UPSERT = '''
+    INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_entry_day)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        current_streak = excluded.current_streak,
+        longest_streak = excluded.longest_streak,
+        last_entry_day = excluded.last_entry_day
+'''
+
+
+def record_day(conn, user_id, day):
+    """Count a new mood on local ``day`` ('YYYY-MM-DD').
+
+    Call in the insert's transaction, after the rollups have been updated.
+    """
+    row = conn.execute('SELECT current_streak, longest_streak, last_entry_day FROM user_streaks WHERE user_id = ?',
+                       (user_id,)).fetchone()
+    if row is None or day > row['last_entry_day']:
+        follows = row is not None and date.fromisoformat(day) - date.fromisoformat(row['last_entry_day']) == timedelta(days=1)
+        current = row['current_streak'] + 1 if follows else 1
+        longest = max(current, row['longest_streak'] if row else 0)
+        conn.execute(_UPSERT, (user_id, current, longest, day))
+    elif day < row['last_entry_day']:
+        # Backdated: only the first entry on a day can change the runs
+        entries = conn.execute('SELECT SUM(entries) FROM mood_daily_rollup WHERE user_id = ? AND day = ?',
+                               (user_id, day)).fetchone()[0]
+        if entries == 1:
+            rebuild(conn, user_id)
+
+
+def read(conn, user_id, today):
+    """{'current', 'longest', 'last_entry_day'}; the current streak counts only if it reaches ``today``."""
+    row = conn.execute('SELECT current_streak, longest_streak, last_entry_day FROM user_streaks WHERE user_id = ?',
+                       (user_id,)).fetchone()
+    if row is None:
+        return {'current': 0, 'longest': 0, 'last_entry_day': None}
+    return {
+        'current': row['current_streak'] if row['last_entry_day'] == today.isoformat() else 0,
+        'longest': row['longest_streak'],
+        'last_entry_day': row['last_entry_day'],
+    }
+
+
+def rebuild(conn, user_id=None):
+    """Recompute streaks from the daily rollups for one user, or for everyone."""
+    where, params = ('user_id = ?', (user_id,)) if user_id is not None else ('1', ())
+    conn.execute(f'DELETE FROM user_streaks WHERE {where}', params)
+    conn.execute('INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_entry_day) '
+                 + _STREAKS_SELECT.format(where=where), params)
+
+
+def check(conn, user_id=None):
+    """Compare stored streaks with the rollups; returns a list of mismatch descriptions."""
+    where, params = ('user_id = ?', (user_id,)) if user_id is not None else ('1', ())
+    expected = {row[0]: tuple(row[1:]) for row in conn.execute(_STREAKS_SELECT.format(where=where), params)}
+    stored = {row[0]: tuple(row[1:]) for row in conn.execute(
+        f'SELECT user_id, current_streak, longest_streak, last_entry_day FROM user_streaks WHERE {where}', params)}
+    return [f'user_streaks {uid}: rollups={expected.get(uid)} stored={stored.get(uid)}'
+            for uid in sorted(set(expected) | set(stored)) if expected.get(uid) != stored.get(uid)]
@@ -0,0 +1,366 @@
+"""Columnar time-series analytics of a user's moods.
+
+``MoodSeries`` holds one user's moods, oldest first, as NumPy columns:
+id, ts_epoch, local day number (days since 1970-01-01 of ``local_day``),
+local hour, weekday (Monday = 0), emotion (index into
+``Config.EMOTION_LABELS``, -1 for none or unknown; labels are normalized
+like imports, so 'happy' and 'Happy' are one emotion) and intensity
+(NaN when not given).
+
+``TimeSeriesEngine`` loads a user's series with one query the first time
+it is asked for, then only reads moods with a higher id than the last one
+it has and appends them in place; a series is reloaded in full after
+``Config.TIMESERIES_RELOAD_S`` (edits made by other processes) or after
+``invalidate`` (moods changed or deleted: archive, re-scoring, time zone
+change). Up to ``Config.TIMESERIES_MAX_USERS`` series are kept, least
+recently used dropped first. Loads and appends run under a per-user lock
+(striped), and the engine lock is held only to look up or store a series,
+so one user's cold load never holds up another user's read.
+
+``TimeSeriesEngine.series`` returns a snapshot: the column arrays cut to
+the moods the series had then. Appends write only past the end of every
+published snapshot, or into new arrays, and publish the new (arrays,
+size) pair in one assignment, so an analysis reads one consistent
+snapshot without holding the lock while more moods arrive.
+
+The analyses are whole-array operations (bincount, cumsum, diff) over
+such column arrays and return JSON-ready dicts: ``rolling_intensity``,
+``heatmap``, ``transitions`` and ``weekly``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from models.importer import emotion_label
+
+LABELS = Config.EMOTION_LABELS
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+_LABEL_INDEX = {label: index for index, label in enumerate(LABELS)}
+
+_COLUMNS = (('id', np.int64), ('ts', np.int64), ('day', np.int32), ('hour', np.int8), ('weekday', np.int8),
+            ('emotion', np.int8), ('intensity', np.float32))
+
+_LOAD = '''
+    SELECT id, ts_epoch, COALESCE(local_day, date(timestamp)), detected_emotion, intensity
+    FROM moods
+    WHERE user_id = ? AND id > ?
+    ORDER BY ts_epoch, id
+'''
+
+# New moods since a load: a rowid range scan ("+" keeps the planner off the
+# user index, which would visit all of the user's moods to find a few)
+_LOAD_NEW = _LOAD.replace('user_id = ?', '+user_id = ?')
+
+
+def emotion_index(value):
+    """Index into LABELS of a stored emotion name; -1 if none or unknown."""
+    return _LABEL_INDEX.get(emotion_label(value), -1)
+
+
+def day_number(day):
+    return (day - date(1970, 1, 1)).days
+
+
+def _utc_offsets(ts, zone):
+    # Seconds east of UTC at each instant: one lookup per UTC day, per row only on DST change days
+    if zone is timezone.utc or getattr(zone, 'key', None) == 'UTC' or not len(ts):
+        return np.zeros(len(ts), dtype=np.int64)
+
+    def offset(t):
+        return int(datetime.fromtimestamp(int(t), zone).utcoffset().total_seconds())
+
+    days, inverse = np.unique(ts // 86400, return_inverse=True)
+    starts = np.array([offset(d * 86400) for d in days.tolist()], dtype=np.int64)
+    ends = np.array([offset(d * 86400 + 86399) for d in days.tolist()], dtype=np.int64)
+    offsets = starts[inverse]
+    for row in np.flatnonzero((starts != ends)[inverse]).tolist():
+        offsets[row] = offset(ts[row])
+    return offsets
+
+
+def load(conn, user_id, zone, after_id=0):
+    """Column arrays of the user's moods with ids above ``after_id``, oldest first."""
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples, cheaper than sqlite3.Row for a whole history
+    rows = cursor.execute(_LOAD_NEW if after_id else _LOAD, (user_id, after_id)).fetchall()
+    return columns(rows, zone)
+
+
+def columns(rows, zone):
+    """Column arrays of _LOAD rows (id, ts_epoch, local day, emotion, intensity)."""
+    count = len(rows)
+    if not count:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in _COLUMNS}
+    ids, ts, days, emotions, intensities = zip(*rows)
+    ts = np.array(ts, dtype=np.int64)
+    day = np.array(days, dtype='datetime64[D]').astype(np.int32)
+    codes = {}
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'ts': ts,
+        'day': day,
+        'hour': ((ts + _utc_offsets(ts, zone)) % 86400 // 3600).astype(np.int8),
+        # 1970-01-01 was a Thursday
+        'weekday': ((day + 3) % 7).astype(np.int8),
+        'emotion': np.array([codes[e] if e in codes else codes.setdefault(e, emotion_index(e)) for e in emotions],
+                            dtype=np.int8),
+        'intensity': np.array([np.nan if i is None else i for i in intensities], dtype=np.float32),
+    }
+
+
+class MoodSeries:
+    """One user's moods as growable column arrays, oldest first.
+
+    ``append`` is not thread-safe (the engine calls it under the user's
+    lock); ``view`` may be called from any thread.
+    """
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.last_id = 0
+        self.loaded_at = time.monotonic()
+        # (arrays, size), replaced as a whole by append
+        self._published = ({name: np.zeros(0, dtype=dtype) for name, dtype in _COLUMNS}, 0)
+
+    def __len__(self):
+        return self._published[1]
+
+    def view(self):
+        """Column arrays of the moods appended so far; later appends do not change them."""
+        data, size = self._published
+        return {name: column[:size] for name, column in data.items()}
+
+    def append(self, new):
+        """Add column arrays of moods with ids above last_id."""
+        count = len(new['id'])
+        if not count:
+            return
+        data, size = self._published
+        end = size + count
+        capacity = len(data['id'])
+        in_order = not size or new['ts'][0] >= data['ts'][size - 1]
+        if end > capacity or not in_order:
+            # New arrays: views handed out keep the old ones as they were
+            grown = {}
+            capacity = capacity if end <= capacity else max(end, 2 * capacity, 64)
+            for name, dtype in _COLUMNS:
+                column = np.empty(capacity, dtype=dtype)
+                column[:size] = data[name][:size]
+                grown[name] = column
+            data = grown
+        # Past the end of every published view
+        for name, _ in _COLUMNS:
+            data[name][size:end] = new[name]
+        if not in_order:
+            # An import of older moods: restore time order
+            order = np.argsort(data['ts'][:end], kind='stable')
+            for name, _ in _COLUMNS:
+                data[name][:end] = data[name][:end][order]
+        self._published = (data, end)
+        self.last_id = max(self.last_id, int(new['id'].max()))
+
+
+class TimeSeriesEngine:
+    def __init__(self, db, max_users=None, reload_s=None):
+        self.db = db
+        self.max_users = max_users or Config.TIMESERIES_MAX_USERS
+        self.reload_s = Config.TIMESERIES_RELOAD_S if reload_s is None else reload_s
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(64)]
+        # Bumped by invalidate/clear: a load that started before is not stored
+        self._generation = 0
+        self.loads = 0
+        self.appends = 0
+
+    def series(self, user_id):
+        """Column arrays of the user's moods (MoodSeries.view), brought up to date first."""
+        with self._user_locks[hash(user_id) % len(self._user_locks)]:
+            with self._lock:
+                series = self._series.get(user_id)
+                generation = self._generation
+            full = series is None or time.monotonic() - series.loaded_at > self.reload_s
+            if full:
+                series = MoodSeries(self.db.user_zone(user_id))
+            with self.db.connection(user_id) as conn:
+                new = load(conn, user_id, series.zone, series.last_id)
+            appended = bool(len(new['id']) and len(series))
+            series.append(new)
+            with self._lock:
+                self.loads += full
+                self.appends += appended
+                if self._generation == generation:
+                    self._series[user_id] = series
+                    self._series.move_to_end(user_id)
+                    while len(self._series) > self.max_users:
+                        self._series.popitem(last=False)
+            return series.view()
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._series.pop(user_id, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._generation += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'users': len(self._series), 'max_users': self.max_users, 'loads': self.loads,
+                    'appends': self.appends, 'rows': sum(len(s) for s in self._series.values())}
+
+    def rolling_intensity(self, user_id, days=90, window=7):
+        return rolling_intensity(self.series(user_id), day_number(self.db.user_today(user_id)), days, window)
+
+    def heatmap(self, user_id, days=None):
+        return heatmap(self.series(user_id), day_number(self.db.user_today(user_id)), days)
+
+    def transitions(self, user_id, days=None, max_gap_hours=None):
+        return transitions(self.series(user_id), day_number(self.db.user_today(user_id)), days, max_gap_hours)
+
+    def weekly(self, user_id, weeks=12):
+        return weekly(self.series(user_id), day_number(self.db.user_today(user_id)), weeks)
+
+
+def _iso(day):
+    return (date(1970, 1, 1) + timedelta(days=int(day))).isoformat()
+
+
+def _rounded(values, digits=2):
+    # JSON list of floats, None for NaN
+    return [None if value != value else round(value, digits) for value in values.tolist()]
+
+
+def _recent(series, today, days):
+    # Boolean mask of the moods on the last ``days`` local days (all if None)
+    if not days:
+        return np.ones(len(series['id']), dtype=bool)
+    return series['day'] > today - days
+
+
+def rolling_intensity(series, today, days=90, window=7):
+    """Mean intensity per day and its trailing ``window``-day mean, for the last ``days`` days.
+
+    The rolling mean weighs every mood equally and skips days without
+    moods; days before the range count towards its first windows.
+    """
+    first = today - days + 1
+    start = first - window + 1
+    intensity = series['intensity']
+    mask = (series['day'] >= start) & (series['day'] <= today) & ~np.isnan(intensity)
+    offsets = series['day'][mask] - start
+    span = today - start + 1
+    sums = np.bincount(offsets, weights=intensity[mask], minlength=span)
+    counts = np.bincount(offsets, minlength=span).astype(np.float64)
+    rolling_sums = np.cumsum(sums)
+    rolling_counts = np.cumsum(counts)
+    rolling_sums[window:] = rolling_sums[window:] - rolling_sums[:-window]
+    rolling_counts[window:] = rolling_counts[window:] - rolling_counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily = sums / counts
+        rolling = rolling_sums / rolling_counts
+    shown = slice(window - 1, None)
+    return {
+        'days': [_iso(day) for day in range(first, today + 1)],
+        'entries': counts[shown].astype(int).tolist(),
+        'daily': _rounded(daily[shown]),
+        'rolling': _rounded(rolling[shown]),
+        'window': window,
+    }
+
+
+def heatmap(series, today, days=None):
+    """Mood count and mean intensity per weekday (rows) and local hour (columns)."""
+    mask = _recent(series, today, days)
+    cells = series['weekday'][mask].astype(np.intp) * 24 + series['hour'][mask]
+    intensity = series['intensity'][mask]
+    rated = ~np.isnan(intensity)
+    counts = np.bincount(cells, minlength=7 * 24)
+    sums = np.bincount(cells[rated], weights=intensity[rated], minlength=7 * 24)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / np.bincount(cells[rated], minlength=7 * 24)
+    return {
+        'weekdays': WEEKDAYS,
+        'hours': list(range(24)),
+        'entries': counts.reshape(7, 24).tolist(),
+        'avg_intensity': [_rounded(row) for row in mean.reshape(7, 24)],
+        'total': int(counts.sum()),
+    }
+
+
+def transitions(series, today, days=None, max_gap_hours=None):
+    """Markov transition counts and probabilities between consecutive moods' emotions.
+
+    A pair counts when both moods have a known emotion and the second
+    came within ``max_gap_hours`` (Config.TIMESERIES_TRANSITION_GAP_HOURS)
+    of the first; ``probabilities[i][j]`` is P(next = LABELS[j] | LABELS[i]).
+    """
+    max_gap = (max_gap_hours or Config.TIMESERIES_TRANSITION_GAP_HOURS) * 3600
+    mask = _recent(series, today, days)
+    emotion = series['emotion'][mask].astype(np.intp)
+    ts = series['ts'][mask]
+    k = len(LABELS)
+    previous, following = emotion[:-1], emotion[1:]
+    valid = (previous >= 0) & (following >= 0) & (np.diff(ts) <= max_gap)
+    counts = np.bincount(previous[valid] * k + following[valid], minlength=k * k).reshape(k, k)
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probabilities = np.where(totals > 0, counts / np.maximum(totals, 1), 0.0)
+    return {
+        'labels': LABELS,
+        'counts': counts.tolist(),
+        'probabilities': [[round(p, 4) for p in row] for row in probabilities.tolist()],
+        'transitions': int(counts.sum()),
+        'max_gap_hours': max_gap / 3600,
+    }
+
+
+def weekly(series, today, weeks=12):
+    """Per local week (Monday first), the last ``weeks`` of them: entries, mean
+    intensity and emotion shares, each with its change from the week before."""
+    k = len(LABELS)
+    # Week numbers count Mondays since 1969-12-29
+    week = (series['day'].astype(np.int64) + 3) // 7
+    current = (today + 3) // 7
+    first = current - weeks
+    # One week more than shown, for the first delta
+    mask = week >= first
+    offsets = week[mask] - first
+    intensity = series['intensity'][mask]
+    emotion = series['emotion'][mask].astype(np.intp)
+    rated = ~np.isnan(intensity)
+    known = emotion >= 0
+    span = weeks + 1
+    entries = np.bincount(offsets, minlength=span)[:span]
+    sums = np.bincount(offsets[rated], weights=intensity[rated], minlength=span)[:span]
+    rated_counts = np.bincount(offsets[rated], minlength=span)[:span]
+    shares = np.bincount(offsets[known] * k + emotion[known], minlength=span * k)[:span * k].reshape(span, k)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / rated_counts
+        shares = shares / shares.sum(axis=1, keepdims=True)
+    shares = np.nan_to_num(shares)
+    entry_delta = np.diff(entries)
+    mean_delta = np.diff(mean)
+    share_delta = np.diff(shares, axis=0)
+    result = []
+    for n in range(1, span):
+        result.append({
+            'week_start': _iso((first + n) * 7 - 3),
+            'entries': int(entries[n]),
+            'avg_intensity': _rounded(mean[n:n + 1])[0],
+            'emotions': dict(zip(LABELS, _rounded(shares[n], 4))),
+            'delta': {
+                'entries': int(entry_delta[n - 1]),
+                'avg_intensity': _rounded(mean_delta[n - 1:n])[0],
+                'emotions': dict(zip(LABELS, _rounded(share_delta[n - 1], 4))),
+            },
+        })
+    return {'weeks': result}
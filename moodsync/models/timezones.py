@@ -0,0 +1,51 @@
+"""Per-user time zone helpers.
+
+Mood timestamps are stored in UTC in the format CURRENT_TIMESTAMP uses
+('YYYY-MM-DD HH:MM:SS'). The day a mood counts towards (rollups, streaks,
+day-aligned windows) is its calendar date in the user's time zone,
+computed when the mood is written and stored in ``moods.local_day``.
+"""
+from datetime import datetime, timezone
+import os
+import sys
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def get_zone(name=None):
+    """ZoneInfo for ``name`` (default Config.DEFAULT_TIMEZONE); UTC if unknown."""
+    try:
+        return ZoneInfo(name or Config.DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def is_valid(name):
+    return name in available_timezones()
+
+
+def to_utc(moment=None):
+    """Aware UTC datetime for ``moment``; naive datetimes are taken as UTC, None is now."""
+    if moment is None:
+        return datetime.now(timezone.utc)
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def format_utc(moment):
+    return to_utc(moment).strftime(TIMESTAMP_FORMAT)
+
+
+def local_day(moment, zone):
+    """'YYYY-MM-DD' of ``moment`` in ``zone``."""
+    return to_utc(moment).astimezone(zone).date().isoformat()
+
+
+def today(zone):
+    return datetime.now(zone).date()
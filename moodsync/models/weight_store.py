@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Every tensor starts on a 64-byte boundary so the mapped views are
+# aligned for vectorized kernels.
+ALIGNMENT = 64
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(weights_path):
+    return os.path.splitext(weights_path)[0] + '.json'
+
+
+def _custom_objects():
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+
+    return {
+        'Sequential': Sequential,
+        'Conv2D': tf.keras.layers.Conv2D,
+        'MaxPooling2D': tf.keras.layers.MaxPooling2D,
+        'Dropout': tf.keras.layers.Dropout,
+        'Flatten': tf.keras.layers.Flatten,
+        'Dense': tf.keras.layers.Dense
+    }
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_weights(model, weights_path, manifest_path=None):
+    """Write the model weights to a flat aligned file plus a JSON manifest."""
+    manifest_path = manifest_path or manifest_path_for(weights_path)
+    names = [w.name for w in model.weights]
+    arrays = model.get_weights()
+
+    tensors = []
+    offset = 0
+    digest = hashlib.sha256()
+    tmp_path = weights_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for name, array in zip(names, arrays):
+            array = np.ascontiguousarray(array)
+            padding = (-offset) % ALIGNMENT
+            if padding:
+                f.write(b'\0' * padding)
+                digest.update(b'\0' * padding)
+                offset += padding
+            data = array.tobytes()
+            f.write(data)
+            digest.update(data)
+            tensors.append({
+                'name': name,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset,
+                'nbytes': len(data)
+            })
+            offset += len(data)
+    os.replace(tmp_path, weights_path)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'alignment': ALIGNMENT,
+        'size': offset,
+        'sha256': digest.hexdigest(),
+        'tensors': tensors
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_weights(weights_path, manifest_path=None, verify=True):
+    """Map the weight file read-only and return one array view per tensor.
+
+    The views share the mapped pages, so nothing is copied until the
+    values are assigned to the model variables.
+    """
+    manifest_path = manifest_path or manifest_path_for(weights_path)
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported weight manifest version: {manifest.get('version')}")
+
+    size = os.path.getsize(weights_path)
+    if size != manifest['size']:
+        raise ValueError(f"Weight file size mismatch: expected {manifest['size']} bytes, found {size}")
+
+    if verify and _file_sha256(weights_path) != manifest['sha256']:
+        raise ValueError(f"Weight file checksum mismatch: {weights_path}")
+
+    if size == 0:
+        return []
+
+    mapped = np.memmap(weights_path, dtype=np.uint8, mode='r')
+    return [
+        np.ndarray(tuple(t['shape']), dtype=np.dtype(t['dtype']), buffer=mapped, offset=t['offset'])
+        for t in manifest['tensors']
+    ]
+
+
+def load_model(json_path, h5_path=None, weights_path=None, verify=True):
+    """Build the model from its JSON architecture and load its weights.
+
+    The flat weight file is used when present; otherwise the H5 file is
+    loaded as before.
+    """
+    from tensorflow.keras.models import model_from_json
+
+    with open(json_path, 'r') as json_file:
+        model_json = json_file.read()
+    model = model_from_json(model_json, custom_objects=_custom_objects())
+
+    if weights_path and os.path.exists(weights_path):
+        arrays = load_weights(weights_path, verify=verify)
+        expected = [tuple(w.shape) for w in model.weights]
+        found = [a.shape for a in arrays]
+        if expected != found:
+            raise ValueError(f"Weight file does not match model architecture: {weights_path}")
+        model.set_weights(arrays)
+    elif h5_path and os.path.exists(h5_path):
+        model.load_weights(h5_path)
+    else:
+        raise FileNotFoundError(f"No weight file found for model: {json_path}")
+
+    return model
@@ -0,0 +1,143 @@
+"""Group-commit write-behind queue for mood logging.
+
+Request threads ``submit`` a mood and its suggestions and get a Future;
+one writer thread drains the queue and writes up to ``max_batch`` entries
+(whatever is queued, plus anything arriving within ``max_delay_ms``) in a
+single transaction (one per shard in sharded storage). Entries pile up while a
+batch commits, so bursts of detections share one commit and never
+contend for the write lock. Each entry runs under its own savepoint, so a bad
+entry fails only its own future. Futures resolve after the commit.
+``close`` (also registered with atexit) drains everything queued first.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    def __init__(self, db, max_batch=64, max_delay_ms=0, max_queue=10000):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        # Bounded: when the writer falls behind, submit blocks (back-pressure)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()  # submit/close; may be held while put() blocks
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.entries = 0
+        self.failures = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.commit_ms_total = 0.0
+        self._thread = threading.Thread(target=self._run, name='mood-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, suggestions, **mood):
+        """Queue a log_mood_with_suggestions call; the Future resolves to its (mood_id, saved)."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('write queue is closed')
+            self._queue.put((future, suggestions, mood))
+        return future
+
+    def close(self, timeout=None):
+        """Write everything queued, then stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        groups = {}
+        for entry in batch:
+            groups.setdefault(self.db.pool_for(entry[2].get('user_id', 1)), []).append(entry)
+        failures = sum(self._write_group(pool, entries) for pool, entries in groups.items())
+        self._record(len(batch), failures, start)
+
+    def _write_group(self, pool, batch):
+        """Write entries sharing a database in one transaction; returns the number that failed."""
+        results = []
+        try:
+            with pool.connection() as conn:
+                # Take the write lock up front rather than upgrading mid-batch
+                conn.execute('BEGIN IMMEDIATE')
+                for future, suggestions, mood in batch:
+                    conn.execute('SAVEPOINT entry')
+                    try:
+                        results.append((future, self.db.log_mood_with_suggestions(suggestions, **mood), None))
+                        conn.execute('RELEASE entry')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO entry')
+                        conn.execute('RELEASE entry')
+                        results.append((future, None, e))
+        except Exception as e:
+            # Commit failed: nothing in the batch was written
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return len(batch)
+
+        # Re-invalidate after the commit so no reader cached the pre-commit state
+        for user_id in {mood.get('user_id', 1) for _, _, mood in batch}:
+            self.db.cache.invalidate(user_id)
+        failures = 0
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                failures += 1
+                future.set_exception(error)
+        return failures
+
+    def _record(self, size, failures, start):
+        with self._stats_lock:
+            self.batches += 1
+            self.entries += size
+            self.failures += failures
+            self.last_batch_size = size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.commit_ms_total += (time.perf_counter() - start) * 1000
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'entries': self.entries,
+                'failures': self.failures,
+                'avg_batch_size': self.entries / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_seen,
+                'last_batch_size': self.last_batch_size,
+                'avg_batch_ms': self.commit_ms_total / self.batches if self.batches else 0.0,
+            }
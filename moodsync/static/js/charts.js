@@ -9,6 +9,10 @@ document.addEventListener('DOMContentLoaded', function() {
         initEmotionDistributionChart();
         initMoodIntensityChart();
         initSuggestionEffectivenessChart();
+        initRollingIntensityChart();
+        initWeeklyDeltaChart();
+        renderMoodHeatmap();
+        renderTransitionMatrix();
         initStatsCounters();
     } catch (error) {
         console.error('Error initializing charts:', error);
@@ -20,6 +24,8 @@ function initStatsCounters() {
     const statElements = document.querySelectorAll('.stat-number');
     
     statElements.forEach(element => {
+        // Only whole numbers count up; leave values like "4.5" or "12%" as they are
+        if (!/^\d+$/.test(element.textContent.trim())) return;
         const target = parseInt(element.textContent);
         const duration = 2000; // Animation duration in ms
         const steps = 60; // Number of steps
@@ -429,6 +435,207 @@ function initSuggestionEffectivenessChart() {
     console.log('Suggestion effectiveness chart initialized with animation');
 }
 
+// Fetch JSON from a container's data-endpoint (the /api/analytics/* routes)
+function fetchChartData(container) {
+    return fetch(container.dataset.endpoint, { credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        });
+}
+
+// Daily mean intensity with its rolling mean (/api/analytics/rolling)
+function initRollingIntensityChart() {
+    const chartContainer = document.getElementById('rolling-intensity-chart');
+    if (!chartContainer) return;
+    
+    fetchChartData(chartContainer).then(data => {
+        const chart = new Chart(chartContainer.getContext('2d'), {
+            type: 'line',
+            data: {
+                labels: data.days,
+                datasets: [{
+                    label: 'Daily average',
+                    data: data.daily,
+                    borderColor: 'rgba(108, 99, 255, 0.4)',
+                    backgroundColor: 'rgba(108, 99, 255, 0.4)',
+                    showLine: false,
+                    pointRadius: 3
+                }, {
+                    label: `${data.window}-day average`,
+                    data: data.rolling,
+                    borderColor: 'rgba(108, 99, 255, 1)',
+                    backgroundColor: 'rgba(108, 99, 255, 0.1)',
+                    borderWidth: 3,
+                    pointRadius: 0,
+                    spanGaps: true,
+                    tension: 0.3,
+                    fill: true
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        max: 10,
+                        title: {
+                            display: true,
+                            text: 'Intensity'
+                        }
+                    }
+                },
+                plugins: {
+                    tooltip: {
+                        callbacks: {
+                            afterBody: function(context) {
+                                return `Entries: ${data.entries[context[0].dataIndex]}`;
+                            }
+                        }
+                    }
+                },
+                interaction: {
+                    intersect: false,
+                    mode: 'index'
+                }
+            }
+        });
+        window.rollingIntensityChart = chart;
+    }).catch(error => showChartError(chartContainer.parentElement, `Failed to load rolling averages (${error.message})`));
+}
+
+// Entries and mean intensity per week with week-over-week changes (/api/analytics/weekly)
+function initWeeklyDeltaChart() {
+    const chartContainer = document.getElementById('weekly-delta-chart');
+    if (!chartContainer) return;
+    
+    fetchChartData(chartContainer).then(data => {
+        const weeks = data.weeks || [];
+        const signed = value => (value > 0 ? `+${value}` : `${value}`);
+        const chart = new Chart(chartContainer.getContext('2d'), {
+            type: 'bar',
+            data: {
+                labels: weeks.map(week => week.week_start),
+                datasets: [{
+                    label: 'Entries',
+                    data: weeks.map(week => week.entries),
+                    backgroundColor: 'rgba(108, 99, 255, 0.5)',
+                    borderRadius: 6,
+                    yAxisID: 'entries'
+                }, {
+                    type: 'line',
+                    label: 'Average intensity',
+                    data: weeks.map(week => week.avg_intensity),
+                    borderColor: 'rgba(231, 74, 59, 1)',
+                    backgroundColor: 'rgba(231, 74, 59, 1)',
+                    spanGaps: true,
+                    tension: 0.3,
+                    yAxisID: 'intensity'
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                scales: {
+                    entries: {
+                        position: 'left',
+                        beginAtZero: true,
+                        title: {
+                            display: true,
+                            text: 'Entries'
+                        }
+                    },
+                    intensity: {
+                        position: 'right',
+                        beginAtZero: true,
+                        max: 10,
+                        grid: {
+                            display: false
+                        },
+                        title: {
+                            display: true,
+                            text: 'Intensity'
+                        }
+                    }
+                },
+                plugins: {
+                    tooltip: {
+                        callbacks: {
+                            afterBody: function(context) {
+                                const delta = weeks[context[0].dataIndex].delta;
+                                const lines = [`vs previous week: ${signed(delta.entries)} entries`];
+                                if (delta.avg_intensity !== null) {
+                                    lines.push(`intensity ${signed(delta.avg_intensity)}`);
+                                }
+                                return lines;
+                            }
+                        }
+                    }
+                }
+            }
+        });
+        window.weeklyDeltaChart = chart;
+    }).catch(error => showChartError(chartContainer.parentElement, `Failed to load weekly changes (${error.message})`));
+}
+
+// Weekday x hour grid of entry counts (/api/analytics/heatmap)
+function renderMoodHeatmap() {
+    const container = document.getElementById('mood-heatmap');
+    if (!container) return;
+    
+    fetchChartData(container).then(data => {
+        const busiest = Math.max(1, ...data.entries.flat());
+        let html = '<table class="table table-sm table-borderless mb-0 mood-heatmap"><thead><tr><th></th>';
+        data.hours.forEach(hour => {
+            html += `<th class="text-center small">${hour % 3 === 0 ? hour : ''}</th>`;
+        });
+        html += '</tr></thead><tbody>';
+        data.weekdays.forEach((weekday, row) => {
+            html += `<tr><th class="small">${weekday}</th>`;
+            data.hours.forEach(hour => {
+                const entries = data.entries[row][hour];
+                const intensity = data.avg_intensity[row][hour];
+                const title = `${weekday} ${hour}:00 - ${entries} entries` +
+                    (intensity !== null ? `, intensity ${intensity}` : '');
+                html += `<td title="${title}" style="background: rgba(108, 99, 255, ${(entries / busiest).toFixed(2)}); ` +
+                    'min-width: 14px; height: 18px;"></td>';
+            });
+            html += '</tr>';
+        });
+        container.innerHTML = html + '</tbody></table>';
+    }).catch(error => showChartError(container, `Failed to load the heatmap (${error.message})`));
+}
+
+// Emotion -> next emotion probabilities (/api/analytics/transitions)
+function renderTransitionMatrix() {
+    const container = document.getElementById('transition-matrix');
+    if (!container) return;
+    
+    fetchChartData(container).then(data => {
+        if (!data.transitions) {
+            container.innerHTML = '<p class="text-muted mb-0">Not enough consecutive entries yet.</p>';
+            return;
+        }
+        let html = '<table class="table table-sm text-center mb-0"><thead><tr><th class="text-start">From / to</th>';
+        data.labels.forEach(label => {
+            html += `<th class="small">${label}</th>`;
+        });
+        html += '</tr></thead><tbody>';
+        data.labels.forEach((from, row) => {
+            html += `<tr><th class="text-start small">${from}</th>`;
+            data.labels.forEach((to, column) => {
+                const probability = data.probabilities[row][column];
+                html += `<td title="${data.counts[row][column]} times" ` +
+                    `style="background: ${getEmotionColor(to, probability.toFixed(2))}">` +
+                    `${probability ? Math.round(probability * 100) + '%' : ''}</td>`;
+            });
+            html += '</tr>';
+        });
+        container.innerHTML = html + '</tbody></table>';
+    }).catch(error => showChartError(container, `Failed to load transitions (${error.message})`));
+}
+
 // Enhanced helper function to get color for each emotion
 function getEmotionColor(emotion, alpha = 1) {
     const colors = {
@@ -466,5 +673,9 @@ window.MoodSyncCharts = {
     initEmotionDistributionChart,
     initMoodIntensityChart,
     initSuggestionEffectivenessChart,
+    initRollingIntensityChart,
+    initWeeklyDeltaChart,
+    renderMoodHeatmap,
+    renderTransitionMatrix,
     getEmotionColor
 };
\ No newline at end of file
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# Modules import each other as ``models.x`` and ``config`` from the app directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DatabaseManager
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'db(users=1, timezone=None, sharded=False): options of the db fixture')
+
+
+@pytest.fixture
+def db(tmp_path, request):
+    """DatabaseManager on a fresh database in tmp_path.
+
+    ``@pytest.mark.db(...)`` on a test or module: ``users`` adds users 2..n
+    next to user 1, ``timezone`` sets user 1's zone, ``sharded`` stores
+    moods in two shards.
+    """
+    marker = request.node.get_closest_marker('db')
+    options = marker.kwargs if marker else {}
+    if options.get('sharded'):
+        db = DatabaseManager(str(tmp_path / 'moodsync.db'), 'sharded', str(tmp_path / 'shards'), 2)
+    else:
+        db = DatabaseManager(str(tmp_path / 'moodsync.db'), 'single')
+    with db.connection() as conn:
+        for user_id in range(2, options.get('users', 1) + 1):
+            conn.execute('INSERT OR IGNORE INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                         (user_id, f'user{user_id}', f'user{user_id}@example.com', 'x'))
+    if options.get('timezone'):
+        db.set_user_timezone(1, options['timezone'])
+    yield db
+    for pool in db.all_pools():
+        pool.close_all()
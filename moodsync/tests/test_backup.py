@@ -0,0 +1,24 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from models import backup
+from models.backup import BackupService
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 5, 8, 0, 0, 123456)
+
+
+def test_runs_in_the_same_instant_get_their_own_backup(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, 'datetime', FrozenDatetime)
+    service = BackupService(db, str(tmp_path / 'backups'), keep=5, pause_ms=0, include_uploads=False)
+    # A run of another process holds the first name
+    (tmp_path / 'backups' / '20260105-080000-123456.partial').mkdir(parents=True)
+    first = service.run()
+    second = service.run()
+    assert (first['name'], second['name']) == ('20260105-080000-123456-1', '20260105-080000-123456-2')
+    assert [os.path.basename(path) for path in service.backups()] == [first['name'], second['name']]
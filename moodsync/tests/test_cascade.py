@@ -0,0 +1,17 @@
+import cv2
+import numpy as np
+
+from models.cascade import load_dataset
+
+
+def test_load_dataset_skips_unreadable_files(tmp_path):
+    for label, value in (('happy', 100), ('sad', 200)):
+        (tmp_path / label).mkdir()
+        cv2.imwrite(str(tmp_path / label / 'face.png'), np.full((60, 60), value, dtype=np.uint8))
+    (tmp_path / 'happy' / 'broken.png').write_bytes(b'not an image')
+
+    x, y, skipped = load_dataset(str(tmp_path))
+    assert skipped == 1
+    assert x.shape == (2, 48, 48, 1)
+    assert y.tolist() == [3, 5]
+    assert np.allclose(x[:, 0, 0, 0], [100 / 255, 200 / 255])
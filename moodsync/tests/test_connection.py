@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from models.connection import ConnectionPool, PoolTimeout
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, pragmas={}, timeout=0.1)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert holding.wait(5)
+    try:
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        holder.join()
+    with pool.connection() as conn:
+        assert conn.execute('SELECT 1').fetchone()[0] == 1
+    pool.close_all()
+
+
+def test_nested_blocks_share_one_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, pragmas={}, timeout=0.1)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+    pool.close_all()
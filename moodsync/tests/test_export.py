@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from models import database, export
+
+MOMENT = datetime(2026, 2, 1, 9, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def history(db, tmp_path, monkeypatch):
+    # Seven moods, several in the same second, over pages of two
+    monkeypatch.setattr(database, '_EXPORT_PAGE', 2)
+    uploads = tmp_path / 'static' / 'uploads'
+    uploads.mkdir(parents=True)
+    (uploads / 'face.jpg').write_bytes(b'jpeg')
+    ids = []
+    for n in range(7):
+        ids.append(db.log_mood(user_id=1, emotion=['Happy', 'Sad'][n % 2], intensity=n + 1, notes=f'note {n}',
+                               timestamp=MOMENT.replace(minute=n // 3),
+                               image_path='uploads/face.jpg' if n == 4 else None))
+        if n % 2:
+            db.save_suggestions(ids[-1], [{'type': 'wellness', 'content': f'breathe {n}'},
+                                          {'type': 'social', 'content': f'call {n}'}], 1)
+    for n in range(3):
+        db.save_journal_entry(1, f'entry {n}')
+    return ids, str(uploads)
+
+
+def test_records_are_complete_and_in_order(db, history):
+    ids, _ = history
+    records = list(db.iter_user_export(1))
+    assert records[0][0] == 'profile'
+    moods = [record for kind, record in records if kind == 'mood']
+    assert [mood['id'] for mood in moods] == ids
+    assert [len(mood['suggestions']) for mood in moods] == [0, 2, 0, 2, 0, 2, 0]
+    assert moods[3]['suggestions'][0]['content'] == 'breathe 3'
+    assert [record['content'] for kind, record in records if kind == 'journal'] == ['entry 0', 'entry 1', 'entry 2']
+
+
+def test_no_connection_is_held_between_records(db, history):
+    records = db.iter_user_export(1)
+    next(records)
+    next(records)
+    assert getattr(db.pool._local, 'conn', None) is None
+    assert db.pool._idle.qsize() == len(db.pool._all)
+    records.close()
+
+
+def test_ndjson_and_csv(db, history):
+    lines = [json.loads(line) for line in export.ndjson_lines(db.iter_user_export(1))]
+    assert [line['type'] for line in lines] == ['profile'] + ['mood'] * 7 + ['journal'] * 3
+    rows = list(csv.DictReader(io.StringIO(''.join(export.csv_lines(db.iter_user_export(1))))))
+    # A row per suggestion, one for a mood without
+    assert len(rows) == 4 + 3 * 2
+    assert rows[1]['suggestion'] == 'breathe 1' and rows[2]['suggestion'] == 'call 1'
+
+
+def test_zip_has_the_export_and_images(db, history):
+    _, uploads = history
+    data = b''.join(export.zip_chunks(db.iter_user_export(1), db.iter_user_images(1), uploads))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ['export.ndjson', 'images/face.jpg']
+        assert archive.read('images/face.jpg') == b'jpeg'
+        assert len(archive.read('export.ndjson').splitlines()) == 11
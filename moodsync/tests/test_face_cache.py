@@ -0,0 +1,24 @@
+import numpy as np
+
+from models.face_cache import FaceCache
+
+
+def crop(value, size=48):
+    return np.full((size, size), value, dtype=np.uint8)
+
+
+def test_append_after_torn_record(tmp_path):
+    cache = FaceCache(str(tmp_path), size=48, padding=10, equalize=True)
+    cache.append(1, 10, (1, 2, 3, 4), crop(10), ts_epoch=0)
+    path = cache.path_for('1970-01-01')
+    # A crash in the middle of the second append
+    with open(path, 'ab') as f:
+        f.write(b'\x07' * (cache.dtype.itemsize // 2))
+    assert len(cache.read(path)) == 1
+
+    cache.append(1, 11, (5, 6, 7, 8), crop(11), ts_epoch=60)
+    records = cache.read(path)
+    assert records['mood_id'].tolist() == [10, 11]
+    assert records['box'][1].tolist() == [5, 6, 7, 8]
+    assert (records['pixels'][1] == 11).all()
+    assert cache.index()[(1, 11)] == (path, 1)
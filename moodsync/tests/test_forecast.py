@@ -0,0 +1,42 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import forecast
+
+pytestmark = pytest.mark.db(timezone='Europe/Berlin')
+
+
+def stored(db):
+    with db.connection(1) as conn:
+        row = conn.execute('SELECT last_mood_id, last_emotion, last_ts, counts FROM mood_forecast WHERE user_id = 1').fetchone()
+    return tuple(row[:3]) + (bytes(row[3]),)
+
+
+def test_incremental_counts_equal_a_recount(db):
+    rng = random.Random(3)
+    start = datetime(2026, 3, 20, tzinfo=timezone.utc)
+    for n in range(300):
+        # Mostly in order, some backdated (also onto existing seconds), some far apart
+        hours = n * 3 + rng.choice([0, 0, 0, -30, -200, 1])
+        moment = start + timedelta(hours=hours, minutes=rng.choice([0, 0, 17]))
+        db.log_mood(user_id=1, emotion=rng.choice(['Happy', 'Sad', 'Angry', 'bogus', None]), timestamp=moment)
+    incremental = stored(db)
+    db.rebuild_rollups(1)
+    assert incremental == stored(db)
+
+
+def test_predict_backs_off_to_the_time_of_day(db):
+    zone = db.user_zone(1)
+    day = datetime(2026, 5, 4, tzinfo=zone)
+    for n in range(6):
+        db.log_mood(user_id=1, emotion='Sad', timestamp=day + timedelta(days=n, hours=8))
+        db.log_mood(user_id=1, emotion='Happy', timestamp=day + timedelta(days=n, hours=20))
+    morning = (day + timedelta(days=30, hours=9)).timestamp()
+    result = db.get_mood_forecast(1, now=morning)
+    assert (result['emotion'], result['level'], result['part'], result['after']) == ('Sad', 'time_of_day', 'morning', None)
+    with db.connection(1) as conn:
+        # Right after the last (evening) mood: what followed Happy, at any time of day
+        result = forecast.predict(conn, 1, zone, (day + timedelta(days=5, hours=21)).timestamp())
+    assert (result['emotion'], result['level'], result['after']) == ('Sad', 'transition_any_time', 'Happy')
@@ -0,0 +1,53 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from models import importer
+
+CSV = '''timestamp,emotion,notes,context
+2026-01-05T08:00:00Z,happy,coffee,home
+2026-01-05T08:00:00Z,sad,bad news,home
+2026-01-05T08:00:00Z,happy,coffee,home
+2026-01-05T09:30:00Z,neutral,,work
+'''
+
+
+def run(db, text, batch_size=None):
+    return importer.import_stream(db, 1, io.StringIO(text), 'csv', batch_size)
+
+
+@pytest.mark.parametrize('batch_size', [None, 1])
+def test_same_second_moods_are_kept(db, batch_size):
+    report = run(db, CSV, batch_size)
+    assert (report['imported'], report['duplicates'], report['repeated'], report['rejected']) == (3, 0, 1, 0)
+    with db.connection(1) as conn:
+        moods = conn.execute('SELECT detected_emotion, notes FROM moods WHERE user_id = 1 ORDER BY id').fetchall()
+    assert sorted(tuple(row) for row in moods) == [('Happy', 'coffee'), ('Neutral', None), ('Sad', 'bad news')]
+
+
+def test_reimport_adds_nothing(db):
+    run(db, CSV)
+    report = run(db, CSV)
+    assert (report['imported'], report['duplicates'], report['repeated']) == (0, 4, 0)
+
+
+def test_logged_mood_at_same_second_is_a_duplicate_only_if_equal(db):
+    db.log_mood(user_id=1, emotion='Happy', notes='coffee', context='home',
+                timestamp=datetime(2026, 1, 5, 8, tzinfo=timezone.utc))
+    report = run(db, CSV)
+    assert (report['imported'], report['duplicates'], report['repeated']) == (2, 2, 0)
+
+
+def test_mood_logged_during_the_import_is_a_duplicate_not_repeated(db):
+    def logged_meanwhile(rows):
+        yield next(rows)
+        yield next(rows)
+        # Read while the second batch is stored, so after the first
+        db.log_mood(user_id=1, emotion='Neutral', context='work',
+                    timestamp=datetime(2026, 1, 5, 9, 30, tzinfo=timezone.utc))
+        yield from rows
+
+    text = CSV.splitlines(keepends=True)
+    rows = importer.rows(io.StringIO(''.join(text[:3] + text[4:])), 'csv', db.user_zone(1), importer.ImportErrors())
+    assert db.import_moods(1, logged_meanwhile(rows), batch_size=1) == (2, 1, 0)
@@ -0,0 +1,74 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import importer, journal
+
+pytestmark = pytest.mark.db(users=2)
+
+MOMENT = datetime(2026, 3, 2, 20, tzinfo=timezone.utc)
+
+
+def test_match_query_quotes_every_word():
+    assert journal.match_query('rain OR "walk* NEAR(x') == '"rain" "OR" "walk"* "NEAR" "x"'
+    assert journal.match_query(' -*- ') is None
+
+
+def test_search_finds_notes_and_entries_of_the_user_only(db):
+    mood_id = db.log_mood(user_id=1, emotion='Sad', notes='Long walk in the rain', timestamp=MOMENT)
+    db.save_journal_entry(1, 'The rain kept <b>falling</b>', mood_id=mood_id, timestamp=MOMENT + timedelta(hours=1))
+    db.save_journal_entry(2, 'Rain again', timestamp=MOMENT)
+    results, more = db.search_journal(1, 'rain')
+    assert not more
+    assert sorted((result['kind'], result['timestamp']) for result in results) == [
+        ('journal', '2026-03-02 21:00:00'), ('mood', '2026-03-02 20:00:00')]
+    journal_hit = next(result for result in results if result['kind'] == 'journal')
+    assert journal_hit['snippet'] == 'The <mark>rain</mark> kept &lt;b&gt;falling&lt;/b&gt;'
+    assert db.search_journal(1, 'fall*')[0][0]['kind'] == 'journal'
+    assert db.search_journal(2, 'walk')[0] == []
+
+
+def test_pages_cover_ranked_and_older_matches_once(db, monkeypatch):
+    for n in range(12):
+        db.save_journal_entry(1, 'tea ' * (n % 3 + 1) + f'day {n}', timestamp=MOMENT + timedelta(minutes=n))
+    with db.connection(1) as conn:
+        pages = [journal.search(conn, 1, 'tea', offset, 5, window=4) for offset in range(0, 15, 5)]
+    found = [result['source_id'] for page in pages for result in page]
+    assert len(found) == len(set(found)) == 12
+    # The newest four are ranked (the two with "tea" three times first), then the rest newest first
+    ranked, older = found[:4], found[4:]
+    assert sorted(ranked) == list(range(9, 13)) and sorted(ranked[:2]) == [9, 12]
+    assert older == sorted(older, reverse=True)
+
+
+def test_imported_notes_are_searchable(db):
+    csv = 'timestamp,emotion,notes\n2026-01-05T08:00:00Z,calm,quiet harbour morning\n'
+    importer.import_stream(db, 1, io.StringIO(csv), 'csv')
+    results, _ = db.search_journal(1, 'harbour')
+    assert [result['kind'] for result in results] == ['mood']
+    with db.connection(1) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM journal_search_deferred').fetchone()[0] == 0
+
+
+def test_journal_pages_keep_same_second_entries(db):
+    ids = [db.save_journal_entry(1, f'entry {n}', timestamp=MOMENT + timedelta(seconds=n // 3)) for n in range(7)]
+    seen, cursor = [], None
+    while True:
+        entries, cursor = db.get_journal_entries(1, before=cursor, limit=2)
+        seen += [entry['id'] for entry in entries]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_mood_pages_keep_same_second_moods(db):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    ids = [db.log_mood(user_id=1, emotion='Happy', timestamp=now - timedelta(seconds=n // 3)) for n in range(7)]
+    seen, cursor = [], None
+    while True:
+        entries, cursor = db.get_mood_page(1, before=cursor, limit=3)
+        seen += [entry['id'] for entry in entries]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, key=lambda mood_id: (ids.index(mood_id) // 3, -mood_id))
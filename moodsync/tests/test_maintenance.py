@@ -0,0 +1,74 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.maintenance import MaintenanceJob
+
+pytestmark = pytest.mark.db(users=2)
+
+
+@pytest.fixture
+def history(db):
+    # User 1: five moods 40-44 days ago, rated suggestions on two, and two recent moods
+    now = datetime.now(timezone.utc)
+    old = []
+    for n in range(5):
+        mood_id = db.log_mood(user_id=1, emotion='Sad', intensity=n + 1, context='work',
+                              image_path=f'uploads/old{n}.jpg', timestamp=now - timedelta(days=40 + n))
+        old.append(mood_id)
+        if n < 2:
+            saved = db.save_suggestions(mood_id, [{'type': 'wellness', 'content': 'Breathe'}], 1)
+            db.rate_suggestion(1, saved[0]['id'], 4 + n)
+    recent = [db.log_mood(user_id=1, emotion='Happy', intensity=7, timestamp=now - timedelta(days=n))
+              for n in range(2)]
+    db.log_mood(user_id=2, emotion='Sad', timestamp=now - timedelta(days=100))
+    entry_id = db.save_journal_entry(1, 'A hard week', mood_id=old[0])
+    return old, recent, entry_id
+
+
+def job(db, tmp_path, **options):
+    return MaintenanceJob(db, upload_folder=str(tmp_path / 'uploads'), pause_ms=0,
+                          **{'retention_days': 30, 'batch_size': 2, **options})
+
+
+def test_archive_keeps_aggregates(db, tmp_path, history):
+    old, recent, entry_id = history
+    stats = db.get_mood_stats(user_id=1, days=365)
+    effectiveness = db.get_suggestion_effectiveness(1)
+    assert effectiveness[0]['count'] == 2
+
+    report = job(db, tmp_path).archive()
+    assert report == {'enabled': True, 'retention_days': 30, 'users': 2, 'moods': 6}
+    with db.connection(1) as conn:
+        assert [row[0] for row in conn.execute('SELECT id FROM moods WHERE user_id = 1 ORDER BY id')] == recent
+        assert conn.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0] == 0
+        assert conn.execute('SELECT mood_id FROM journal_entries WHERE id = ?', (entry_id,)).fetchone()[0] is None
+        assert conn.execute('SELECT moods FROM mood_archive WHERE user_id = 1').fetchone()[0] == 5
+    assert db.get_mood_stats(user_id=1, days=365) == stats
+    assert db.get_suggestion_effectiveness(1) == effectiveness
+    assert db.check_rollups() == []
+
+    # Nothing left past the horizon
+    assert job(db, tmp_path).archive()['moods'] == 0
+
+
+def test_archive_can_be_disabled(db, tmp_path, history):
+    assert job(db, tmp_path, retention_days=0).archive() == {'enabled': False, 'users': 0, 'moods': 0}
+    with db.connection(1) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM moods').fetchone()[0] == 8
+
+
+def test_uploads_are_collected_after_the_grace_period(db, tmp_path, history):
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    for name in ('old0.jpg', 'stray.jpg', 'fresh.jpg', 'notes.txt'):
+        (uploads / name).write_bytes(b'x' * 10)
+    hour_ago = time.time() - 3600
+    for name in ('old0.jpg', 'stray.jpg', 'notes.txt'):
+        os.utime(uploads / name, (hour_ago, hour_ago))
+
+    report = job(db, tmp_path, grace=600).collect_uploads()
+    assert report['files'] == 1 and report['bytes'] == 10
+    assert sorted(os.listdir(uploads)) == ['fresh.jpg', 'notes.txt', 'old0.jpg']
@@ -0,0 +1,27 @@
+import pytest
+
+from manage import INDEXED_QUERIES
+from models.database import DatabaseManager
+from models.migrations import MIGRATIONS
+
+
+
+def test_fresh_database_is_fully_migrated(db):
+    latest = MIGRATIONS[-1][0]
+    assert db.schema_version == latest
+    with db.connection() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == latest
+        applied = [row[0] for row in conn.execute('SELECT version FROM schema_migrations ORDER BY version')]
+    assert applied == [number for number, _, _ in MIGRATIONS]
+
+
+def test_migrate_is_idempotent(db, tmp_path):
+    again = DatabaseManager(str(tmp_path / 'moodsync.db'))
+    assert again.schema_version == db.schema_version
+    again.pool.close_all()
+
+
+@pytest.mark.parametrize('name, index, query, params', INDEXED_QUERIES, ids=[q[0] for q in INDEXED_QUERIES])
+def test_query_uses_index(db, name, index, query, params):
+    plan = db.explain(query, params)
+    assert any(index in detail for detail in plan), plan
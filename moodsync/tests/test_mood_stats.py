@@ -0,0 +1,78 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.db(timezone='Asia/Tokyo')
+
+
+def local(db, day, hour, minute=0, second=0):
+    # Aware datetime at a local time of the user's zone
+    return datetime.combine(day, time(hour, minute, second), tzinfo=db.user_zone(1))
+
+
+def test_window_is_days_local_days_including_today(db):
+    today = db.user_today(1)
+    first = today - timedelta(days=6)
+    db.log_mood(user_id=1, emotion='Happy', intensity=4, context='work', timestamp=local(db, today, 0, 0, 1))
+    db.log_mood(user_id=1, emotion='Sad', intensity=6, context='work', timestamp=local(db, first, 0, 0, 0))
+    # Last second of the day before the window
+    db.log_mood(user_id=1, emotion='Angry', intensity=10, context='home', timestamp=local(db, first, 0) - timedelta(seconds=1))
+
+    week = db.get_mood_stats(user_id=1, days=7)
+    assert week['total_entries'] == 2
+    assert {row['detected_emotion'] for row in week['emotion_counts']} == {'Happy', 'Sad'}
+    assert sorted(week['daily_averages']) == [first.isoformat(), today.isoformat()]
+    assert week['average_intensity'] == 5.0
+    assert db.get_mood_stats(user_id=1, days=8)['total_entries'] == 3
+    assert db.get_mood_stats(user_id=1, days=1)['total_entries'] == 1
+    assert [row['context'] for row in db.get_context_avg_intensity(user_id=1, days=7)] == ['work']
+    assert len(db.get_context_avg_intensity(user_id=1, days=8)) == 2
+
+
+def test_windows_share_one_read(db):
+    today = db.user_today(1)
+    for back in (0, 6, 7, 29, 30):
+        db.log_mood(user_id=1, emotion='Neutral', timestamp=local(db, today - timedelta(days=back), 12))
+    stats = db.get_mood_stats_windows(user_id=1, windows=(7, 30, 365))
+    assert {days: s['total_entries'] for days, s in stats.items()} == {7: 2, 30: 4, 365: 5}
+
+
+def raw_stats(db, days):
+    # The aggregate straight from moods over the same local days
+    cutoff = (db.user_today(1) - timedelta(days=days - 1)).isoformat()
+    with db.connection(1) as conn:
+        rows = conn.execute('SELECT detected_emotion, intensity, local_day FROM moods WHERE user_id = 1 AND local_day >= ?',
+                            (cutoff,)).fetchall()
+    counts, daily = {}, {}
+    for row in rows:
+        counts[row['detected_emotion']] = counts.get(row['detected_emotion'], 0) + 1
+        if row['intensity'] is not None:
+            daily.setdefault(row['local_day'], []).append(row['intensity'])
+    intensities = [value for values in daily.values() for value in values]
+    return {
+        'total_entries': len(rows),
+        'counts': counts,
+        'daily_averages': {day: sum(values) / len(values) for day, values in sorted(daily.items())},
+        'average_intensity': sum(intensities) / len(intensities) if intensities else 0.0,
+    }
+
+
+def test_rollup_stats_match_raw_aggregate(db):
+    today = db.user_today(1)
+    emotions = ['Happy', 'Sad', 'Angry', 'Neutral', None]
+    n = 0
+    for back in range(40):
+        day = today - timedelta(days=back)
+        # Either side of local midnight, and midday
+        for moment in (local(db, day, 0, 0, 0), local(db, day, 12), local(db, day, 23, 59, 59)):
+            db.log_mood(user_id=1, emotion=emotions[n % 5], intensity=None if n % 4 == 0 else n % 10 + 1,
+                        context=['work', 'home'][n % 2], timestamp=moment)
+            n += 1
+    assert db.check_rollups() == []
+    stats = db.get_mood_stats_windows(user_id=1, windows=(1, 7, 30, 365))
+    for days, window in stats.items():
+        expected = raw_stats(db, days)
+        assert window['total_entries'] == expected['total_entries']
+        assert {row['detected_emotion']: row['count'] for row in window['emotion_counts']} == expected['counts']
+        assert window['daily_averages'] == pytest.approx(expected['daily_averages'])
+        assert window['average_intensity'] == pytest.approx(expected['average_intensity'])
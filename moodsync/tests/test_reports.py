@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models import reports
+from models.reports import ReportService
+
+
+@pytest.fixture
+def service(db, tmp_path, monkeypatch):
+    calls = []
+
+    def render_pdf(path, profile, timeframe, stats, contexts):
+        calls.append(timeframe)
+        if len(calls) == 1:
+            raise RuntimeError('disk full')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF')
+
+    monkeypatch.setattr(reports, 'render_pdf', render_pdf)
+    service = ReportService(db, str(tmp_path / 'reports'), workers=1)
+    # A spawned worker would not see the patched render_pdf
+    service._renderers.shutdown()
+    service._renderers = ThreadPoolExecutor(1)
+    yield service
+    service.close()
+
+
+def wait(service, job_id):
+    with service._lock:
+        future = service._jobs.get(job_id)
+    if future is not None:
+        future.exception()
+        # The done callback runs in the worker right after
+        service._executor.submit(lambda: None).result()
+
+
+def test_failed_job_is_reported_once_and_can_be_retried(service):
+    job_id = service.submit(1, 'week')
+    wait(service, job_id)
+    assert service._jobs == {}
+    assert service.status(1, job_id) == {'status': 'failed', 'error': 'disk full'}
+    assert service.status(1, job_id) is None
+    assert service._failed == {}
+
+    assert service.submit(1, 'week') == job_id
+    wait(service, job_id)
+    assert service.status(1, job_id) == {'status': 'done'}
+    assert service._jobs == {}
+
+
+def test_unread_failures_are_bounded(service, monkeypatch):
+    monkeypatch.setattr(reports, '_FAILED_KEEP', 2)
+    for n in range(4):
+        service._finished(f'u1-week-{n}-20260105', _failed_future(service, f'u1-week-{n}-20260105'))
+    assert list(service._failed) == ['u1-week-2-20260105', 'u1-week-3-20260105']
+
+
+def _failed_future(service, job_id):
+    future = service._executor.submit(_raise)
+    future.exception()
+    service._jobs[job_id] = future
+    return future
+
+
+def _raise():
+    raise RuntimeError('boom')
+
+
+@pytest.mark.skipif(not reports.available(), reason='reportlab is not installed')
+def test_renders_in_a_worker_process(db, tmp_path):
+    db.log_mood(user_id=1, emotion='Happy', intensity=6, context='work')
+    service = ReportService(db, str(tmp_path / 'reports'), workers=1)
+    try:
+        job_id = service.submit(1, 'month')
+        wait(service, job_id)
+        assert service.status(1, job_id) == {'status': 'done'}
+        with open(service.path(1, job_id), 'rb') as f:
+            assert f.read(4) == b'%PDF'
+        assert os.listdir(service.report_dir) == [job_id + '.pdf']
+    finally:
+        service.close()
+
+
+def test_timeframe_of_a_job_id():
+    assert reports.timeframe('u3-month-120-20260105') == 'month'
+    assert reports.timeframe('u3-month-x-20260105') is None
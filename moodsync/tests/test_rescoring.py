@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models import rescoring
+from models.rescoring import RescoreJob
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    # Stand-in for the model workers: every readable image is 'Sad'
+    calls = []
+
+    def score_chunk(items, cached_ids=(), crops=None):
+        calls.append([mood_id for mood_id, _ in items])
+        return [(mood_id, 'ok', 'Sad', 0.9, None) for mood_id, _ in items], 0.0, 0.0
+
+    monkeypatch.setattr(rescoring, '_score_chunk', score_chunk)
+    monkeypatch.setattr(RescoreJob, '_executor', lambda self: ThreadPoolExecutor(self.workers))
+    return calls
+
+
+@pytest.fixture
+def images(db, tmp_path):
+    uploads = tmp_path / 'static' / 'uploads'
+    uploads.mkdir(parents=True)
+    ids = []
+    for n in range(6):
+        # The fourth image is gone from disk
+        if n != 3:
+            (uploads / f'face{n}.jpg').write_bytes(b'jpeg')
+        ids.append(db.log_mood(user_id=1, emotion='Happy', intensity=5, image_path=f'uploads/face{n}.jpg'))
+    db.log_mood(user_id=1, emotion='Happy', intensity=5)
+    return ids, str(uploads)
+
+
+def job(db, uploads):
+    return RescoreJob(db, version='test', upload_folder=uploads, workers=1, chunk_size=2, max_rate=0,
+                      face_cache=False)
+
+
+def test_interrupted_run_resumes_after_the_last_scored_mood(db, images, scored):
+    ids, uploads = images
+    first = job(db, uploads).run(limit=3)
+    assert first['images'] == 3 and first['statuses']['ok'] == 3
+    second = job(db, uploads).run()
+    assert second['images'] == 3
+    assert second['statuses'] == {'ok': 2, 'no_face': 0, 'unreadable': 0, 'missing': 1}
+    scored_ids = [mood_id for chunk in scored for mood_id in chunk]
+    assert scored_ids == [mood_id for n, mood_id in enumerate(ids) if n != 3]
+    assert job(db, uploads).run()['images'] == 0
+
+
+def test_apply_relabels_only_ok_predictions(db, images, scored):
+    ids, uploads = images
+    rescore = job(db, uploads)
+    report = rescore.run()
+    assert report['label_changes'] == {'compared': 5, 'changed': 5, 'changed_fraction': 1.0,
+                                       'transitions': [{'from': 'Happy', 'to': 'Sad', 'moods': 5}]}
+    assert rescore.apply(batch_size=2) == 5
+    with db.connection(1) as conn:
+        labels = dict(conn.execute('SELECT id, detected_emotion FROM moods').fetchall())
+    assert [labels[mood_id] for mood_id in ids] == ['Sad', 'Sad', 'Sad', 'Happy', 'Sad', 'Sad']
+    stats = db.get_mood_stats(user_id=1, days=7)
+    assert {row['detected_emotion']: row['count'] for row in stats['emotion_counts']} == {'Sad': 5, 'Happy': 2}
+    assert db.check_rollups() == []
+    assert rescore.label_changes()['changed'] == 0
@@ -0,0 +1,61 @@
+import pytest
+
+import manage
+from models.database import DatabaseManager
+
+pytestmark = pytest.mark.db(sharded=True, users=3)
+
+
+def users_in(pool, table='moods'):
+    with pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute(f'SELECT DISTINCT user_id FROM {table}'))
+
+
+def log_for_everyone(db):
+    for user_id in (1, 2, 3):
+        for n in range(user_id):
+            mood_id = db.log_mood(user_id=user_id, emotion='Happy', intensity=user_id, notes=f'user {user_id}')
+            db.save_suggestions(mood_id, [{'type': 'wellness', 'content': 'Take a walk'}], user_id)
+        db.save_journal_entry(user_id, f'journal of user {user_id}')
+
+
+def test_users_are_routed_by_id(db):
+    log_for_everyone(db)
+    shard_0, shard_1 = db.shards
+    assert db.pool_for(2) is shard_0 and db.pool_for(1) is db.pool_for(3) is shard_1
+    assert db.pool_for(None) is db.pool
+    assert users_in(shard_0) == users_in(shard_0, 'journal_entries') == [2]
+    assert users_in(shard_1) == users_in(shard_1, 'journal_entries') == [1, 3]
+    assert users_in(db.pool) == [] and users_in(db.pool, 'journal_entries') == []
+    # Accounts stay in the main database
+    assert db.get_user_profile(3)['username'] == 'user3'
+
+
+def test_reads_stay_in_the_users_shard(db):
+    log_for_everyone(db)
+    for user_id in (1, 2, 3):
+        assert db.get_mood_stats(user_id=user_id, days=7)['total_entries'] == user_id
+        history = db.get_mood_history(user_id=user_id)
+        assert {mood['user_id'] for mood in history} == {user_id}
+        assert db.get_suggestions_by_mood(history[0]['id'], user_id)[0]['content'] == 'Take a walk'
+        results, _ = db.search_journal(user_id, f'user {user_id}')
+        assert sorted(result['kind'] for result in results) == ['journal'] + ['mood'] * user_id
+    assert db.check_rollups() == []
+
+
+@pytest.mark.db(users=3)
+def test_split_shards_copies_each_users_rows(db, tmp_path, capsys):
+    log_for_everyone(db)
+    out = tmp_path / 'split'
+    assert manage.main(['split-shards', '--db', db.db_path, '--out', str(out), '--shards', '2']) is None
+    sharded = DatabaseManager(db.db_path, 'sharded', str(out), 2)
+    try:
+        assert users_in(sharded.shards[0]) == [2] and users_in(sharded.shards[1]) == [1, 3]
+        for user_id in (1, 2, 3):
+            assert sharded.get_mood_stats(user_id=user_id, days=7) == db.get_mood_stats(user_id=user_id, days=7)
+            assert len(sharded.search_journal(user_id, 'journal')[0]) == 1
+        # Refuses to run over existing shards
+        assert manage.main(['split-shards', '--db', db.db_path, '--out', str(out), '--shards', '2']) == 1
+    finally:
+        for pool in sharded.shards:
+            pool.close_all()
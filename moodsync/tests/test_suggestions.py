@@ -0,0 +1,17 @@
+SUGGESTIONS = [{'type': 'activities', 'content': 'Go for a walk'}, {'type': 'wellness', 'content': 'Breathe'}]
+
+
+def test_saved_suggestions_match_what_is_stored(db):
+    mood_id, saved = db.log_mood_with_suggestions(SUGGESTIONS, user_id=1, emotion='Sad')
+    assert saved == db.get_suggestions_by_mood(mood_id, 1)
+    assert [s['content'] for s in saved] == ['Go for a walk', 'Breathe']
+
+
+def test_ids_skip_deleted_rows(db):
+    mood_id = db.log_mood(user_id=1, emotion='Sad')
+    first = db.save_suggestions(mood_id, SUGGESTIONS, 1)
+    with db.connection(1) as conn:
+        conn.execute('DELETE FROM suggestions WHERE id = ?', (first[-1]['id'],))
+    again = db.save_suggestions(mood_id, SUGGESTIONS, 1)
+    assert again == db.get_suggestions_by_mood(mood_id, 1)[-2:]
+    assert db.save_suggestions(mood_id, [], 1) == []
@@ -0,0 +1,134 @@
+import sys
+import threading
+from datetime import timezone
+
+import numpy as np
+import pytest
+
+from models import timeseries
+
+pytestmark = pytest.mark.db(users=2)
+
+
+@pytest.fixture
+def moods(db):
+    for user_id in (1, 2):
+        db.log_mood(user_id=user_id, emotion='Happy', intensity=5)
+
+
+@pytest.fixture
+def blocked_load(moods, monkeypatch):
+    # Holds user 1's loads until released
+    started, release = threading.Event(), threading.Event()
+    real = timeseries.load
+
+    def load(conn, user_id, zone, after_id=0):
+        if user_id == 1:
+            started.set()
+            assert release.wait(5)
+        return real(conn, user_id, zone, after_id)
+
+    monkeypatch.setattr(timeseries, 'load', load)
+    return started, release
+
+
+def test_cold_load_does_not_block_other_users(db, blocked_load):
+    started, release = blocked_load
+    engine = db.timeseries
+    loading = threading.Thread(target=engine.series, args=(1,))
+    loading.start()
+    assert started.wait(5)
+    try:
+        other = []
+        reading = threading.Thread(target=lambda: other.append(engine.series(2)))
+        reading.start()
+        reading.join(2)
+        assert not reading.is_alive()
+        assert len(other[0]['id']) == 1
+        assert engine.snapshot()['users'] == 1
+    finally:
+        release.set()
+        loading.join()
+    assert engine.snapshot()['users'] == 2
+
+
+def test_load_racing_an_invalidation_is_not_kept(db, blocked_load):
+    started, release = blocked_load
+    engine = db.timeseries
+    result = []
+    loading = threading.Thread(target=lambda: result.append(engine.series(1)))
+    loading.start()
+    assert started.wait(5)
+    engine.invalidate(1)
+    release.set()
+    loading.join()
+    assert len(result[0]['id']) == 1
+    assert engine.snapshot()['users'] == 0
+
+
+def _moods(ids):
+    # Column arrays where every column is a function of the id, so a torn row shows
+    ids = np.asarray(ids, dtype=np.int64)
+    ids = ids[np.argsort(_ts(ids), kind='stable')]
+    ts = _ts(ids)
+    return {'id': ids, 'ts': ts, 'day': (ts // 86400).astype(np.int32), 'hour': (ts % 86400 // 3600).astype(np.int8),
+            'weekday': (ids % 7).astype(np.int8), 'emotion': (ids % 6).astype(np.int8),
+            'intensity': (ids % 10).astype(np.float32)}
+
+
+def _ts(ids):
+    return ids * 60 % 7919 * 600
+
+
+@pytest.fixture
+def frequent_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_views_stay_consistent_while_moods_are_appended(frequent_switches):
+    series = timeseries.MoodSeries(timezone.utc)
+    done = threading.Event()
+    torn = []
+
+    def read():
+        while not done.is_set():
+            view = series.view()
+            ids = view['id']
+            if any(len(column) != len(ids) for column in view.values()) or np.any(np.diff(view['ts']) < 0) \
+                    or not np.array_equal(view['ts'], _ts(ids)) or not np.array_equal(view['emotion'], ids % 6):
+                torn.append(len(ids))
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    try:
+        # Small chunks, about half of them older than the last mood (a re-sort)
+        for start in range(1, 10001, 10):
+            series.append(_moods(range(start, start + 10)))
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert torn == []
+    assert len(series.view()['id']) == len(series) == 10000
+
+
+def test_view_is_unchanged_by_later_appends():
+    series = timeseries.MoodSeries(timezone.utc)
+    series.append(_moods(range(1, 40)))
+    view = series.view()
+    before = {name: column.copy() for name, column in view.items()}
+    series.append(_moods(range(40, 45)))
+    series.append(_moods(range(45, 200)))
+    assert all(np.array_equal(view[name], before[name]) for name in before)
+
+
+def test_series_is_a_snapshot(db, moods):
+    first = db.timeseries.series(1)
+    db.log_mood(user_id=1, emotion='Sad', intensity=2)
+    assert len(first['id']) == 1
+    assert len(db.timeseries.series(1)['id']) == 2
+    assert len(first['id']) == 1
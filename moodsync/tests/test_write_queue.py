@@ -0,0 +1,61 @@
+import pytest
+
+from models.write_queue import WriteBehindQueue
+
+SUGGESTIONS = [{'type': 'wellness', 'content': 'Take a walk'}]
+
+
+@pytest.fixture
+def writer(db):
+    writer = WriteBehindQueue(db, max_batch=16, max_delay_ms=50)
+    yield writer
+    writer.close()
+
+
+def stored(db, user_id):
+    with db.connection(user_id) as conn:
+        return conn.execute('SELECT COUNT(*) FROM moods WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def test_burst_shares_commits(db, writer):
+    futures = [writer.submit(SUGGESTIONS, user_id=1, emotion='Happy', intensity=n % 10 + 1) for n in range(40)]
+    results = [future.result(5) for future in futures]
+    assert len({mood_id for mood_id, _ in results}) == 40
+    assert all(saved[0]['mood_id'] == mood_id for mood_id, saved in results)
+    assert stored(db, 1) == 40
+    stats = writer.snapshot()
+    assert stats['entries'] == 40 and stats['failures'] == 0
+    assert stats['batches'] < 40 and stats['max_batch_size'] <= 16
+
+
+def test_bad_entry_fails_only_its_own_future(db, writer):
+    # Within max_delay_ms of each other: one batch
+    good = writer.submit(SUGGESTIONS, user_id=1, emotion='Happy')
+    bad = writer.submit(SUGGESTIONS, user_id=1, emotion='Happy', mood_of_the_day=True)
+    also_good = writer.submit(SUGGESTIONS, user_id=1, emotion='Calm')
+    assert good.result(5)[0] < also_good.result(5)[0]
+    with pytest.raises(TypeError):
+        bad.result(5)
+    assert stored(db, 1) == 2
+    assert writer.snapshot()['failures'] == 1
+
+
+def test_close_writes_everything_queued(db):
+    writer = WriteBehindQueue(db, max_batch=4, max_delay_ms=0)
+    futures = [writer.submit([], user_id=1, emotion='Happy') for _ in range(10)]
+    writer.close()
+    assert all(future.done() for future in futures)
+    assert stored(db, 1) == 10
+    with pytest.raises(RuntimeError):
+        writer.submit([], user_id=1, emotion='Happy')
+
+
+@pytest.mark.db(sharded=True, users=2)
+def test_batches_are_split_per_shard(db, writer):
+    futures = [writer.submit(SUGGESTIONS, user_id=n % 2 + 1, emotion='Happy') for n in range(10)]
+    for future in futures:
+        future.result(5)
+    assert stored(db, 1) == stored(db, 2) == 5
+    assert db.pool_for(1) is not db.pool_for(2)
+    with db.pool_for(1).connection() as conn:
+        assert [row[0] for row in conn.execute('SELECT DISTINCT user_id FROM moods')] == [1]